@@ -0,0 +1,151 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Benchmark which measures how long it takes to import libcloud and load a
+single driver class in a fresh interpreter, as a short-lived script would.
+
+Each scenario is run RUNS times in a new process and the best time is
+reported. The benchmark fails (exit status 1) if:
+
+  - a scenario takes longer than its budget (in milliseconds, the budgets
+    can be scaled with the first argument for slower machines)
+  - one of the modules in DEFERRED_MODULES has been imported. These are
+    slow to import and only needed by specific features (paramiko by
+    ParamikoSSHClient, subprocess by ShellOutSSHClient, pickle by
+    FileTTLCache, ...). Modules which are already imported by the standard
+    library modules libcloud always needs (BASELINE) are ignored, e.g.
+    httplib imports tempfile on Python 2.
+
+On Python 3.7+ the slowest imports (as reported by "python -X importtime")
+are also printed for the get_driver scenario.
+
+Usage: PYTHONPATH=. python contrib/benchmarks/bench_import_time.py [scale]
+"""
+
+import os
+import sys
+import subprocess
+
+RUNS = 7
+TOP_IMPORTS = 15
+
+# (name, statement, budget in ms)
+SCENARIOS = [
+    ('libcloud', 'import libcloud', 10),
+    ('get_driver', 'from libcloud.compute.providers import get_driver\n'
+                   'from libcloud.compute.types import Provider\n'
+                   'get_driver(Provider.EC2)', 150),
+    ('storage', 'from libcloud.storage.providers import get_driver\n'
+                'from libcloud.storage.types import Provider\n'
+                'get_driver(Provider.S3)', 150),
+]
+
+DEFERRED_MODULES = ['paramiko', 'Crypto', 'subprocess', 'pipes', 'pickle',
+                    'tempfile']
+
+BASELINE = 'from libcloud.utils.py3 import httplib'
+
+SCRIPT = """
+import sys
+import time
+start = time.time()
+%s
+elapsed = time.time() - start
+modules = sorted([name for name in sys.modules if sys.modules[name]])
+sys.stdout.write('%%f %%s' %% (elapsed, ' '.join(modules)))
+"""
+
+
+def run(statement):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([os.getcwd()] +
+                                        [p for p in sys.path if p])
+
+    process = subprocess.Popen([sys.executable, '-c', SCRIPT % (statement)],
+                               stdout=subprocess.PIPE, env=env)
+    stdout = process.communicate()[0].decode('utf-8')
+
+    if process.returncode != 0:
+        raise RuntimeError('Failed to run: %s' % (statement))
+
+    elapsed, modules = stdout.split(' ', 1)
+    return float(elapsed) * 1000, modules.split()
+
+
+def print_top_imports(statement):
+    if sys.version_info < (3, 7):
+        return
+
+    process = subprocess.Popen([sys.executable, '-X', 'importtime', '-c',
+                                statement], stderr=subprocess.PIPE)
+    stderr = process.communicate()[1].decode('utf-8')
+    imports = []
+
+    for line in stderr.splitlines()[1:]:
+        self_time, cumulative, name = line.split(':', 1)[1].split('|')
+        imports.append((int(self_time), name.strip()))
+
+    imports.sort(reverse=True)
+
+    print('')
+    print('Slowest imports (self time, us):')
+
+    for self_time, name in imports[:TOP_IMPORTS]:
+        print('%10d %s' % (self_time, name))
+
+
+def main():
+    scale = 1.0
+    if len(sys.argv) > 1:
+        scale = float(sys.argv[1])
+
+    failed = False
+    baseline = set(run(BASELINE)[1])
+
+    print('%-12s %10s %10s %8s' % ('scenario', 'best ms', 'budget ms',
+                                   'modules'))
+
+    for name, statement, budget in SCENARIOS:
+        results = [run(statement) for _ in range(RUNS)]
+        best = min([elapsed for elapsed, _ in results])
+        modules = results[0][1]
+        budget = budget * scale
+
+        print('%-12s %10.1f %10.1f %8d' % (name, best, budget,
+                                          len(modules)))
+
+        if best > budget:
+            print('  over budget')
+            failed = True
+
+        deferred = [module for module in modules
+                    if module.split('.')[0] in DEFERRED_MODULES and
+                    module not in baseline]
+
+        if deferred:
+            print('  imports deferred modules: %s' % (', '.join(deferred)))
+            failed = True
+
+    print_top_imports(SCENARIOS[1][1])
+
+    if failed:
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,167 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Benchmark which measures how much memory is used by the objects which are
+returned when listing a large container, using Object and CompactObject.
+
+Listing pages of PAGE_SIZE objects are generated from the S3 and CloudFiles
+list_container_objects test fixtures (with a unique name per object) and
+converted using the driver, as list_container_objects would do. Only the
+objects are kept, the pages are discarded.
+
+Each scenario runs in a new process and the growth of its peak RSS is
+reported, together with the time it took to build the objects.
+
+Usage: PYTHONPATH=. python contrib/benchmarks/bench_object_memory.py [count]
+"""
+
+import re
+import os
+import sys
+import time
+import resource
+import subprocess
+
+try:
+    import simplejson as json
+except ImportError:
+    import json
+
+from xml.etree import ElementTree
+
+from libcloud.utils.py3 import b
+from libcloud.storage.base import Container, Object, CompactObject
+from libcloud.storage.drivers.s3 import S3StorageDriver
+from libcloud.storage.drivers.cloudfiles import CloudFilesUSStorageDriver
+from libcloud.test.file_fixtures import StorageFileFixtures
+
+PAGE_SIZE = 1000
+
+CLASSES = {
+    'Object': Object,
+    'CompactObject': CompactObject
+}
+
+
+def s3_objects(count, object_cls):
+    driver = S3StorageDriver('key', 'secret')
+    driver.objectCls = object_cls
+    container = Container(name='container', extra={}, driver=driver)
+
+    body = StorageFileFixtures('s3').load('list_container_objects.xml')
+    start = body.index('<Contents>')
+    end = body.index('</Contents>') + len('</Contents>')
+    entry = re.sub('<Key>.*</Key>', '<Key>%s</Key>', body[start:end])
+
+    for offset in range(0, count, PAGE_SIZE):
+        keys = range(offset, min(offset + PAGE_SIZE, count))
+        contents = ''.join([entry % ('dir/object-%d' % (key)) for key in
+                            keys])
+        page = body[:start] + contents + body[end:]
+        yield driver._to_objs(ElementTree.XML(b(page)), 'Contents',
+                              container)
+
+
+def cloudfiles_objects(count, object_cls):
+    driver = CloudFilesUSStorageDriver('user', 'key')
+    driver.objectCls = object_cls
+    container = Container(name='container', extra={}, driver=driver)
+
+    body = StorageFileFixtures('cloudfiles').load(
+        'list_container_objects.json')
+    entries = json.loads(body)
+
+    for offset in range(0, count, PAGE_SIZE):
+        page = []
+
+        for key in range(offset, min(offset + PAGE_SIZE, count)):
+            entry = dict(entries[key % len(entries)])
+            entry['name'] = 'dir/object-%d' % (key)
+            page.append(entry)
+
+        yield driver._to_object_list(json.loads(json.dumps(page)),
+                                     container)
+
+
+SOURCES = {
+    'S3': s3_objects,
+    'CloudFiles': cloudfiles_objects
+}
+
+
+def get_max_rss():
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # ru_maxrss is in bytes on OS X and in kilobytes elsewhere
+    if sys.platform == 'darwin':
+        return max_rss
+
+    return max_rss * 1024
+
+
+def run_child(source_name, class_name, count):
+    before = get_max_rss()
+    start = time.time()
+    objects = []
+
+    for page in SOURCES[source_name](count, CLASSES[class_name]):
+        objects.extend(page)
+
+    elapsed = time.time() - start
+    assert len(objects) == count, (len(objects), count)
+
+    sys.stdout.write('%f %d' % (elapsed, get_max_rss() - before))
+
+
+def run(source_name, class_name, count):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([os.getcwd()] +
+                                        [p for p in sys.path if p])
+
+    process = subprocess.Popen([sys.executable, __file__, '--child',
+                                source_name, class_name, str(count)],
+                               stdout=subprocess.PIPE, env=env)
+    stdout = process.communicate()[0].decode('utf-8')
+
+    if process.returncode != 0:
+        raise RuntimeError('Failed to run: %s %s' % (source_name, class_name))
+
+    elapsed, used = stdout.split()
+    return float(elapsed), int(used)
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        return run_child(sys.argv[2], sys.argv[3], int(sys.argv[4]))
+
+    count = 1000000
+    if len(sys.argv) > 1:
+        count = int(sys.argv[1])
+
+    print('%d objects' % (count))
+    print('%-12s %-14s %10s %10s %10s' % ('source', 'class', 'MB',
+                                          'bytes/obj', 'seconds'))
+
+    for source_name in ['S3', 'CloudFiles']:
+        for class_name in ['Object', 'CompactObject']:
+            elapsed, used = run(source_name, class_name, count)
+            print('%-12s %-14s %10.1f %10d %10.2f' %
+                  (source_name, class_name, used / (1024.0 * 1024),
+                   used // count, elapsed))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
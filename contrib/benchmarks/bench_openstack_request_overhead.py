@@ -0,0 +1,111 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Micro-benchmark which measures the per-request overhead of the OpenStack
+based drivers (endpoint selection in _populate_hosts_and_request_paths,
+which runs before every request).
+
+For each driver three numbers (microseconds per call) are reported:
+
+  - resolve - _populate_hosts_and_request_paths with memoized endpoint
+    tuples (the default)
+  - no memo - the same, but the endpoint URL is parsed on every call as it
+    used to be
+  - request - a complete request served by MockHttp
+
+Usage: PYTHONPATH=. python contrib/benchmarks/bench_openstack_request_overhead.py
+"""
+
+import sys
+import time
+
+from libcloud.utils.py3 import httplib
+from libcloud.compute.drivers.rackspace import RackspaceNodeDriver
+from libcloud.compute.drivers.rackspacenova import RackspaceNovaOrdNodeDriver
+from libcloud.storage.drivers.cloudfiles import CloudFilesUSStorageDriver
+from libcloud.dns.drivers.rackspace import RackspaceUSDNSDriver
+from libcloud.loadbalancer.drivers.rackspace import RackspaceLBDriver
+from libcloud.test import MockHttp
+from libcloud.test.file_fixtures import OpenStackFixtures
+
+CALLS = 20000
+REQUESTS = 2000
+
+DRIVERS = [
+    ('Rackspace compute', RackspaceNodeDriver),
+    ('OpenStack compute', RackspaceNovaOrdNodeDriver),
+    ('CloudFiles', CloudFilesUSStorageDriver),
+    ('Rackspace DNS', RackspaceUSDNSDriver),
+    ('Rackspace LB', RackspaceLBDriver),
+]
+
+
+class BenchmarkMockHttp(MockHttp):
+    fixtures = OpenStackFixtures()
+
+    def _get_method_name(self, type, use_param, qs, path):
+        if path.endswith('/tokens'):
+            return '_tokens'
+
+        return '_request'
+
+    def _tokens(self, method, url, body, headers):
+        body = self.fixtures.load('_v2_0__auth.json')
+        return (httplib.OK, body, {'content-type': 'application/json'},
+                httplib.responses[httplib.OK])
+
+    def _request(self, method, url, body, headers):
+        return (httplib.NO_CONTENT, '', {}, httplib.responses[httplib.OK])
+
+
+def measure(func, count):
+    start = time.time()
+
+    for _ in range(count):
+        func()
+
+    return (time.time() - start) * 1000000 / count
+
+
+def main():
+    print('%-18s %12s %12s %12s' % ('driver', 'resolve us', 'no memo us',
+                                    'request us'))
+
+    for name, cls in DRIVERS:
+        cls.connectionCls.conn_classes = (BenchmarkMockHttp,
+                                          BenchmarkMockHttp)
+        driver = cls('user', 'key', ex_force_auth_version='2.0',
+                     ex_force_auth_url='https://auth.example.com/v2.0/')
+        connection = driver.connection
+        connection._populate_hosts_and_request_paths()
+
+        def resolve_no_memo():
+            connection._endpoint_tuples = {}
+            connection._populate_hosts_and_request_paths()
+
+        def request():
+            connection.request('/bench', method='HEAD')
+
+        resolve = measure(connection._populate_hosts_and_request_paths,
+                          CALLS)
+        no_memo = measure(resolve_no_memo, CALLS)
+        total = measure(request, REQUESTS)
+
+        print('%-18s %12.2f %12.2f %12.2f' % (name, resolve, no_memo, total))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,151 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Benchmark which measures read_in_chunks throughput with and without
+fill_size.
+
+Two kinds of sources are used:
+
+  - file - a (sparse) file on disk, read using the readinto fast path
+  - iterator - a generator which yields 1 MB pieces
+
+The previous string concatenation based implementation is included for
+comparison. Its buffer keeps growing when fill_size is used with pieces
+larger than chunk_size, which makes it quadratic, so in that case it is only
+run on LEGACY_MAX_MB of data (marked with "*").
+
+Usage: PYTHONPATH=. python contrib/benchmarks/bench_read_in_chunks.py [MB]
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+from libcloud.utils.py3 import PY3
+from libcloud.utils.py3 import httplib
+from libcloud.utils.py3 import next
+from libcloud.utils.py3 import b
+from libcloud.utils.files import read_in_chunks, CHUNK_SIZE
+
+if PY3:
+    from io import FileIO as file
+
+PIECE_SIZE = 1024 * 1024
+LEGACY_MAX_MB = 4
+
+
+def legacy_read_in_chunks(iterator, chunk_size=None, fill_size=False):
+    chunk_size = chunk_size or CHUNK_SIZE
+
+    if isinstance(iterator, (file, httplib.HTTPResponse)):
+        get_data = iterator.read
+        args = (chunk_size, )
+    else:
+        get_data = next
+        args = (iterator, )
+
+    data = b('')
+    empty = False
+
+    while not empty or len(data) > 0:
+        if not empty:
+            try:
+                chunk = b(get_data(*args))
+                if len(chunk) > 0:
+                    data += chunk
+                else:
+                    empty = True
+            except StopIteration:
+                empty = True
+
+        if len(data) == 0:
+            return
+
+        if fill_size:
+            if empty or len(data) >= chunk_size:
+                yield data[:chunk_size]
+                data = data[chunk_size:]
+        else:
+            yield data
+            data = b('')
+
+
+def file_source(file_path, size):
+    return file(file_path, 'rb')
+
+
+def iterator_source(file_path, size):
+    piece = b('a') * PIECE_SIZE
+
+    def generator():
+        for _ in range(size // PIECE_SIZE):
+            yield piece
+
+    return generator()
+
+
+def run(func, source, size, fill_size):
+    start = time.time()
+    total = 0
+
+    for chunk in func(source, fill_size=fill_size):
+        total += len(chunk)
+
+    assert total == size, (total, size)
+    return (size / (1024.0 * 1024)) / (time.time() - start)
+
+
+def main():
+    size_mb = 1024
+    if len(sys.argv) > 1:
+        size_mb = int(sys.argv[1])
+
+    size = size_mb * 1024 * 1024
+
+    fd, file_path = tempfile.mkstemp()
+    os.ftruncate(fd, size)
+    os.close(fd)
+
+    print('%d MB, chunk_size=%d' % (size_mb, CHUNK_SIZE))
+    print('%-10s %-10s %-10s %12s' % ('source', 'fill_size', 'impl',
+                                      'MB/sec'))
+
+    try:
+        for source_name, get_source in [('file', file_source),
+                                        ('iterator', iterator_source)]:
+            for fill_size in [False, True]:
+                for impl_name, func in [('legacy', legacy_read_in_chunks),
+                                        ('current', read_in_chunks)]:
+                    run_size = size
+
+                    if impl_name == 'legacy' and source_name == 'iterator' \
+                       and fill_size:
+                        run_size = min(size, LEGACY_MAX_MB * 1024 * 1024)
+                        impl_name += '*'
+
+                    source = get_source(file_path, run_size)
+                    throughput = run(func, source, run_size, fill_size)
+                    print('%-10s %-10s %-10s %12.1f' % (source_name,
+                                                        fill_size,
+                                                        impl_name,
+                                                        throughput))
+    finally:
+        os.unlink(file_path)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
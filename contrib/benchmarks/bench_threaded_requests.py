@@ -0,0 +1,88 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Benchmark which issues requests using a single driver instance which is
+shared between multiple threads.
+
+Each request is served by MockHttp which simulates network latency so the
+throughput should scale (close to) linearly with the number of threads.
+
+Usage: PYTHONPATH=. python contrib/benchmarks/bench_threaded_requests.py
+"""
+
+import sys
+import time
+import threading
+
+from libcloud.utils.py3 import httplib
+from libcloud.common.base import ConnectionKey
+from libcloud.storage.base import StorageDriver
+from libcloud.test import MockHttp
+
+REQUESTS = 400
+LATENCY = 0.005
+THREAD_COUNTS = [1, 2, 4, 8, 16]
+
+
+class LatencyMockHttp(MockHttp):
+    def _object(self, method, url, body, headers):
+        time.sleep(LATENCY)
+        return (httplib.OK, 'data', {}, httplib.responses[httplib.OK])
+
+
+class BenchmarkConnection(ConnectionKey):
+    conn_classes = (LatencyMockHttp, LatencyMockHttp)
+
+
+class BenchmarkDriver(StorageDriver):
+    name = 'Benchmark'
+    connectionCls = BenchmarkConnection
+
+
+def run(driver, thread_count):
+    per_thread = REQUESTS // thread_count
+
+    def worker():
+        for _ in range(per_thread):
+            response = driver.connection.request('/object')
+            assert response.body == 'data'
+
+    threads = [threading.Thread(target=worker) for _ in range(thread_count)]
+
+    start = time.time()
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    return (per_thread * thread_count) / (time.time() - start)
+
+
+def main():
+    driver = BenchmarkDriver('key', 'secret')
+    baseline = None
+
+    print('%-8s %14s %8s' % ('threads', 'requests/sec', 'speedup'))
+    for thread_count in THREAD_COUNTS:
+        throughput = run(driver, thread_count)
+        baseline = baseline or throughput
+        print('%-8d %14.1f %7.2fx' % (thread_count, throughput,
+                                      throughput / baseline))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
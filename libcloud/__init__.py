@@ -19,14 +19,13 @@ libcloud provides a unified interface to the cloud computing resources.
 @var __version__: Current version of libcloud
 """
 
-__all__ = ['__version__', 'enable_debug']
+from libcloud.utils.misc import module_exists
+
+__all__ = ['__version__', 'enable_debug', 'enable_connection_pooling']
 __version__ = '0.11.4-dev'
 
-try:
-    import paramiko
-    have_paramiko = True
-except ImportError:
-    have_paramiko = False
+# paramiko is slow to import so it's only imported when it's used
+have_paramiko = module_exists('paramiko')
 
 
 def enable_debug(fo):
@@ -45,6 +44,28 @@ def enable_debug(fo):
                                   LoggingHTTPSConnection)
 
 
+def enable_connection_pooling(max_idle=10, idle_timeout=30):
+    """
+    Enable library wide re-use of keep-alive HTTP(s) connections.
+
+    Idle connections are shared between all the drivers in the process which
+    talk to the same (host, port, secure) endpoint.
+
+    @param max_idle: Maximum number of idle connections kept per endpoint.
+    @type max_idle: C{int}
+
+    @param idle_timeout: Number of seconds after which an idle connection is
+                         closed.
+    @type idle_timeout: C{int}
+
+    @return: L{libcloud.common.base.ConnectionPool} instance which is used.
+    """
+    from libcloud.common.base import Connection, ConnectionPool
+    Connection.pool = ConnectionPool(max_idle=max_idle,
+                                     idle_timeout=idle_timeout)
+    return Connection.pool
+
+
 def _init_once():
     """
     Utility function that is ran once on Library import.
@@ -59,6 +80,8 @@ def _init_once():
         enable_debug(fo)
 
         if have_paramiko:
-            paramiko.common.logging.basicConfig(level=paramiko.common.DEBUG)
+            # paramiko logs using the standard logging module
+            import logging
+            logging.basicConfig(level=logging.DEBUG)
 
 _init_once()
@@ -17,4 +17,10 @@ from libcloud.common.base import XmlResponse
 
 
 class AWSBaseResponse(XmlResponse):
-    pass
+
+    @property
+    def streaming(self):
+        # Only the requests for which the driver sets 'streaming' in the
+        # connection context (e.g. large listings) are parsed in the
+        # streaming mode, so the raw body stays available everywhere else
+        return self.connection.context.get('streaming', False)
@@ -15,10 +15,14 @@
 
 import sys
 import ssl
+import codecs
 import time
+import socket
+import select
+import threading
 
 from xml.etree import ElementTree as ET
-from pipes import quote as pquote
+from xml.parsers.expat import ExpatError
 
 try:
     import simplejson as json
@@ -37,16 +41,27 @@ from libcloud.utils.py3 import b
 
 from libcloud.utils.misc import lowercase_keys
 from libcloud.utils.compression import decompress_data
+from libcloud.utils.compression import decompress_chunks
+from libcloud.utils.compression import CONTENT_ENCODING_TYPES
 from libcloud.common.types import LibcloudError, MalformedResponseError
 
 from libcloud.httplib_ssl import LibcloudHTTPSConnection
 
 LibcloudHTTPConnection = httplib.HTTPConnection
 
+# Requests using these methods can be safely re-sent if a pooled connection
+# fails after the request has been sent
+IDEMPOTENT_METHODS = ['GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS']
+
 
 class Response(object):
     """
     A Base Response class to derive from.
+
+    @cvar streaming: If True, the body of a successful response is parsed
+                     while it is being read from the socket instead of being
+                     read into memory first. In this mode C{success} must
+                     only depend on the status code and the headers.
     """
     NODE_STATE_MAP = {}
 
@@ -57,13 +72,10 @@ class Response(object):
     error = None
     connection = None
     parse_zero_length_body = False
+    streaming = False
+    stream_chunk_size = 16 * 1024
 
     def __init__(self, response, connection):
-        self.body = self._decompress_response(response=response)
-
-        if PY3:
-            self.body = b(self.body).decode('utf-8')
-
         self.status = response.status
 
         # http.client In Python 3 doesn't automatically lowercase the header
@@ -72,6 +84,16 @@ class Response(object):
         self.error = response.reason
         self.connection = connection
 
+        if self.streaming and self.success():
+            chunks = self._iter_response_body(response=response)
+            self.object = self.parse_body_stream(chunks)
+            return
+
+        self.body = self._decompress_response(response=response)
+
+        if PY3:
+            self.body = b(self.body).decode('utf-8')
+
         if not self.success():
             raise Exception(self.parse_error())
 
@@ -87,6 +109,25 @@ class Response(object):
         """
         return self.body
 
+    def parse_body_stream(self, chunks):
+        """
+        Parse response body in the streaming mode.
+
+        The default implementation reads the whole body and calls
+        C{parse_body}.
+
+        @type chunks: C{Iterator}
+        @param chunks: An iterator which yields (decompressed) body data.
+
+        @return: Parsed body.
+        """
+        self.body = b('').join(chunks).strip()
+
+        if PY3:
+            self.body = self.body.decode('utf-8')
+
+        return self.parse_body()
+
     def parse_error(self):
         """
         Parse the error messages.
@@ -122,16 +163,41 @@ class Response(object):
         if original_data is not None:
             return original_data
 
-        body = response.read()
+        if encoding not in CONTENT_ENCODING_TYPES:
+            return response.read().strip()
 
-        if encoding in ['zlib', 'deflate']:
-            body = decompress_data('zlib', body)
-        elif encoding in ['gzip', 'x-gzip']:
-            body = decompress_data('gzip', body)
-        else:
-            body = body.strip()
+        # Body is decompressed while it's being read so the whole compressed
+        # body is never held in memory
+        return b('').join(self._iter_response_body(response=response))
 
-        return body
+    def _iter_response_body(self, response):
+        """
+        Return a generator which reads the response body in chunks of
+        C{stream_chunk_size} bytes and decompresses it on the fly if it is
+        using deflate or gzip encoding.
+        """
+        original_data = getattr(response, '_original_data', None)
+
+        if original_data is not None:
+            return iter([b(original_data)])
+
+        def read_chunks():
+            while True:
+                chunk = response.read(self.stream_chunk_size)
+
+                if not chunk:
+                    break
+
+                yield b(chunk)
+
+        headers = lowercase_keys(dict(response.getheaders()))
+        encoding = headers.get('content-encoding', None)
+        compression_type = CONTENT_ENCODING_TYPES.get(encoding, None)
+
+        if compression_type:
+            return decompress_chunks(compression_type, read_chunks())
+
+        return read_chunks()
 
 
 class JsonResponse(Response):
@@ -152,6 +218,20 @@ class JsonResponse(Response):
                 driver=self.connection.driver)
         return body
 
+    def parse_body_stream(self, chunks):
+        # The json module can't parse a document incrementally, so the text
+        # is still assembled in memory, but the raw (and possibly compressed)
+        # body never is.
+        if PY3:
+            decoder = codecs.getincrementaldecoder('utf-8')()
+            pieces = [decoder.decode(chunk) for chunk in chunks]
+            pieces.append(decoder.decode(b(''), True))
+            self.body = ''.join(pieces).strip()
+        else:
+            self.body = ''.join(chunks).strip()
+
+        return self.parse_body()
+
     parse_error = parse_body
 
 
@@ -172,9 +252,94 @@ class XmlResponse(Response):
                                        driver=self.connection.driver)
         return body
 
+    def parse_body_stream(self, chunks):
+        # Data is fed to the parser as it arrives so the body is never held in
+        # memory as a whole. The body attribute is left empty in this mode.
+        builder = _StreamingTreeBuilder(self.consume_element)
+        parser = ET.XMLParser(target=builder)
+        empty = True
+
+        for chunk in chunks:
+            if empty:
+                chunk = chunk.lstrip()
+
+                if not chunk:
+                    continue
+
+                empty = False
+
+            try:
+                parser.feed(chunk)
+            except (SyntaxError, ExpatError):
+                raise MalformedResponseError("Failed to parse XML",
+                                             driver=self.connection.driver)
+
+        if empty and not self.parse_zero_length_body:
+            self.body = ''
+            return self.body
+
+        try:
+            body = parser.close()
+        except (SyntaxError, ExpatError):
+            raise MalformedResponseError("Failed to parse XML",
+                                         driver=self.connection.driver)
+        return body
+
+    def consume_element(self, element):
+        """
+        Called in the streaming mode for every element as soon as it has been
+        fully parsed.
+
+        Override in a provider's subclass to build objects while the response
+        is still being read. If True is returned, the element is removed from
+        the tree and cleared to free the memory it takes.
+
+        @type element: C{Element}
+        @param element: Parsed element.
+
+        @rtype: C{bool}
+        @return: True if the element has been consumed.
+        """
+        return False
+
     parse_error = parse_body
 
 
+class _StreamingTreeBuilder(object):
+    """
+    Parser target which builds a tree the same way as C{ET.TreeBuilder}, but
+    calls a callback for every element once its end tag has been reached.
+    Elements for which the callback returns True are removed from their
+    parent.
+    """
+
+    def __init__(self, callback):
+        self._builder = ET.TreeBuilder()
+        self._callback = callback
+        self._parents = []
+
+    def start(self, tag, attrib):
+        element = self._builder.start(tag, attrib)
+        self._parents.append(element)
+        return element
+
+    def data(self, data):
+        self._builder.data(data)
+
+    def end(self, tag):
+        element = self._builder.end(tag)
+        self._parents.pop()
+
+        if self._callback(element) and self._parents:
+            self._parents[-1].remove(element)
+            element.clear()
+
+        return element
+
+    def close(self):
+        return self._builder.close()
+
+
 class RawResponse(Response):
 
     def __init__(self, connection):
@@ -184,11 +349,16 @@ class RawResponse(Response):
         self._error = None
         self._reason = None
         self.connection = connection
+        # Underlying HTTP connection is captured here because the connection
+        # object could be used for other requests before the response is read
+        self._http_connection = getattr(connection, 'connection', None)
 
     @property
     def response(self):
         if not self._response:
-            response = self.connection.connection.getresponse()
+            http_connection = self._http_connection or \
+                self.connection.connection
+            response = http_connection.getresponse()
             self._response, self.body = response, response
             if not self.success():
                 self.parse_error()
@@ -256,10 +426,8 @@ class LoggingConnection():
 
         encoding = headers.get('content-encoding', None)
 
-        if encoding in ['zlib', 'deflate']:
-            body = decompress_data('zlib', body)
-        elif encoding in ['gzip', 'x-gzip']:
-            body = decompress_data('gzip', body)
+        if encoding in CONTENT_ENCODING_TYPES:
+            body = decompress_data(CONTENT_ENCODING_TYPES[encoding], body)
 
         if r.chunked:
             ht += "%x\r\n" % (len(body))
@@ -279,6 +447,12 @@ class LoggingConnection():
         return (rr, rv)
 
     def _log_curl(self, method, url, body, headers):
+        # Only imported when debugging is enabled
+        try:
+            from shlex import quote as pquote
+        except ImportError:
+            from pipes import quote as pquote
+
         cmd = ["curl", "-i"]
 
         cmd.extend(["-X", pquote(method)])
@@ -348,22 +522,257 @@ class LoggingHTTPConnection(LoggingConnection, LibcloudHTTPConnection):
                                                body, headers)
 
 
+class ConnectionPool(object):
+    """
+    A pool of idle keep-alive HTTP(s) connections.
+
+    Connections are keyed on (host, port, secure) and can be shared by all
+    the L{Connection} instances (and thus drivers) in a process. Idle
+    connections which have been sitting in the pool for longer than
+    C{idle_timeout} seconds or which have been closed by the remote end are
+    discarded instead of being handed out.
+    """
+
+    # Unread response bodies up to this size are drained so the connection
+    # can be re-used
+    max_drain_size = 64 * 1024
+
+    def __init__(self, max_idle=10, idle_timeout=30):
+        """
+        @param max_idle: Maximum number of idle connections which are kept
+                         per (host, port, secure) key.
+        @type max_idle: C{int}
+
+        @param idle_timeout: Number of seconds after which an idle connection
+                             is closed and evicted from the pool.
+        @type idle_timeout: C{int}
+        """
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Return an idle connection for the provided key or None if there is no
+        usable idle connection.
+        """
+        now = time.time()
+        stale = []
+        connection = None
+
+        self._lock.acquire()
+        try:
+            idle = self._idle.get(key, [])
+
+            while idle:
+                candidate, released_at = idle.pop()
+
+                if (now - released_at) > self.idle_timeout:
+                    stale.append(candidate)
+                    continue
+
+                connection = candidate
+                break
+        finally:
+            self._lock.release()
+
+        for candidate in stale:
+            self._close(candidate)
+
+        if connection is not None and self._is_connection_dropped(connection):
+            self._close(connection)
+            # Try the next idle connection (if any)
+            return self.get(key)
+
+        return connection
+
+    def release(self, key, connection, response=None):
+        """
+        Return a connection to the pool.
+
+        Connection is only put back if the last response which has been
+        received over it has been fully read (short bodies which haven't been
+        read yet are drained) and the server didn't ask for the connection to
+        be closed. Otherwise the connection is closed.
+
+        @param response: Last response which has been received over this
+                         connection or None if the connection hasn't been
+                         used since it was acquired.
+        @type response: C{httplib.HTTPResponse}
+        """
+        if not self._is_reusable(connection, response):
+            self._close(connection)
+            return
+
+        evicted = []
+
+        self._lock.acquire()
+        try:
+            idle = self._idle.setdefault(key, [])
+            idle.append((connection, time.time()))
+
+            while len(idle) > self.max_idle:
+                evicted.append(idle.pop(0)[0])
+        finally:
+            self._lock.release()
+
+        for connection in evicted:
+            self._close(connection)
+
+    def discard(self, connection):
+        """
+        Close a connection which can't be returned to the pool.
+        """
+        self._close(connection)
+
+    def clear(self):
+        """
+        Close all the idle connections.
+        """
+        self._lock.acquire()
+        try:
+            idle, self._idle = self._idle, {}
+        finally:
+            self._lock.release()
+
+        for connections in idle.values():
+            for connection, _ in connections:
+                self._close(connection)
+
+    def _is_reusable(self, connection, response):
+        if getattr(connection, 'sock', None) is None:
+            return False
+
+        if response is None:
+            return True
+
+        if getattr(response, 'will_close', True):
+            return False
+
+        if not response.isclosed():
+            length = getattr(response, 'length', None)
+
+            if length is None or length > self.max_drain_size:
+                return False
+
+            try:
+                response.read()
+            except Exception:
+                return False
+
+        return response.isclosed()
+
+    def _is_connection_dropped(self, connection):
+        """
+        Return True if the remote end has closed an idle connection.
+
+        Idle keep-alive socket should never be readable. If it is, the server
+        has either closed the connection or sent garbage so we can't use it.
+        """
+        sock = getattr(connection, 'sock', None)
+
+        if sock is None:
+            return True
+
+        try:
+            readable, _, _ = select.select([sock], [], [], 0.0)
+        except (select.error, socket.error, ValueError):
+            return True
+
+        return bool(readable)
+
+    def _close(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+class ThreadLocalAttribute(object):
+    """
+    Descriptor for a Connection attribute which holds per-request state.
+
+    Value is stored per thread so a single Connection instance (and as such,
+    a single driver instance) can be used to issue requests from multiple
+    threads concurrently.
+    """
+
+    def __init__(self, name, default=None, default_factory=None):
+        """
+        @param name: Attribute name.
+        @type name: C{str}
+
+        @param default: Value which is returned if the attribute hasn't been
+                        set in the current thread.
+
+        @param default_factory: Optional callable which is used to construct
+                                a default value for mutable types.
+        """
+        self.name = name
+        self.default = default
+        self.default_factory = default_factory
+
+    def __get__(self, obj, owner):
+        if obj is None:
+            return self
+
+        local = obj._get_thread_local()
+
+        try:
+            return getattr(local, self.name)
+        except AttributeError:
+            if self.default_factory is None:
+                return self.default
+
+            value = self.default_factory()
+            setattr(local, self.name, value)
+            return value
+
+    def __set__(self, obj, value):
+        setattr(obj._get_thread_local(), self.name, value)
+
+    def __delete__(self, obj):
+        try:
+            delattr(obj._get_thread_local(), self.name)
+        except AttributeError:
+            pass
+
+
 class Connection(object):
     """
     A Base Connection class to derive from.
+
+    Attributes which hold the state of the current request (connection,
+    action, method, context) are stored per thread which means a Connection
+    instance can be safely shared between multiple threads.
     """
     #conn_classes = (LoggingHTTPSConnection)
     conn_classes = (LibcloudHTTPConnection, LibcloudHTTPSConnection)
 
     responseCls = Response
     rawResponseCls = RawResponse
-    connection = None
+    # Optional ConnectionPool instance. If set, keep-alive connections are
+    # re-used across requests instead of opening a new one for each request.
+    pool = None
     host = '127.0.0.1'
     port = 443
     timeout = None
     secure = 1
     driver = None
-    action = None
+
+    # Per-request state
+    connection = ThreadLocalAttribute('connection')
+    action = ThreadLocalAttribute('action')
+    method = ThreadLocalAttribute('method')
+    context = ThreadLocalAttribute('context', default_factory=dict)
+    _pool_key = ThreadLocalAttribute('_pool_key')
+    _pool_response = ThreadLocalAttribute('_pool_response')
+    _connection_used = ThreadLocalAttribute('_connection_used', False)
+    _connection_reused = ThreadLocalAttribute('_connection_reused', False)
+    _request_sent = ThreadLocalAttribute('_request_sent', False)
+    _pool_deferred = ThreadLocalAttribute('_pool_deferred',
+                                          default_factory=list)
 
     def __init__(self, secure=True, host=None, port=None, url=None,
                  timeout=None):
@@ -394,6 +803,15 @@ class Connection(object):
     def set_context(self, context):
         self.context = context
 
+    def _get_thread_local(self):
+        try:
+            return self.__dict__['_thread_local']
+        except KeyError:
+            # dict.setdefault is atomic so all the threads end up using the
+            # same threading.local instance
+            return self.__dict__.setdefault('_thread_local',
+                                            threading.local())
+
     def _tuple_from_url(self, url):
         secure = 1
         port = None
@@ -453,7 +871,23 @@ class Connection(object):
         if self.timeout and not PY25:
             kwargs.update({'timeout': self.timeout})
 
-        connection = self.conn_classes[secure](**kwargs)
+        # Hand the previous connection back to the pool before acquiring a
+        # new one
+        self._release_connection()
+
+        conn_cls = self.conn_classes[secure]
+        pool_key = None
+
+        if self.pool is not None:
+            # Connection class is part of the key so the connections are
+            # never shared between the debug and the normal connection classes
+            pool_key = (conn_cls, host, int(port), secure)
+            connection = self.pool.get(pool_key)
+
+        self._connection_reused = connection is not None
+
+        if connection is None:
+            connection = conn_cls(**kwargs)
         # You can uncoment this line, if you setup a reverse proxy server
         # which proxies to your endpoint, and lets you easily capture
         # connections in cleartext when you setup the proxy to do SSL
@@ -461,6 +895,76 @@ class Connection(object):
         #connection = self.conn_classes[False]("127.0.0.1", 8080)
 
         self.connection = connection
+        self._pool_key = pool_key
+        self._pool_response = None
+        self._connection_used = False
+
+    def _release_connection(self):
+        """
+        Return the current connection to the pool (if pooling is enabled).
+
+        The body of a "raw" response is consumed by the caller so connections
+        used for "raw" requests are only handed back to the pool once the
+        caller has fully read or closed the response.
+        """
+        self._release_deferred_connections()
+
+        pool_key = self._pool_key
+
+        if pool_key is None:
+            return
+
+        response = self._pool_response
+
+        self._pool_key = None
+        self._pool_response = None
+
+        if isinstance(response, RawResponse):
+            self._pool_deferred.append((pool_key, self.connection, response))
+            self._release_deferred_connections()
+            return
+
+        if self._connection_used and response is None:
+            # Request has been sent, but the response has never been read
+            self.pool.discard(self.connection)
+        else:
+            self.pool.release(pool_key, self.connection, response)
+
+    def _release_deferred_connections(self):
+        """
+        Hand the connections used for "raw" requests whose response has been
+        closed back to the pool.
+
+        A connection is only re-used if the whole response body has been read.
+        """
+        deferred = self._pool_deferred
+
+        if not deferred:
+            return
+
+        pending = []
+
+        for pool_key, connection, raw_response in deferred:
+            response = raw_response._response
+
+            if response is None or not response.isclosed():
+                pending.append((pool_key, connection, raw_response))
+            elif getattr(response, 'length', None) == 0:
+                self.pool.release(pool_key, connection, response)
+            else:
+                # Response has been closed before the whole body has been read
+                self.pool.discard(connection)
+
+        self._pool_deferred = pending
+
+    def _discard_connection(self):
+        if self._pool_key is not None:
+            self.pool.discard(self.connection)
+        else:
+            self.connection.close()
+
+        self._pool_key = None
+        self._pool_response = None
 
     def _user_agent(self):
         return 'libcloud/%s (%s)%s' % (
@@ -551,7 +1055,10 @@ class Connection(object):
 
         params, headers = self.pre_connect_hook(params, headers)
 
-        if params:
+        if params and '?' in action:
+            # Action already contains a query string (e.g. a sub-resource)
+            url = '&'.join((action, urlencode(params)))
+        elif params:
             url = '?'.join((action, urlencode(params)))
         else:
             url = action
@@ -560,30 +1067,86 @@ class Connection(object):
         # request twice, but it's still a hack.
         self.connect()
         try:
-            # @TODO: Should we just pass File object as body to request method
-            # instead of dealing with splitting and sending the file ourselves?
-            if raw:
-                self.connection.putrequest(method, url)
-
-                for key, value in list(headers.items()):
-                    self.connection.putheader(key, str(value))
-
-                self.connection.endheaders()
-            else:
-                self.connection.request(method=method, url=url, body=data,
-                                        headers=headers)
+            while True:
+                try:
+                    response = self._send_request(method=method, url=url,
+                                                  body=data, headers=headers,
+                                                  raw=raw)
+                    break
+                except (socket.error, httplib.HTTPException):
+                    # Pooled keep-alive connection could have been closed
+                    # by the server in the mean time. In this case we
+                    # simply retry the request using a different connection.
+                    if not self._should_retry(method, sys.exc_info()[1]):
+                        raise
+
+                    self._discard_connection()
+                    self.connect()
         except ssl.SSLError:
             e = sys.exc_info()[1]
             raise ssl.SSLError(str(e))
 
         if raw:
             response = self.rawResponseCls(connection=self)
+            self._pool_response = response
         else:
-            response = self.responseCls(response=self.connection.getresponse(),
-                                        connection=self)
+            self._pool_response = response
+
+            try:
+                response = self.responseCls(response=response,
+                                            connection=self)
+            finally:
+                self._release_connection()
 
         return response
 
+    def _send_request(self, method, url, body, headers, raw=False):
+        """
+        Send a request over the current connection.
+
+        @return: C{httplib.HTTPResponse} instance for normal requests and None
+                 for "raw" requests (only the headers are sent).
+        """
+        self._connection_used = True
+        self._request_sent = False
+
+        # @TODO: Should we just pass File object as body to request method
+        # instead of dealing with splitting and sending the file ourselves?
+        if raw:
+            self.connection.putrequest(method, url)
+
+            for key, value in list(headers.items()):
+                self.connection.putheader(key, str(value))
+
+            self.connection.endheaders()
+            return None
+
+        self.connection.request(method=method, url=url, body=body,
+                                headers=headers)
+        self._request_sent = True
+        return self.connection.getresponse()
+
+    def _should_retry(self, method, error):
+        """
+        Return True if a request which has failed with the provided error can
+        be retried using a new connection.
+
+        Only requests sent over a re-used pooled connection are retried. If
+        the request has already been fully sent, the server could have
+        processed it so it's only retried for idempotent methods. Timeouts
+        are never retried.
+        """
+        if not self._connection_reused:
+            return False
+
+        if isinstance(error, socket.timeout):
+            return False
+
+        if self._request_sent and method not in IDEMPOTENT_METHODS:
+            return False
+
+        return True
+
     def morph_action_hook(self, action):
         return self.request_path + action
 
@@ -16,11 +16,23 @@
 """
 Common utilities for OpenStack
 """
+import os
+import re
 import sys
+import time
+import hashlib
 import binascii
-import os
+import calendar
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
 
 from libcloud.utils.py3 import httplib
+from libcloud.utils.py3 import b
 
 from libcloud.common.base import ConnectionUserAndKey, Response
 from libcloud.compute.types import (LibcloudError, InvalidCredsError,
@@ -33,9 +45,19 @@ except ImportError:
 
 AUTH_API_VERSION = '1.1'
 
+# Number of seconds before the expiration at which a cached token is
+# refreshed
+AUTH_TOKEN_REFRESH_MARGIN = 5 * 60
+
+EXPIRES_RE = re.compile(r'^(\d{4})-(\d{2})-(\d{2})T(\d{2}):(\d{2}):(\d{2})'
+                        r'(?:\.\d+)?(Z|[+-]\d{2}:?\d{2})?$')
+
 __all__ = [
     "OpenStackBaseConnection",
     "OpenStackAuthConnection",
+    "OpenStackAuthTokenCache",
+    "OpenStackMemoryAuthTokenCache",
+    "OpenStackFileAuthTokenCache"
     ]
 
 
@@ -238,6 +260,318 @@ class OpenStackAuthConnection(ConnectionUserAndKey):
                                              missing required elements', e)
 
 
+def parse_auth_token_expires(value):
+    """
+    Convert token expiration time (e.g. 2011-09-18T02:44:17.000-05:00) to
+    a UNIX timestamp.
+
+    @return: C{int} or None if the value can't be parsed.
+    """
+    match = EXPIRES_RE.match(value or '')
+
+    if not match:
+        return None
+
+    groups = match.groups()
+    timestamp = calendar.timegm([int(group) for group in groups[:6]] +
+                                [0, 0, 0])
+    offset = groups[6]
+
+    if offset and offset != 'Z':
+        offset = offset.replace(':', '')
+        seconds = int(offset[1:3]) * 3600 + int(offset[3:5]) * 60
+
+        if offset[0] == '+':
+            seconds = -seconds
+
+        timestamp += seconds
+
+    return timestamp
+
+
+class OpenStackAuthTokenCache(object):
+    """
+    Base class for caches of authentication tokens which can be shared by
+    multiple connections.
+
+    Entries are dictionaries with the auth_token, auth_token_expires,
+    auth_user_info and urls (service catalog) keys. Only tokens with a known
+    expiration time are cached and they are refreshed refresh_margin
+    seconds before they expire.
+
+    If multiple callers need a token which isn't cached, only one of them
+    authenticates and the others wait for the result. Sub-classes need to
+    implement L{_get}, L{_set} and L{_delete}. They can override
+    L{_acquire} and L{_release} to extend the single flight behavior to
+    multiple processes.
+    """
+
+    def __init__(self, refresh_margin=AUTH_TOKEN_REFRESH_MARGIN, clock=None):
+        """
+        @type refresh_margin: C{int}
+        @param refresh_margin: Number of seconds before the expiration at
+                               which a token is refreshed.
+
+        @type clock: C{function}
+        @param clock: Function which returns the current time in seconds
+                      (defaults to time.time).
+        """
+        self.refresh_margin = refresh_margin
+        self.clock = clock or time.time
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def get_token(self, key, authenticate):
+        """
+        Return a valid cached entry or authenticate and cache the result.
+
+        @type key: C{tuple}
+        @param key: Cache key - (auth_url, auth_version, user_id, key
+                    digest, tenant_name, region).
+
+        @type authenticate: C{function}
+        @param authenticate: Function which authenticates and returns a new
+                             entry.
+
+        @rtype: C{dict}
+        """
+        key = self._get_key(key)
+        entry = self._get_valid(key)
+
+        if entry is not None:
+            return entry
+
+        self._acquire(key)
+
+        try:
+            # Somebody else might have authenticated while we were waiting
+            entry = self._get_valid(key)
+
+            if entry is not None:
+                return entry
+
+            entry = authenticate()
+            expires = parse_auth_token_expires(entry['auth_token_expires'])
+
+            if expires is not None and self._is_valid(expires):
+                entry = dict(entry)
+                entry['expires_timestamp'] = expires
+                self._set(key, entry)
+
+            return entry
+        finally:
+            self._release(key)
+
+    def delete(self, key, auth_token=None):
+        """
+        Remove the token from the cache (e.g. if it has been revoked).
+
+        @type auth_token: C{str}
+        @param auth_token: If provided, the entry is only removed if it
+                           still contains this token (it might have already
+                           been replaced by somebody else).
+        """
+        key = self._get_key(key)
+        self._acquire(key)
+
+        try:
+            entry = self._get(key)
+
+            if entry is None:
+                return
+
+            if auth_token is None or entry['auth_token'] == auth_token:
+                self._delete(key)
+        finally:
+            self._release(key)
+
+    def is_expiring(self, expires):
+        """
+        Return True if a token which expires at the given timestamp needs to
+        be refreshed.
+        """
+        return not self._is_valid(expires)
+
+    def _get_key(self, key):
+        return hashlib.sha1(b(repr(tuple(key)))).hexdigest()
+
+    def _get_valid(self, key):
+        entry = self._get(key)
+
+        if entry is None or not self._is_valid(entry['expires_timestamp']):
+            return None
+
+        return entry
+
+    def _is_valid(self, expires):
+        return expires - self.refresh_margin > self.clock()
+
+    def _acquire(self, key):
+        self._lock.acquire()
+
+        try:
+            lock = self._locks.setdefault(key, threading.Lock())
+        finally:
+            self._lock.release()
+
+        lock.acquire()
+
+    def _release(self, key):
+        self._locks[key].release()
+
+    def _get(self, key):
+        raise NotImplementedError('_get not implemented for this cache')
+
+    def _set(self, key, entry):
+        raise NotImplementedError('_set not implemented for this cache')
+
+    def _delete(self, key):
+        raise NotImplementedError('_delete not implemented for this cache')
+
+
+class OpenStackMemoryAuthTokenCache(OpenStackAuthTokenCache):
+    """
+    Token cache which is shared by the connections in a single process.
+    """
+
+    def __init__(self, refresh_margin=AUTH_TOKEN_REFRESH_MARGIN, clock=None):
+        super(OpenStackMemoryAuthTokenCache, self).__init__(
+            refresh_margin=refresh_margin, clock=clock)
+        self._entries = {}
+
+    def _get(self, key):
+        return self._entries.get(key, None)
+
+    def _set(self, key, entry):
+        self._entries[key] = entry
+
+    def _delete(self, key):
+        self._entries.pop(key, None)
+
+
+class OpenStackFileAuthTokenCache(OpenStackAuthTokenCache):
+    """
+    Token cache which is stored in a JSON file and shared by multiple
+    processes.
+
+    An exclusive lock on <path>.lock is held while authenticating so only
+    a single process authenticates at a time (the lock is only held by
+    threads on platforms without fcntl). The file is only readable by the
+    owner because it contains tokens.
+    """
+
+    def __init__(self, path, refresh_margin=AUTH_TOKEN_REFRESH_MARGIN,
+                 clock=None):
+        """
+        @type path: C{str}
+        @param path: Path to the cache file. It's created if it doesn't
+                     exist.
+
+        @inherits: L{OpenStackAuthTokenCache.__init__}
+        """
+        super(OpenStackFileAuthTokenCache, self).__init__(
+            refresh_margin=refresh_margin, clock=clock)
+        self.path = path
+        self._lock_files = {}
+
+    def _get(self, key):
+        return self._load().get(key, None)
+
+    def _set(self, key, entry):
+        self._update(key, entry)
+
+    def _delete(self, key):
+        self._update(key, None)
+
+    def _acquire(self, key):
+        super(OpenStackFileAuthTokenCache, self)._acquire(key)
+
+        if fcntl is None:
+            return
+
+        try:
+            fp = open(self.path + '.lock', 'a')
+            fcntl.flock(fp.fileno(), fcntl.LOCK_EX)
+        except Exception:
+            e = sys.exc_info()[1]
+            super(OpenStackFileAuthTokenCache, self)._release(key)
+            raise e
+
+        self._lock_files[key] = fp
+
+    def _release(self, key):
+        fp = self._lock_files.pop(key, None)
+
+        if fp is not None:
+            # Closing the file releases the lock
+            fp.close()
+
+        super(OpenStackFileAuthTokenCache, self)._release(key)
+
+    def _load(self):
+        try:
+            fp = open(self.path, 'r')
+        except IOError:
+            return {}
+
+        try:
+            try:
+                entries = json.loads(fp.read())
+            except ValueError:
+                # Corrupted file is treated as an empty cache
+                return {}
+        finally:
+            fp.close()
+
+        if not isinstance(entries, dict):
+            return {}
+
+        return entries
+
+    def _update(self, key, entry):
+        import tempfile
+
+        # Entries for other keys might be written by other processes without
+        # holding our lock so the file is re-read right before writing it
+        entries = self._load()
+        now = self.clock()
+
+        for name in list(entries.keys()):
+            if entries[name].get('expires_timestamp', 0) <= now:
+                del entries[name]
+
+        if entry is None:
+            entries.pop(key, None)
+        else:
+            entries[key] = entry
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(dir=directory,
+                                         prefix='.libcloud-tokens')
+
+        try:
+            fp = os.fdopen(fd, 'w')
+
+            try:
+                fp.write(json.dumps(entries))
+            finally:
+                fp.close()
+
+            try:
+                os.rename(temp_path, self.path)
+            except OSError:
+                # Windows doesn't allow renaming over an existing file
+                os.remove(self.path)
+                os.rename(temp_path, self.path)
+        except Exception:
+            e = sys.exc_info()[1]
+
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+            raise e
+
+
 class OpenStackServiceCatalog(object):
     """
     http://docs.openstack.org/api/openstack-identity-service/2.0/content/
@@ -246,6 +580,9 @@ class OpenStackServiceCatalog(object):
     'serviceCatalog' in the auth response. This will do the work of figuring
     out which services actually exist in the catalog as well as split them up
     by type, name, and region if available
+
+    The endpoints are indexed by (service_type, name, region) when the
+    catalog is built so the lookups don't depend on the catalog size.
     """
 
     _auth_version = None
@@ -258,34 +595,29 @@ class OpenStackServiceCatalog(object):
         # Check this way because there are a couple of different 2.0_*
         # auth types.
         if '2.0' in self._auth_version:
+            self._is_auth_v2 = True
             self._parse_auth_v2(service_catalog)
         elif ('1.1' in self._auth_version) or ('1.0' in self._auth_version):
+            self._is_auth_v2 = False
             self._parse_auth_v1(service_catalog)
         else:
             raise LibcloudError('auth version "%s" not supported'
                                 % (self._auth_version))
 
-    def get_endpoints(self, service_type=None, name=None):
-        eps = []
-
-        if '2.0' in self._auth_version:
-            endpoints = self._service_catalog.get(service_type, {}) \
-                                             .get(name, {})
-        elif ('1.1' in self._auth_version) or ('1.0' in self._auth_version):
-            endpoints = self._service_catalog.get(name, {})
+        self._build_indexes()
 
-        for regionName, values in endpoints.items():
-            eps.append(values[0])
+    def get_endpoints(self, service_type=None, name=None):
+        if not self._is_auth_v2:
+            # Auth 1.x catalog doesn't contain service types
+            service_type = None
 
-        return eps
+        return list(self._endpoints_index.get((service_type, name), []))
 
     def get_endpoint(self, service_type=None, name=None, region=None):
+        if not self._is_auth_v2:
+            service_type = None
 
-        if '2.0' in self._auth_version:
-            endpoint = self._service_catalog.get(service_type, {}) \
-                                            .get(name, {}).get(region, [])
-        elif ('1.1' in self._auth_version) or ('1.0' in self._auth_version):
-            endpoint = self._service_catalog.get(name, {}).get(region, [])
+        endpoint = self._endpoint_index.get((service_type, name, region), [])
 
         # ideally an endpoint either isn't found or only one match is found.
         if len(endpoint) == 1:
@@ -293,6 +625,31 @@ class OpenStackServiceCatalog(object):
         else:
             return {}
 
+    def _build_indexes(self):
+        # (service_type, name, region) -> endpoints
+        self._endpoint_index = {}
+        # (service_type, name) -> first endpoint in each region
+        self._endpoints_index = {}
+
+        if self._is_auth_v2:
+            services = []
+
+            for service_type, names in self._service_catalog.items():
+                for name, regions in names.items():
+                    services.append((service_type, name, regions))
+        else:
+            services = [(None, name, regions) for name, regions in
+                        self._service_catalog.items()]
+
+        for service_type, name, regions in services:
+            endpoints = []
+
+            for region, values in regions.items():
+                self._endpoint_index[(service_type, name, region)] = values
+                endpoints.append(values[0])
+
+            self._endpoints_index[(service_type, name)] = endpoints
+
     def _parse_auth_v1(self, service_catalog):
 
         for service, endpoints in service_catalog.items():
@@ -378,11 +735,18 @@ class OpenStackBaseConnection(ConnectionUserAndKey):
     @param ex_force_service_region: Region to use when selecting an
     service.  If not specified, a provider specific default will be used.
     @type ex_force_service_region: C{string}
+
+    @param ex_auth_token_cache: Cache which is used to share authentication
+    tokens between connections (and processes).  If not specified, the
+    class level auth_token_cache is used, which is None (no sharing) by
+    default.  Cached tokens are refreshed before they expire.
+    @type ex_auth_token_cache: L{OpenStackAuthTokenCache}
     """
 
     auth_url = None
     auth_token = None
     auth_token_expires = None
+    auth_token_cache = None
     auth_user_info = None
     service_catalog = None
     service_type = None
@@ -398,7 +762,8 @@ class OpenStackBaseConnection(ConnectionUserAndKey):
                  ex_tenant_name=None,
                  ex_force_service_type=None,
                  ex_force_service_name=None,
-                 ex_force_service_region=None):
+                 ex_force_service_region=None,
+                 ex_auth_token_cache=None):
 
         self._ex_force_base_url = ex_force_base_url
         self._ex_force_auth_url = ex_force_auth_url
@@ -407,6 +772,15 @@ class OpenStackBaseConnection(ConnectionUserAndKey):
         self._ex_force_service_type = ex_force_service_type
         self._ex_force_service_name = ex_force_service_name
         self._ex_force_service_region = ex_force_service_region
+        self._ex_force_auth_token = ex_force_auth_token
+        self._auth_token_expires_timestamp = None
+        # Parsed (host, port, secure, request_path) tuples for the endpoint
+        # URLs which are valid for the current token
+        self._endpoint_tuples = {}
+
+        if ex_auth_token_cache is not None:
+            self.auth_token_cache = ex_auth_token_cache
+
         if ex_force_auth_token:
             self.auth_token = ex_force_auth_token
 
@@ -458,42 +832,118 @@ class OpenStackBaseConnection(ConnectionUserAndKey):
     def request(self, **kwargs):
         return super(OpenStackBaseConnection, self).request(**kwargs)
 
+    def _send_request(self, method, url, body, headers, raw=False):
+        response = super(OpenStackBaseConnection, self)._send_request(
+            method=method, url=url, body=body, headers=headers, raw=raw)
+
+        if response is None or response.status != httplib.UNAUTHORIZED or \
+           not self._uses_cached_auth_token():
+            return response
+
+        # Cached token might have been revoked (e.g. after a password
+        # change). It's removed from the cache and the request is retried
+        # once with a new token.
+        response.read()
+        self.auth_token_cache.delete(self._get_auth_token_cache_key(),
+                                     auth_token=self.auth_token)
+        self.auth_token = None
+        self._populate_hosts_and_request_paths()
+
+        headers = dict(headers)
+        headers['X-Auth-Token'] = self.auth_token
+        return super(OpenStackBaseConnection, self)._send_request(
+            method=method, url=url, body=body, headers=headers, raw=raw)
+
+    def _uses_cached_auth_token(self):
+        return self.auth_token_cache is not None and \
+            not self._ex_force_auth_token
+
     def _populate_hosts_and_request_paths(self):
         """
         OpenStack uses a separate host for API calls which is only provided
         after an initial authentication request.
         """
 
-        if not self.auth_token:
-            aurl = self.auth_url
+        cache = self.auth_token_cache
 
-            if self._ex_force_auth_url != None:
-                aurl = self._ex_force_auth_url
+        if self._uses_cached_auth_token():
+            expires = self._auth_token_expires_timestamp
 
-            if aurl == None:
-                raise LibcloudError('OpenStack instance must ' +
-                                    'have auth_url set')
+            if not self.auth_token or expires is None or \
+               cache.is_expiring(expires):
+                entry = cache.get_token(self._get_auth_token_cache_key(),
+                                        self._authenticate)
+                self._set_auth_token(entry)
+        elif not self.auth_token:
+            self._set_auth_token(self._authenticate())
 
-            osa = OpenStackAuthConnection(self, aurl, self._auth_version,
-                                          self.user_id, self.key,
-                                          tenant_name=self._ex_tenant_name,
-                                          timeout=self.timeout)
+        # Set up connection info
+        url = self._ex_force_base_url or self.get_endpoint()
 
-            # may throw InvalidCreds, etc
-            osa.authenticate()
+        try:
+            endpoint = self._endpoint_tuples[url]
+        except KeyError:
+            endpoint = self._tuple_from_url(url)
+            self._endpoint_tuples[url] = endpoint
 
-            self.auth_token = osa.auth_token
-            self.auth_token_expires = osa.auth_token_expires
-            self.auth_user_info = osa.auth_user_info
+        (self.host, self.port, self.secure, self.request_path) = endpoint
 
-            # pull out and parse the service catalog
-            self.service_catalog = OpenStackServiceCatalog(osa.urls,
-                    ex_force_auth_version=self._auth_version)
+    def _authenticate(self):
+        """
+        Authenticate against the identity service.
 
-        # Set up connection info
-        url = self._ex_force_base_url or self.get_endpoint()
-        (self.host, self.port, self.secure, self.request_path) = \
-                self._tuple_from_url(url)
+        @return: C{dict} with auth_token, auth_token_expires, auth_user_info
+                 and urls keys.
+        """
+        aurl = self._get_auth_url()
+
+        osa = OpenStackAuthConnection(self, aurl, self._auth_version,
+                                      self.user_id, self.key,
+                                      tenant_name=self._ex_tenant_name,
+                                      timeout=self.timeout)
+
+        # may throw InvalidCreds, etc
+        osa.authenticate()
+
+        return {'auth_token': osa.auth_token,
+                'auth_token_expires': getattr(osa, 'auth_token_expires',
+                                              None),
+                'auth_user_info': osa.auth_user_info,
+                'urls': osa.urls}
+
+    def _set_auth_token(self, entry):
+        # Endpoints need to be resolved again using the new catalog
+        self._endpoint_tuples = {}
+
+        self.auth_token = entry['auth_token']
+        self.auth_token_expires = entry['auth_token_expires']
+        self.auth_user_info = entry['auth_user_info']
+        self._auth_token_expires_timestamp = entry.get('expires_timestamp',
+                                                       None)
+
+        # pull out and parse the service catalog
+        self.service_catalog = OpenStackServiceCatalog(entry['urls'],
+                ex_force_auth_version=self._auth_version)
+
+    def _get_auth_url(self):
+        aurl = self.auth_url
+
+        if self._ex_force_auth_url != None:
+            aurl = self._ex_force_auth_url
+
+        if aurl == None:
+            raise LibcloudError('OpenStack instance must ' +
+                                'have auth_url set')
+
+        return aurl
+
+    def _get_auth_token_cache_key(self):
+        # The secret itself isn't stored, but different secrets need to
+        # use different entries
+        key_digest = hashlib.sha1(b(self.key)).hexdigest()
+        region = self._ex_force_service_region or self.service_region
+        return (self._get_auth_url(), self._auth_version, self.user_id,
+                key_digest, self._ex_tenant_name, region)
 
     def _add_cache_busting_to_params(self, params):
         cache_busting_number = binascii.hexlify(os.urandom(8))
@@ -516,6 +966,7 @@ class OpenStackDriverMixin(object):
         self._ex_force_service_name = kwargs.get('ex_force_service_name', None)
         self._ex_force_service_region = kwargs.get('ex_force_service_region',
                                                    None)
+        self._ex_auth_token_cache = kwargs.get('ex_auth_token_cache', None)
 
     def openstack_connection_kwargs(self):
         """
@@ -539,4 +990,6 @@ class OpenStackDriverMixin(object):
             rv['ex_force_service_name'] = self._ex_force_service_name
         if self._ex_force_service_region:
             rv['ex_force_service_region'] = self._ex_force_service_region
+        if self._ex_auth_token_cache is not None:
+            rv['ex_auth_token_cache'] = self._ex_auth_token_cache
         return rv
@@ -13,6 +13,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import sys
+import threading
+
+from libcloud.utils.py3 import next
+
 __all__ = [
     "LibcloudError",
     "MalformedResponseError",
@@ -81,26 +86,80 @@ InvalidCredsException = InvalidCredsError
 
 
 class LazyList(object):
-
-    def __init__(self, get_more, value_dict=None):
+    """
+    A list-like object which loads its items lazily, one page at a time.
+
+    Pages are retrieved by calling get_more(last_key, value_dict) which
+    returns a (items, last_key, exhausted) tuple. Iteration, membership
+    tests, indexing and slicing only load as many pages as they need, while
+    len() and repr() (and as such also list()) load all of them.
+    """
+
+    def __init__(self, get_more, value_dict=None, prefetch=False,
+                 keep_pages=True):
+        """
+        @type get_more: C{function}
+        @param get_more: Function which retrieves a single page.
+
+        @type value_dict: C{dict}
+        @param value_dict: Dictionary which is passed to get_more.
+
+        @type prefetch: C{bool}
+        @param prefetch: If True, the next page is retrieved in a background
+                         thread while the current one is being consumed.
+
+        @type keep_pages: C{bool}
+        @param keep_pages: If False, iterating over the list doesn't store the
+                           retrieved items, so the memory usage is bounded by
+                           the page size. Each iteration starts a new listing
+                           in this mode.
+        """
         self._data = []
-        self._last_key = None
-        self._exhausted = False
+        self._pages = None
         self._all_loaded = False
         self._get_more = get_more
         self._value_dict = value_dict or {}
+        self._prefetch = prefetch
+        self._keep_pages = keep_pages
 
     def __iter__(self):
-        if not self._all_loaded:
-            self._load_all()
+        if not self._keep_pages and not self._all_loaded:
+            for page in self._iter_pages():
+                for item in page:
+                    yield item
+            return
+
+        index = 0
 
-        data = self._data
-        for i in data:
-            yield i
+        while True:
+            while index < len(self._data):
+                yield self._data[index]
+                index += 1
+
+            if self._all_loaded:
+                return
+
+            self._load_next_page()
 
     def __getitem__(self, index):
-        if index >= len(self._data) and not self._all_loaded:
+        if isinstance(index, slice):
+            start, stop, step = index.start, index.stop, index.step or 1
+
+            if step > 0:
+                length = stop
+            else:
+                length = start is not None and start + 1 or None
+
+            if length is None or length < 0 or \
+               (start is not None and start < 0) or \
+               (stop is not None and stop < 0):
+                self._load_all()
+            else:
+                self._load_until(length)
+        elif index < 0:
             self._load_all()
+        else:
+            self._load_until(index + 1)
 
         return self._data[index]
 
@@ -108,16 +167,85 @@ class LazyList(object):
         self._load_all()
         return len(self._data)
 
+    def __nonzero__(self):
+        self._load_until(1)
+        return len(self._data) > 0
+
+    __bool__ = __nonzero__
+
     def __repr__(self):
         self._load_all()
         repr_string = ', ' .join([repr(item) for item in self._data])
         repr_string = '[%s]' % (repr_string)
         return repr_string
 
+    def _iter_pages(self):
+        """
+        Return a generator which yields pages from the beginning of the
+        listing.
+        """
+        last_key = None
+        exhausted = False
+        pending = None
+
+        while not exhausted:
+            if pending is not None:
+                newdata, last_key, exhausted = pending.result()
+            else:
+                newdata, last_key, exhausted = \
+                    self._get_more(last_key=last_key,
+                                   value_dict=self._value_dict)
+
+            pending = None
+
+            if self._prefetch and not exhausted:
+                pending = _PageRequest(self._get_more, last_key=last_key,
+                                       value_dict=self._value_dict)
+
+            yield newdata
+
+    def _load_next_page(self):
+        if self._pages is None:
+            self._pages = self._iter_pages()
+
+        try:
+            self._data.extend(next(self._pages))
+        except StopIteration:
+            self._pages = None
+            self._all_loaded = True
+
+    def _load_until(self, length):
+        while len(self._data) < length and not self._all_loaded:
+            self._load_next_page()
+
     def _load_all(self):
-        while not self._exhausted:
-            newdata, self._last_key, self._exhausted = \
-                     self._get_more(last_key=self._last_key,
-                                    value_dict=self._value_dict)
-            self._data.extend(newdata)
-        self._all_loaded = True
+        while not self._all_loaded:
+            self._load_next_page()
+
+
+class _PageRequest(object):
+    """
+    Calls get_more in a background thread.
+    """
+
+    def __init__(self, get_more, **kwargs):
+        self._result = None
+        self._error = None
+        self._thread = threading.Thread(target=self._run,
+                                        args=(get_more, kwargs))
+        self._thread.setDaemon(True)
+        self._thread.start()
+
+    def _run(self, get_more, kwargs):
+        try:
+            self._result = get_more(**kwargs)
+        except Exception:
+            self._error = sys.exc_info()[1]
+
+    def result(self):
+        self._thread.join()
+
+        if self._error is not None:
+            raise self._error
+
+        return self._result
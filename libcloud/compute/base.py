@@ -18,14 +18,21 @@ Provides base classes for working with drivers
 """
 
 import sys
+import copy
 import time
+import random
 import hashlib
+import threading
 import os
 import socket
 import struct
 import binascii
 
 from libcloud.utils.py3 import b
+from libcloud.utils.py3 import Queue
+from libcloud.utils.py3 import getargspec
+from libcloud.utils.cache import TTLCache, FileTTLCache
+from libcloud.utils.concurrency import DEFAULT_CONCURRENCY, imap_unordered
 
 import libcloud.compute.ssh
 from libcloud.pricing import get_size_price
@@ -48,9 +55,17 @@ NODE_ONLINE_WAIT_TIMEOUT = 10 * 60
 # script.
 SSH_CONNECT_TIMEOUT = 5 * 60
 
+# Maximum number of results stored in the metadata cache
+METADATA_CACHE_SIZE = 100
+
+_CACHE_MISS = object()
+
+_NODE_WAITERS_LOCK = threading.Lock()
+
 
 __all__ = [
     "Node",
+    "CompactNode",
     "NodeState",
     "NodeSize",
     "NodeImage",
@@ -58,6 +73,8 @@ __all__ = [
     "NodeAuthSSHKey",
     "NodeAuthPassword",
     "NodeDriver",
+    "NodeWaiter",
+    "NodeWaitRequest",
 
     # @@TR: do the following need exporting?
     "ConnectionKey",
@@ -235,6 +252,48 @@ class Node(UuidMixin):
                    self.driver.name))
 
 
+class CompactNode(Node):
+    """
+    Node which uses less memory, meant for drivers and applications which
+    list a large number of nodes.
+
+    The attributes are stored in slots instead of a per-instance
+    dictionary (which is only created if an attribute which isn't listed in
+    __slots__ is set) and the "extra" dictionary is only created once it's
+    accessed. Otherwise it behaves exactly like a Node.
+
+    Drivers create compact nodes when their nodeCls attribute is set to
+    this class.
+    """
+
+    __slots__ = ('id', 'name', 'state', 'public_ips', 'private_ips',
+                 'driver', 'size', 'image', '_extra', '_uuid')
+
+    def __init__(self, id, name, state, public_ips, private_ips,
+                 driver, size=None, image=None, extra=None):
+        self.id = str(id) if id else None
+        self.name = name
+        self.state = state
+        self.public_ips = public_ips if public_ips else []
+        self.private_ips = private_ips if private_ips else []
+        self.driver = driver
+        self.size = size
+        self.image = image
+        self._extra = extra or None
+        self._uuid = None
+
+    def _get_extra(self):
+        if self._extra is None:
+            self._extra = {}
+
+        return self._extra
+
+    def _set_extra(self, value):
+        self._extra = value
+
+    extra = property(fget=_get_extra, fset=_set_extra)
+
+
 class NodeSize(UuidMixin):
     """
     A Base NodeSize class to derive from.
@@ -416,6 +475,342 @@ class StorageVolume(UuidMixin):
                self.id, self.size, self.driver.name)
 
 
+class NodeWaitRequest(object):
+    """
+    Pending request for a node to become running, returned by
+    L{NodeWaiter.add}.
+    """
+
+    def __init__(self, node, timeout, ssh_interface, force_ipv4, callback):
+        self.node = node
+        self.timeout = timeout
+        self.deadline = time.time() + timeout
+        self.ssh_interface = ssh_interface
+        self.force_ipv4 = force_ipv4
+        self.callback = callback
+
+        self.ip_addresses = None
+        self.error = None
+        self._event = threading.Event()
+
+    def done(self):
+        """
+        Return True if the node is running or the request has failed.
+
+        @rtype: C{bool}
+        """
+        return self._event.isSet()
+
+    def result(self, timeout=None):
+        """
+        Block until the request is done.
+
+        @type timeout: C{float}
+        @param timeout: How many seconds to wait (defaults to waiting until
+                        the request itself times out).
+
+        @return: C{(Node, ip_addresses)} tuple.
+        """
+        self._event.wait(timeout)
+
+        if not self.done():
+            raise LibcloudError(value='Timed out after %s seconds' %
+                                (timeout), driver=self.node.driver)
+
+        if self.error is not None:
+            raise self.error
+
+        return (self.node, self.ip_addresses)
+
+    def _get_ip_addresses(self, node):
+        addresses = getattr(node, self.ssh_interface)
+
+        if not self.force_ipv4:
+            return list(addresses)
+
+        return [address for address in addresses if
+                is_valid_ip_address(address=address, family=socket.AF_INET)]
+
+    def _finish(self, node=None, ip_addresses=None, error=None):
+        if node is not None:
+            self.node = node
+
+        self.ip_addresses = ip_addresses
+        self.error = error
+
+        # The callback is called first so its side effects are visible once
+        # result() returns
+        try:
+            if self.callback is not None:
+                self.callback(self.node, ip_addresses, error)
+        finally:
+            self._event.set()
+
+
+class NodeWaiter(object):
+    """
+    Waits for multiple nodes to become running and have an IP address
+    assigned.
+
+    All the pending nodes are checked using a single node listing per poll
+    interval which is done by a background thread. If the driver supports
+    it (supports_list_nodes_by_id), only the pending nodes are listed. The
+    poll interval grows exponentially (with jitter) while none of the nodes
+    is ready and is reset when a new node is added.
+    """
+
+    def __init__(self, driver, wait_period=3, max_wait_period=30, backoff=1.5,
+                 jitter=0.1):
+        """
+        @type driver: L{NodeDriver}
+        @param driver: Driver which is used to list the nodes.
+
+        @type wait_period: C{float}
+        @param wait_period: Initial number of seconds between polls.
+
+        @type max_wait_period: C{float}
+        @param max_wait_period: Maximum number of seconds between polls.
+
+        @type backoff: C{float}
+        @param backoff: Multiplier which is applied to the poll interval
+                        after each poll without progress.
+
+        @type jitter: C{float}
+        @param jitter: Maximum relative random deviation of the interval.
+        """
+        self.driver = driver
+        self.wait_period = wait_period
+        self.max_wait_period = max(wait_period, max_wait_period)
+        self.backoff = backoff
+        self.jitter = jitter
+
+        self._pending = []
+        self._interval = wait_period
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def add(self, node, timeout=NODE_ONLINE_WAIT_TIMEOUT,
+            ssh_interface='public_ips', force_ipv4=True, callback=None):
+        """
+        Start waiting for a node.
+
+        @type node: L{Node}
+        @param node: Node instance.
+
+        @type timeout: C{float}
+        @param timeout: How many seconds to wait before timing out.
+
+        @type ssh_interface: C{str}
+        @param ssh_interface: The interface to wait for. Default is
+                              'public_ips', other option is 'private_ips'.
+
+        @type force_ipv4: C{bool}
+        @param force_ipv4: Ignore ipv6 IP addresses (default is True).
+
+        @type callback: C{function}
+        @param callback: Function which is called with (node, ip_addresses,
+                         error) arguments once the request is done. It's
+                         called from the polling thread.
+
+        @rtype: L{NodeWaitRequest}
+        """
+        request = self._get_request(node=node, timeout=timeout,
+                                    ssh_interface=ssh_interface,
+                                    force_ipv4=force_ipv4, callback=callback)
+        self._add_requests([request])
+        return request
+
+    def wait(self, nodes, **kwargs):
+        """
+        Block until all the nodes are running.
+
+        Takes the same keyword arguments as L{add}.
+
+        @type nodes: C{list} of L{Node}
+        @param nodes: Node instances.
+
+        @return: C{list} of C{(Node, ip_addresses)} tuples in the same order
+                 as nodes. The first error is raised if any of the requests
+                 fails.
+        """
+        requests = [self._get_request(node=node, **kwargs)
+                    for node in nodes]
+
+        # All the nodes are registered at once so the first poll covers all
+        # of them
+        self._add_requests(requests)
+        return [request.result() for request in requests]
+
+    def _get_request(self, node, timeout=NODE_ONLINE_WAIT_TIMEOUT,
+                     ssh_interface='public_ips', force_ipv4=True,
+                     callback=None):
+        if ssh_interface not in ['public_ips', 'private_ips']:
+            raise ValueError('ssh_interface argument must either be' +
+                             'public_ips or private_ips')
+
+        return NodeWaitRequest(node=node, timeout=timeout,
+                               ssh_interface=ssh_interface,
+                               force_ipv4=force_ipv4, callback=callback)
+
+    def _add_requests(self, requests):
+        self._lock.acquire()
+
+        try:
+            self._pending.extend(requests)
+            self._interval = self.wait_period
+
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run)
+                self._thread.setDaemon(True)
+                self._thread.start()
+        finally:
+            self._lock.release()
+
+    def poll(self, requests=None):
+        """
+        List the nodes once and finish the requests for nodes which are
+        running or have timed out.
+
+        @return: Number of requests which have been finished.
+        @rtype: C{int}
+        """
+        if requests is None:
+            self._lock.acquire()
+
+            try:
+                requests = list(self._pending)
+            finally:
+                self._lock.release()
+
+        if not requests:
+            return 0
+
+        try:
+            nodes = self._list_nodes(requests)
+        except Exception:
+            e = sys.exc_info()[1]
+            self._finish_requests([(request, None, None, e) for request in
+                                   requests])
+            return len(requests)
+
+        nodes_by_uuid = {}
+
+        for node in nodes:
+            nodes_by_uuid.setdefault(node.uuid, []).append(node)
+
+        finished = []
+        now = time.time()
+
+        for request in requests:
+            matches = nodes_by_uuid.get(request.node.uuid, [])
+
+            if len(matches) > 1:
+                error = LibcloudError(value=('Booted single node[%s], ' %
+                                             request.node +
+                                             'but multiple nodes have same '
+                                             'UUID'), driver=self.driver)
+                finished.append((request, None, None, error))
+                continue
+
+            if len(matches) == 1 and matches[0].state == NodeState.RUNNING:
+                ip_addresses = request._get_ip_addresses(matches[0])
+
+                if ip_addresses:
+                    finished.append((request, matches[0], ip_addresses,
+                                     None))
+                    continue
+
+            if request.deadline <= now:
+                error = LibcloudError(value='Timed out after %s seconds' %
+                                      (request.timeout), driver=self.driver)
+                finished.append((request, None, None, error))
+
+        self._finish_requests(finished)
+        return len(finished)
+
+    def _list_nodes(self, requests):
+        if getattr(self.driver, 'supports_list_nodes_by_id', False):
+            node_ids = [request.node.id for request in requests]
+
+            try:
+                return self.driver.list_nodes(ex_node_ids=node_ids)
+            except Exception:
+                # Newly created nodes might not be visible to the filtered
+                # listing yet. Other errors (e.g. auth or throttling) are
+                # propagated.
+                e = sys.exc_info()[1]
+
+                if not self.driver._is_node_not_found_error(e):
+                    raise
+
+        return self.driver.list_nodes()
+
+    def _finish_requests(self, finished):
+        if not finished:
+            return
+
+        self._lock.acquire()
+
+        try:
+            for request, _, _, _ in finished:
+                if request in self._pending:
+                    self._pending.remove(request)
+        finally:
+            self._lock.release()
+
+        for request, node, ip_addresses, error in finished:
+            try:
+                request._finish(node=node, ip_addresses=ip_addresses,
+                                error=error)
+            except Exception:
+                # Errors in callbacks must not stop the polling thread
+                pass
+
+    def _run(self):
+        while True:
+            self._lock.acquire()
+
+            try:
+                if not self._pending:
+                    self._thread = None
+                    return
+
+                requests = list(self._pending)
+            finally:
+                self._lock.release()
+
+            try:
+                finished = self.poll(requests)
+            except Exception:
+                e = sys.exc_info()[1]
+                self._finish_requests([(request, None, None, e) for request
+                                       in requests])
+                continue
+
+            self._lock.acquire()
+
+            try:
+                if not self._pending:
+                    self._thread = None
+                    return
+
+                if finished:
+                    self._interval = self.wait_period
+
+                interval = self._interval * random.uniform(1 - self.jitter,
+                                                           1 + self.jitter)
+                deadline = min([request.deadline for request in
+                                self._pending])
+                self._interval = min(self._interval * self.backoff,
+                                     self.max_wait_period)
+            finally:
+                self._lock.release()
+
+            # Wake up in time to time out the first pending request
+            delay = min(interval, deadline - time.time())
+            time.sleep(max(delay, 0))
+
+
 class NodeDriver(BaseDriver):
     """
     A base NodeDriver class to derive from
@@ -427,6 +822,11 @@ class NodeDriver(BaseDriver):
     """
 
     connectionCls = ConnectionKey
+
+    # Class of the nodes which are returned by list_nodes (set it to
+    # CompactNode to reduce memory usage when listing many nodes)
+    nodeCls = Node
+
     name = None
     type = None
     port = None
@@ -444,12 +844,163 @@ class NodeDriver(BaseDriver):
 
     NODE_STATE_MAP = {}
 
+    # Number of seconds for which results of the methods which return nearly
+    # static data are cached once the cache has been enabled using
+    # enable_metadata_cache
+    metadata_cache_ttls = {
+        'list_sizes': 24 * 60 * 60,
+        'list_locations': 60 * 60,
+        'list_images': 10 * 60
+    }
+
+    # Methods which modify data returned by one of the cached methods. Cached
+    # results of those methods are invalidated when one of them is called.
+    metadata_cache_invalidators = {
+        'create_image': ['list_images'],
+        'ex_save_image': ['list_images'],
+        'ex_edit_image': ['list_images'],
+        'ex_delete_image': ['list_images']
+    }
+
+    # L{TTLCache} instance which is used if the metadata cache is enabled
+    metadata_cache = None
+
+    # True if list_nodes takes ex_node_ids argument which limits the listing
+    # to the nodes with the given ids
+    supports_list_nodes_by_id = False
+
     def __init__(self, key, secret=None, secure=True, host=None, port=None,
                  api_version=None, **kwargs):
         super(NodeDriver, self).__init__(key=key, secret=secret, secure=secure,
                                          host=host, port=port,
                                          api_version=api_version, **kwargs)
 
+    def enable_metadata_cache(self, ttls=None, path=None,
+                              max_size=METADATA_CACHE_SIZE):
+        """
+        Cache results of the methods which return nearly static data
+        (list_sizes, list_images and list_locations by default).
+
+        Cached results are keyed on the method arguments and returned until
+        they expire or are invalidated. Methods which are listed in
+        metadata_cache_invalidators (e.g. create_image) invalidate results of
+        the related methods.
+
+        @type ttls: C{dict}
+        @param ttls: Dictionary which maps a method name to the number of
+                     seconds for which its results are cached (defaults to
+                     metadata_cache_ttls).
+
+        @type path: C{str}
+        @param path: If provided, the cache is persisted to this file and
+                     shared between processes. Cached objects are stored
+                     without the driver reference.
+
+        Callers get copies of the cached objects so modifying them doesn't
+        affect the cache.
+
+        @type max_size: C{int}
+        @param max_size: Maximum number of cached results.
+
+        @rtype: C{None}
+        """
+        if ttls is None:
+            ttls = self.metadata_cache_ttls
+
+        self.disable_metadata_cache()
+
+        if path:
+            cache = FileTTLCache(path=path, max_size=max_size)
+        else:
+            cache = TTLCache(max_size=max_size)
+
+        self.metadata_cache = cache
+        self._metadata_cache_stats = {}
+        self._metadata_cache_stats_lock = threading.Lock()
+
+        for method_name, ttl in ttls.items():
+            func = getattr(self.__class__, method_name, None)
+
+            if func is None or not ttl:
+                continue
+
+            self._metadata_cache_stats[method_name] = {'hits': 0, 'misses': 0}
+            setattr(self, method_name,
+                    self._get_cached_method(method_name, func, ttl))
+
+        for method_name, invalidated in \
+                self.metadata_cache_invalidators.items():
+            func = getattr(self.__class__, method_name, None)
+
+            if func is None:
+                continue
+
+            setattr(self, method_name,
+                    self._get_invalidating_method(func, invalidated))
+
+    def disable_metadata_cache(self):
+        """
+        Disable the metadata cache and discard cached results.
+
+        @rtype: C{None}
+        """
+        if self.metadata_cache is None:
+            return
+
+        method_names = list(self.metadata_cache_invalidators.keys()) + \
+            list(self._metadata_cache_stats.keys())
+
+        for method_name in method_names:
+            if method_name in self.__dict__:
+                delattr(self, method_name)
+
+        self.metadata_cache = None
+
+    def invalidate_metadata_cache(self, method_name=None):
+        """
+        Discard cached results.
+
+        @type method_name: C{str}
+        @param method_name: If provided, only results of this method are
+                            discarded.
+
+        @rtype: C{None}
+        """
+        if self.metadata_cache is None:
+            return
+
+        prefix = self._get_metadata_cache_prefix()
+
+        def predicate(key):
+            return key[0] == prefix and (method_name is None or
+                                         key[1] == method_name)
+
+        self.metadata_cache.clear(predicate=predicate)
+
+    def get_metadata_cache_stats(self):
+        """
+        Return number of cache hits and misses for each of the cached
+        methods.
+
+        @rtype: C{dict}
+        @return: Dictionary which maps a method name to a dictionary with
+                 'hits' and 'misses' keys.
+        """
+        if self.metadata_cache is None:
+            return {}
+
+        stats = {}
+
+        self._metadata_cache_stats_lock.acquire()
+
+        try:
+            for method_name, values in self._metadata_cache_stats.items():
+                stats[method_name] = dict(values)
+        finally:
+            self._metadata_cache_stats_lock.release()
+
+        return stats
+
     def create_node(self, **kwargs):
         """Create a new node instance.
 
@@ -618,31 +1169,18 @@ class NodeDriver(BaseDriver):
         @keyword    ssh_interface: The interface to wait for. Default is
                                    'public_ips', other option is 'private_ips'.
         @type       ssh_interface: C{str}
-        """
-        if not libcloud.compute.ssh.have_paramiko:
-            raise RuntimeError('paramiko is not installed. You can install ' +
-                               'it using pip: pip install paramiko')
-
-        password = None
-
-        if 'create_node' not in self.features:
-            raise NotImplementedError(
-                'deploy_node not implemented for this driver')
-        elif 'generates_password' not in self.features["create_node"]:
-            if 'password' not in self.features["create_node"] and \
-               'ssh_key' not in self.features["create_node"]:
-                raise NotImplementedError(
-                    'deploy_node not implemented for this driver')
-
-            if 'auth' not in kwargs:
-                value = os.urandom(16)
-                kwargs['auth'] = NodeAuthPassword(binascii.hexlify(value))
 
-            if 'ssh_key' not in kwargs:
-                password = kwargs['auth'].password
+        @keyword    ssh_client_class: SSH client class which is used to
+                                      connect to the node (default is
+                                      L{ParamikoSSHClient} if paramiko is
+                                      installed). Use L{ShellOutSSHClient}
+                                      to use the system ssh binary.
+        @type       ssh_client_class: C{class}
+        """
+        self._check_deploy_supported(kwargs)
 
+        password = self._prepare_deploy_auth(kwargs)
         node = self.create_node(**kwargs)
-        max_tries = kwargs.get('max_tries', 3)
 
         if 'generates_password' in self.features['create_node']:
             password = node.extra.get('password')
@@ -655,36 +1193,238 @@ class NodeDriver(BaseDriver):
                 wait_period=3, timeout=NODE_ONLINE_WAIT_TIMEOUT,
                 ssh_interface=ssh_interface)
 
-            if password:
-                node.extra['password'] = password
-
-            ssh_username = kwargs.get('ssh_username', 'root')
-            ssh_port = kwargs.get('ssh_port', 22)
-            ssh_timeout = kwargs.get('ssh_timeout', 10)
-            ssh_key_file = kwargs.get('ssh_key', None)
-            timeout = kwargs.get('timeout', SSH_CONNECT_TIMEOUT)
-
-            ssh_client = SSHClient(hostname=ip_addresses[0],
-                                   port=ssh_port, username=ssh_username,
-                                   password=password,
-                                   key=ssh_key_file,
-                                   timeout=ssh_timeout)
-
-            # Connect to the SSH server running on the node
-            ssh_client = self._ssh_client_connect(ssh_client=ssh_client,
-                                                  timeout=timeout)
-
-            # Execute the deployment task
-            self._run_deployment_script(task=kwargs['deploy'],
-                                        node=node,
-                                        ssh_client=ssh_client,
-                                        max_tries=max_tries)
+            self._deploy_running_node(node=node, ip_addresses=ip_addresses,
+                                      password=password, kwargs=kwargs)
         except Exception:
             e = sys.exc_info()[1]
             raise DeploymentError(node=node, original_exception=e, driver=self)
 
         return node
 
+    def deploy_nodes(self, nodes, concurrency=DEFAULT_CONCURRENCY, **kwargs):
+        """
+        Create multiple nodes and run a deployment on each of them.
+
+        Nodes are created concurrently, all the created nodes are waited for
+        using a shared L{NodeWaiter} and the deployment is started on each
+        node as soon as it's running.
+
+        >>> from libcloud.compute.drivers.dummy import DummyNodeDriver
+        >>> from libcloud.compute.deployment import ScriptDeployment
+        >>> driver = DummyNodeDriver(0)
+        >>> script = ScriptDeployment("yum -y install emacs strace tcpdump")
+        >>> def d():
+        ...     try:
+        ...         driver.deploy_nodes([{'name': 'web1'}], deploy=script)
+        ...     except NotImplementedError:
+        ...         print ("not implemented for dummy driver")
+        >>> d()
+        not implemented for dummy driver
+
+        @inherits: L{NodeDriver.deploy_node}
+
+        @param nodes: An iterable of dictionaries with create_node keyword
+                      arguments which are specific to each node (e.g.
+                      name). They are merged with the shared keyword
+                      arguments.
+        @type nodes: C{iterable} of C{dict}
+
+        @param concurrency: Maximum number of nodes which are created and
+                            maximum number of deployments which run in
+                            parallel.
+        @type concurrency: C{int}
+
+        @return: A generator which yields (item, L{Node}, error) tuples in
+                 the order in which the deployments finish. item is the
+                 dictionary from nodes, error is None on success, a
+                 L{DeploymentError} if the node has been created and the
+                 exception raised by create_node otherwise (node is None in
+                 that case). If the generator is closed before all the
+                 results have been yielded, no more nodes are created, but
+                 the nodes which have already been created are neither
+                 destroyed nor reported. Use list_nodes to find them.
+        @rtype: C{generator}
+        """
+        self._check_deploy_supported(kwargs)
+
+        items = list(nodes)
+        ssh_interface = kwargs.get('ssh_interface', 'public_ips')
+        waiter = self._get_node_waiter(wait_period=3)
+
+        # Running nodes which are ready for the deployment and finished
+        # deployments
+        ready = Queue.Queue()
+        results = Queue.Queue()
+        # Set once the caller has stopped consuming the results
+        stopped = threading.Event()
+
+        def create(item):
+            if stopped.isSet():
+                return None
+
+            node_kwargs = dict(kwargs)
+            node_kwargs.update(item)
+
+            password = self._prepare_deploy_auth(node_kwargs)
+            node = self.create_node(**node_kwargs)
+
+            if 'generates_password' in self.features['create_node']:
+                password = node.extra.get('password')
+
+            return node_kwargs, node, password
+
+        def get_callback(item, node_kwargs, password):
+            def callback(node, ip_addresses, error):
+                ready.put((item, node_kwargs, node, ip_addresses, password,
+                           error))
+            return callback
+
+        def create_nodes():
+            for item, result, error in imap_unordered(create, items,
+                                                      concurrency):
+                if error is not None:
+                    results.put((item, None, error))
+                    continue
+
+                if result is None:
+                    # Node hasn't been created because the caller has stopped
+                    # consuming the results
+                    continue
+
+                node_kwargs, node, password = result
+                callback = get_callback(item, node_kwargs, password)
+
+                try:
+                    waiter.add(node, timeout=NODE_ONLINE_WAIT_TIMEOUT,
+                               ssh_interface=ssh_interface,
+                               callback=callback)
+                except Exception:
+                    callback(node, None, sys.exc_info()[1])
+
+        def deploy_worker():
+            while True:
+                entry = ready.get()
+
+                if entry is None:
+                    return
+
+                item, node_kwargs, node, ip_addresses, password, error = entry
+
+                if error is None:
+                    try:
+                        self._deploy_running_node(node=node,
+                                                  ip_addresses=ip_addresses,
+                                                  password=password,
+                                                  kwargs=node_kwargs)
+                    except Exception:
+                        error = sys.exc_info()[1]
+
+                if error is not None:
+                    error = DeploymentError(node=node, original_exception=error,
+                                            driver=self)
+
+                results.put((item, node, error))
+
+        def iterate():
+            threads = []
+            thread = threading.Thread(target=create_nodes)
+            thread.setDaemon(True)
+            thread.start()
+
+            for _ in range(max(1, min(concurrency, len(items)))):
+                thread = threading.Thread(target=deploy_worker)
+                thread.setDaemon(True)
+                thread.start()
+                threads.append(thread)
+
+            try:
+                for _ in range(len(items)):
+                    yield results.get()
+            finally:
+                stopped.set()
+
+                for _ in threads:
+                    ready.put(None)
+
+        return iterate()
+
+    def _check_deploy_supported(self, kwargs):
+        if 'ssh_client_class' not in kwargs:
+            if not libcloud.compute.ssh.have_paramiko:
+                raise RuntimeError('paramiko is not installed. You can ' +
+                                   'install it using pip: pip install ' +
+                                   'paramiko')
+
+            # paramiko is installed, but importing it can still fail. This
+            # needs to be detected before any node is created.
+            try:
+                libcloud.compute.ssh._get_paramiko()
+            except ImportError:
+                e = sys.exc_info()[1]
+                raise RuntimeError('paramiko could not be imported: %s' %
+                                   (str(e)))
+
+        if 'create_node' not in self.features:
+            raise NotImplementedError(
+                'deploy_node not implemented for this driver')
+        elif 'generates_password' not in self.features["create_node"]:
+            if 'password' not in self.features["create_node"] and \
+               'ssh_key' not in self.features["create_node"]:
+                raise NotImplementedError(
+                    'deploy_node not implemented for this driver')
+
+    def _prepare_deploy_auth(self, kwargs):
+        """
+        Generate a random password if no authentication method has been
+        provided and the driver doesn't generate one.
+
+        @return: Password which is used to log in to the node or None.
+        """
+        if 'generates_password' in self.features["create_node"]:
+            return None
+
+        if 'auth' not in kwargs:
+            value = os.urandom(16)
+            kwargs['auth'] = NodeAuthPassword(binascii.hexlify(value))
+
+        if 'ssh_key' not in kwargs:
+            return kwargs['auth'].password
+
+        return None
+
+    def _deploy_running_node(self, node, ip_addresses, password, kwargs):
+        """
+        Connect to a running node and run the deployment task on it.
+        """
+        max_tries = kwargs.get('max_tries', 3)
+
+        if password:
+            node.extra['password'] = password
+
+        ssh_username = kwargs.get('ssh_username', 'root')
+        ssh_port = kwargs.get('ssh_port', 22)
+        ssh_timeout = kwargs.get('ssh_timeout', 10)
+        ssh_key_file = kwargs.get('ssh_key', None)
+        timeout = kwargs.get('timeout', SSH_CONNECT_TIMEOUT)
+
+        ssh_client_class = kwargs.get('ssh_client_class', SSHClient)
+
+        ssh_client = ssh_client_class(hostname=ip_addresses[0],
+                                      port=ssh_port, username=ssh_username,
+                                      password=password,
+                                      key=ssh_key_file,
+                                      timeout=ssh_timeout)
+
+        # Connect to the SSH server running on the node
+        ssh_client = self._ssh_client_connect(ssh_client=ssh_client,
+                                              timeout=timeout)
+
+        # Execute the deployment task
+        self._run_deployment_script(task=kwargs['deploy'],
+                                    node=node,
+                                    ssh_client=ssh_client,
+                                    max_tries=max_tries)
+
     def create_volume(self, size, name, location=None, snapshot=None):
         """
         Create a new volume.
@@ -753,6 +1493,43 @@ class NodeDriver(BaseDriver):
 
         raise NotImplementedError('detach not implemented for this driver')
 
+    def wait_until_running(self, nodes, wait_period=3, timeout=600,
+                           ssh_interface='public_ips', force_ipv4=True):
+        """
+        Block until the given nodes are fully booted and have an IP address
+        assigned.
+
+        All the nodes are checked using a single node listing per poll
+        interval. The listing is shared with other threads which are waiting
+        for nodes of this driver.
+
+        @keyword    nodes: List of nodes to wait for.
+        @type       nodes: C{list} of L{Node}
+
+        @keyword    wait_period: How many seconds to wait between each loop
+                                 iteration (default is 3)
+        @type       wait_period: C{int}
+
+        @keyword    timeout: How many seconds to wait before timing out
+                             (default is 600)
+        @type       timeout: C{int}
+
+        @keyword    ssh_interface: The interface to wait for.
+                                   Default is 'public_ips', other option is
+                                   'private_ips'.
+        @type       ssh_interface: C{str}
+
+        @keyword    force_ipv4: Ignore ipv6 IP addresses (default is True).
+        @type       force_ipv4: C{bool}
+
+        @return: C{[(Node, ip_addresses)]} list of tuple of Node instance and
+                 list of ip_address on success.
+        """
+        waiter = self._get_node_waiter(wait_period=wait_period)
+        return waiter.wait(nodes, timeout=timeout,
+                           ssh_interface=ssh_interface,
+                           force_ipv4=force_ipv4)
+
     def _wait_until_running(self, node, wait_period=3, timeout=600,
                             ssh_interface='public_ips', force_ipv4=True):
         """
@@ -780,43 +1557,37 @@ class NodeDriver(BaseDriver):
         @return: C{(Node, ip_addresses)} tuple of Node instance and
                  list of ip_address on success.
         """
-        def is_supported(address):
-            """Return True for supported address"""
-            if force_ipv4 and not is_valid_ip_address(address=address,
-                                                      family=socket.AF_INET):
-                return False
-            return True
+        return self.wait_until_running(nodes=[node], wait_period=wait_period,
+                                       timeout=timeout,
+                                       ssh_interface=ssh_interface,
+                                       force_ipv4=force_ipv4)[0]
 
-        def filter_addresses(addresses):
-            """Return list of supported addresses"""
-            return [a for a in addresses if is_supported(a)]
+    def _get_node_waiter(self, wait_period=3):
+        """
+        Return a L{NodeWaiter} which is shared by all the callers which use
+        the same wait period.
+        """
+        _NODE_WAITERS_LOCK.acquire()
 
-        start = time.time()
-        end = start + timeout
+        try:
+            waiters = self.__dict__.setdefault('_node_waiters', {})
 
-        if ssh_interface not in ['public_ips', 'private_ips']:
-            raise ValueError('ssh_interface argument must either be' +
-                             'public_ips or private_ips')
+            if wait_period not in waiters:
+                waiters[wait_period] = NodeWaiter(driver=self,
+                                                  wait_period=wait_period)
 
-        while time.time() < end:
-            nodes = self.list_nodes()
-            nodes = list([n for n in nodes if n.uuid == node.uuid])
-
-            if len(nodes) > 1:
-                raise LibcloudError(value=('Booted single node[%s], ' % node
-                                    + 'but multiple nodes have same UUID'),
-                                    driver=self)
-
-            if (len(nodes) == 1 and nodes[0].state == NodeState.RUNNING and
-                    filter_addresses(getattr(nodes[0], ssh_interface))):
-                return (nodes[0], filter_addresses(getattr(nodes[0],
-                                                   ssh_interface)))
-            else:
-                time.sleep(wait_period)
-                continue
+            return waiters[wait_period]
+        finally:
+            _NODE_WAITERS_LOCK.release()
+
+    def _is_node_not_found_error(self, error):
+        """
+        Return True if the error has been raised by list_nodes(ex_node_ids=...)
+        because one of the nodes doesn't exist (yet).
 
-        raise LibcloudError(value='Timed out after %s seconds' % (timeout),
-                            driver=self)
+        Drivers with supports_list_nodes_by_id need to override this method.
+        """
+        return False
 
     def _ssh_client_connect(self, ssh_client, wait_period=1.5, timeout=300):
         """
@@ -888,6 +1659,125 @@ class NodeDriver(BaseDriver):
                 ssh_client.close()
                 return node
 
+    def _get_cached_method(self, method_name, func, ttl):
+        stats = self._metadata_cache_stats[method_name]
+        stats_lock = self._metadata_cache_stats_lock
+
+        def count(name):
+            # Cached methods can be called from multiple threads
+            stats_lock.acquire()
+
+            try:
+                stats[name] += 1
+            finally:
+                stats_lock.release()
+
+        def cached_method(*args, **kwargs):
+            key = self._get_metadata_cache_key(method_name, func, args,
+                                               kwargs)
+            value = self.metadata_cache.get(key, _CACHE_MISS)
+
+            if value is not _CACHE_MISS:
+                count('hits')
+                return self._attach_cached_value(value)
+
+            count('misses')
+            value = func(self, *args, **kwargs)
+            self.metadata_cache.set(key, self._detach_cached_value(value),
+                                    ttl=ttl)
+            return value
+
+        cached_method.__name__ = method_name
+        cached_method.__doc__ = func.__doc__
+        return cached_method
+
+    def _get_invalidating_method(self, func, invalidated):
+        def invalidating_method(*args, **kwargs):
+            try:
+                return func(self, *args, **kwargs)
+            finally:
+                for method_name in invalidated:
+                    self.invalidate_metadata_cache(method_name=method_name)
+
+        invalidating_method.__name__ = func.__name__
+        invalidating_method.__doc__ = func.__doc__
+        return invalidating_method
+
+    def _get_metadata_cache_prefix(self):
+        # A persistent cache can be shared by multiple drivers and accounts
+        key = hashlib.sha1(b(str(getattr(self, 'key', None)))).hexdigest()
+        host = getattr(self.connection, 'host', None)
+        return (self.__class__.__module__, self.__class__.__name__, key, host)
+
+    def _get_metadata_cache_key(self, method_name, func, args, kwargs):
+        # Arguments are bound to the parameter names (including the default
+        # values) so equivalent calls such as list_images(location) and
+        # list_images(location=location) share the cache entry
+        argspec = getargspec(func)
+        names = argspec[0][1:]
+        defaults = argspec[3] or ()
+
+        arguments = dict(zip(names[len(names) - len(defaults):], defaults))
+        arguments.update(zip(names, args))
+        arguments.update(kwargs)
+        args = args[len(names):]
+
+        def normalize(value):
+            # Objects such as NodeLocation are identified by their id
+            if hasattr(value, 'id'):
+                return (value.__class__.__name__, value.id)
+
+            try:
+                hash(value)
+            except TypeError:
+                return repr(value)
+
+            return value
+
+        args = tuple([normalize(value) for value in args])
+        kwargs = tuple(sorted([(name, normalize(value)) for name, value in
+                               arguments.items()]))
+        return (self._get_metadata_cache_prefix(), method_name, args, kwargs)
+
+    def _detach_cached_value(self, value):
+        """
+        Return a copy of the value in which items don't reference the driver
+        so it can be persisted.
+        """
+        return self._copy_cached_value(value, driver=None)
+
+    def _attach_cached_value(self, value):
+        """
+        Return a copy of the cached value in which items reference this
+        driver.
+
+        Every caller gets its own copies of the cached objects (including the
+        "extra" dictionaries) so they can be modified without affecting the
+        other callers.
+        """
+        return self._copy_cached_value(value, driver=self)
+
+    def _copy_cached_value(self, value, driver):
+        if not isinstance(value, list):
+            return value
+
+        result = []
+
+        for item in value:
+            if hasattr(item, 'driver'):
+                item = copy.copy(item)
+                item.driver = driver
+
+                # Compact classes create the "extra" dictionary lazily
+                extra = getattr(item, '_extra', getattr(item, 'extra', None))
+
+                if extra is not None:
+                    item.extra = copy.deepcopy(extra)
+
+            result.append(item)
+
+        return result
+
     def _get_size_price(self, size_id):
         return get_size_price(driver_type='compute',
                               driver_name=self.api_name,
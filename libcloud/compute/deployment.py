@@ -104,11 +104,10 @@ class FileDeployment(Deployment):
         """
         perms = int(oct(os.stat(self.source).st_mode)[4:], 8)
 
+        # Stream the file instead of reading it into memory
         with open(self.source, 'rb') as fp:
-            content = fp.read()
+            client.putfo(path=self.target, fo=fp, chmod=perms)
 
-        client.put(path=self.target, chmod=perms,
-                   contents=content)
         return node
 
 
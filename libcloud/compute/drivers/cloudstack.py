@@ -139,12 +139,22 @@ class CloudStackNodeDriver(CloudStackDriverMixIn, NodeDriver):
         NodeDriver.__init__(self, key=key, secret=secret, secure=secure,
                             host=host, port=port)
 
-    def list_images(self, location=None):
+    def list_images(self, location=None, ex_filters=None):
+        """
+        @inherits: L{NodeDriver.list_images}
+
+        @param ex_filters: Dictionary of listTemplates arguments which are
+                           used to filter the templates server side (e.g.
+                           'name', 'id', 'hypervisor' or 'templatefilter').
+        @type ex_filters: C{dict}
+        """
         args = {
             'templatefilter': 'executable'
         }
         if location is not None:
             args['zoneid'] = location.id
+        if ex_filters:
+            args.update(ex_filters)
         imgs = self._sync_request('listTemplates', **args)
         images = []
         for img in imgs.get('template', []):
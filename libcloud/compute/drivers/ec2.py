@@ -23,7 +23,6 @@ import base64
 import hmac
 import os
 import time
-import copy
 
 from hashlib import sha256
 from xml.etree import ElementTree as ET
@@ -38,7 +37,7 @@ from libcloud.common.types import (InvalidCredsError, MalformedResponseError,
                                    LibcloudError)
 from libcloud.compute.providers import Provider
 from libcloud.compute.types import NodeState
-from libcloud.compute.base import Node, NodeDriver, NodeLocation, NodeSize
+from libcloud.compute.base import NodeDriver, NodeLocation, NodeSize
 from libcloud.compute.base import NodeImage, StorageVolume
 
 EC2_US_EAST_HOST = 'ec2.us-east-1.amazonaws.com'
@@ -179,6 +178,16 @@ class EC2Response(AWSBaseResponse):
     EC2 specific response parsing and error handling.
     """
 
+    def consume_element(self, element):
+        # Drivers can set 'element_consumer' in the connection context to
+        # build objects as the response is being parsed
+        consumer = self.connection.context.get('element_consumer', None)
+
+        if consumer is None:
+            return False
+
+        return consumer(element)
+
     def parse_error(self):
         err_list = []
         # Okay, so for Eucalyptus, you can get a 403, with no body,
@@ -296,6 +305,7 @@ class EC2NodeDriver(NodeDriver):
 
     _instance_types = EC2_US_EAST_INSTANCE_TYPES
     features = {'create_node': ['ssh_key']}
+    supports_list_nodes_by_id = True
 
     NODE_STATE_MAP = {
         'pending': NodeState.PENDING,
@@ -315,6 +325,20 @@ class EC2NodeDriver(NodeDriver):
             params["%s.%s" % (key, i)] = value
         return params
 
+    def _get_filter_params(self, filters):
+        """
+        Converts a dictionary of filters into AWS Filter.N query params.
+        """
+        params = {}
+        i = 0
+        for name, values in sorted(filters.items()):
+            i += 1
+            if not isinstance(values, (list, tuple)):
+                values = [values]
+            params['Filter.%s.Name' % (i)] = name
+            params.update(self._pathlist('Filter.%s.Value' % (i), values))
+        return params
+
     def _get_boolean(self, element):
         tag = "{%s}%s" % (NAMESPACE, 'return')
         return element.findtext(tag) == 'true'
@@ -368,7 +392,7 @@ class EC2NodeDriver(NodeDriver):
                               namespace=NAMESPACE)
         private_ips = [private_ip] if private_ip else []
 
-        n = Node(
+        n = self.nodeCls(
             id=findtext(element=element, xpath='instanceId',
                         namespace=NAMESPACE),
             name=name,
@@ -504,6 +528,11 @@ class EC2NodeDriver(NodeDriver):
             node.public_ips.extend(ips)
         return nodes
 
+    def _is_node_not_found_error(self, error):
+        # Newly created instances might not be visible to DescribeInstances
+        # calls with an instance id filter yet
+        return str(error).find('InvalidInstanceID.NotFound') != -1
+
     def list_sizes(self, location=None):
         # Cluster instances are not available in all the regions
         if self.region_name == 'us-east-1':
@@ -522,16 +551,81 @@ class EC2NodeDriver(NodeDriver):
         for key, values in self._instance_types.items():
             if key in ignored_size_ids:
                 continue
-            attributes = copy.deepcopy(values)
+            attributes = dict(values)
             attributes.update({'price': self._get_size_price(size_id=key)})
             sizes.append(NodeSize(driver=self, **attributes))
         return sizes
 
-    def list_images(self, location=None):
+    def list_images(self, location=None, ex_image_ids=None, ex_owners=None,
+                    ex_executable_by=None, ex_filters=None):
+        """
+        List images.
+
+        Without any filters, all the images which are visible to the account
+        (including all the public ones) are returned. Filtering is done
+        server side. The response is parsed as it arrives and each image
+        element is discarded as soon as it has been converted to a
+        L{NodeImage}.
+
+        @inherits: L{NodeDriver.list_images}
+
+        @param ex_image_ids: Only return images with these ids.
+        @type ex_image_ids: C{list} of C{str}
+
+        @param ex_owners: Only return images owned by these owners (account
+                          ids, 'self', 'amazon', ...).
+        @type ex_owners: C{list} of C{str}
+
+        @param ex_executable_by: Only return images which can be launched by
+                                 these accounts (account ids, 'self' or
+                                 'all').
+        @type ex_executable_by: C{list} of C{str}
+
+        @param ex_filters: Dictionary which maps a filter name (e.g.
+                           'architecture' or 'tag:Name') to a value or a
+                           list of values.
+        @type ex_filters: C{dict}
+        """
         params = {'Action': 'DescribeImages'}
-        images = self._to_images(
-            self.connection.request(self.path, params=params).object
-        )
+
+        if ex_image_ids:
+            params.update(self._pathlist('ImageId', ex_image_ids))
+
+        if ex_owners:
+            params.update(self._pathlist('Owner', ex_owners))
+
+        if ex_executable_by:
+            params.update(self._pathlist('ExecutableBy', ex_executable_by))
+
+        if ex_filters:
+            params.update(self._get_filter_params(ex_filters))
+
+        images = []
+        item_tag = fixxpath(xpath='item', namespace=NAMESPACE)
+        image_id_xpath = fixxpath(xpath='imageId', namespace=NAMESPACE)
+
+        def consume_image(element):
+            # Nested items (block device mappings, tags, ...) don't have an
+            # imageId
+            if element.tag != item_tag or \
+               element.find(image_id_xpath) is None:
+                return False
+
+            images.append(self._to_image(element))
+            return True
+
+        context = self.connection.context
+        self.connection.set_context({'streaming': True,
+                                     'element_consumer': consume_image})
+
+        try:
+            response = self.connection.request(self.path, params=params)
+        finally:
+            self.connection.set_context(context)
+
+        # Images which haven't been consumed while parsing (e.g. if the
+        # response hasn't been streamed)
+        images.extend(self._to_images(response.object))
         return images
 
     def list_locations(self):
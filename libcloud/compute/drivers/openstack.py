@@ -207,16 +207,27 @@ class OpenStackNodeDriver(NodeDriver, OpenStackDriverMixin):
         return self._to_nodes(
             self.connection.request('/servers/detail').object)
 
-    def list_images(self, location=None, ex_only_active=True):
+    def list_images(self, location=None, ex_only_active=True,
+                    ex_filters=None):
         """
         @inherits: L{NodeDriver.list_images}
 
         @param ex_only_active: True if list only active
         @type ex_only_active: C{bool}
 
+        @param ex_filters: Dictionary of filters which are passed to the API
+                           as query parameters (e.g. 'name', 'status',
+                           'server', 'type' or 'changes-since').
+        @type ex_filters: C{dict}
         """
+        params = {}
+
+        if ex_filters:
+            params.update(ex_filters)
+
         return self._to_images(
-            self.connection.request('/images/detail').object, ex_only_active)
+            self.connection.request('/images/detail', params=params).object,
+            ex_only_active)
 
     def list_sizes(self, location=None):
         return self._to_sizes(
@@ -1259,7 +1270,7 @@ class OpenStack_1_1_NodeDriver(OpenStackNodeDriver):
         return self._to_node(obj['server'])
 
     def _to_node(self, api_node):
-        return Node(
+        return self.nodeCls(
             id=api_node['id'],
             name=api_node['name'],
             state=self.NODE_STATE_MAP.get(api_node['status'],
@@ -39,6 +39,7 @@ from libcloud.compute.providers import Provider
 from libcloud.compute.types import NodeState
 from libcloud.compute.base import Node, NodeDriver, NodeLocation
 from libcloud.compute.base import NodeSize, NodeImage, NodeAuthPassword
+from libcloud.utils.concurrency import DEFAULT_CONCURRENCY, imap_unordered
 
 """
 From vcloud api "The VirtualQuantity element defines the number of MB
@@ -505,7 +506,7 @@ class VCloudNodeDriver(NodeDriver):
     def list_nodes(self):
         return self.ex_list_nodes()
 
-    def ex_list_nodes(self, vdcs=None):
+    def ex_list_nodes(self, vdcs=None, ex_concurrency=DEFAULT_CONCURRENCY):
         """
         List all nodes across all vDCs. Using 'vdcs' you can specify which vDCs
         should be queried.
@@ -514,42 +515,73 @@ class VCloudNodeDriver(NodeDriver):
                      will be queried.
         @type vdcs: L{Vdc}
 
+        @param ex_concurrency: Maximum number of vApps which are retrieved in
+                               parallel. 1 means the vApps are retrieved
+                               sequentially.
+        @type ex_concurrency: C{int}
+
         @rtype: C{list} of L{Node} objects
         """
         if not vdcs:
             vdcs = self.vdcs
         if not isinstance(vdcs, (list, tuple)):
             vdcs = [vdcs]
-        nodes = []
+        vapp_hrefs = []
         for vdc in vdcs:
             res = self.connection.request(get_url_path(vdc.id))
             elms = res.object.findall(fixxpath(
                 res.object, "ResourceEntities/ResourceEntity")
             )
-            vapps = [
-                (i.get('name'), i.get('href'))
+            vapp_hrefs.extend([
+                i.get('href')
                 for i in elms
                 if i.get('type')
                     == 'application/vnd.vmware.vcloud.vApp+xml'
                     and i.get('name')
-            ]
+            ])
 
-            for vapp_name, vapp_href in vapps:
-                try:
-                    res = self.connection.request(
-                        get_url_path(vapp_href),
-                        headers={'Content-Type': 'application/vnd.vmware.vcloud.vApp+xml'}
-                    )
-                    nodes.append(self._to_node(res.object))
-                except Exception:
-                    # The vApp was probably removed since the previous vDC query, ignore
-                    e = sys.exc_info()[1]
-                    if not (isinstance(e.args[0], _ElementInterface) and
-                            e.args[0].tag.endswith('Error') and
-                            e.args[0].get('minorErrorCode') == 'ACCESS_TO_RESOURCE_IS_FORBIDDEN'):
-                        raise e
-
-        return nodes
+        if ex_concurrency <= 1 or len(vapp_hrefs) <= 1:
+            nodes = [self._get_vapp_node(href) for href in vapp_hrefs]
+        else:
+            # Nodes are returned in the same order as in the sequential mode
+            nodes = [None] * len(vapp_hrefs)
+            results = imap_unordered(self._get_vapp_node_at_index,
+                                     enumerate(vapp_hrefs), ex_concurrency)
+
+            try:
+                for (index, _), node, error in results:
+                    if error is not None:
+                        raise error
+
+                    nodes[index] = node
+            finally:
+                results.close()
+
+        return [node for node in nodes if node is not None]
+
+    def _get_vapp_node_at_index(self, item):
+        return self._get_vapp_node(item[1])
+
+    def _get_vapp_node(self, vapp_href):
+        """
+        Retrieve a vApp and return it as a L{Node} or None if the vApp doesn't
+        exist anymore.
+        """
+        try:
+            res = self.connection.request(
+                get_url_path(vapp_href),
+                headers={'Content-Type': 'application/vnd.vmware.vcloud.vApp+xml'}
+            )
+            return self._to_node(res.object)
+        except Exception:
+            # The vApp was probably removed since the previous vDC query, ignore
+            e = sys.exc_info()[1]
+            if not (isinstance(e.args[0], _ElementInterface) and
+                    e.args[0].tag.endswith('Error') and
+                    e.args[0].get('minorErrorCode') == 'ACCESS_TO_RESOURCE_IS_FORBIDDEN'):
+                raise e
+
+        return None
 
     def _to_size(self, ram):
         ns = NodeSize(
@@ -16,19 +16,22 @@
 """
 Wraps multiple ways to communicate over SSH
 """
-have_paramiko = False
 
-try:
-    import paramiko
-    have_paramiko = True
-except ImportError:
-    pass
+import os
+import posixpath
+from os.path import split as psplit
 
-# Depending on your version of Paramiko, it may cause a deprecation
-# warning on Python 2.6.
-# Ref: https://bugs.launchpad.net/paramiko/+bug/392973
+from libcloud.utils.py3 import b
+from libcloud.utils.py3 import PY3
+from libcloud.utils.misc import module_exists
 
-from os.path import split as psplit
+# paramiko is slow to import so it's only imported once a ParamikoSSHClient
+# is created. The same applies to the modules used by ShellOutSSHClient.
+paramiko = None
+have_paramiko = module_exists('paramiko')
+
+# Size of the chunks in which file objects are uploaded
+CHUNK_SIZE = 32 * 1024
 
 
 class BaseSSHClient(object):
@@ -89,6 +92,63 @@ class BaseSSHClient(object):
         raise NotImplementedError(
             'put not implemented for this ssh client')
 
+    def putfo(self, path, fo, chmod=None, mode='w'):
+        """
+        Upload contents of a file object to the remote node.
+
+        The default implementation reads the whole file object and calls
+        L{put}. Sub-classes can override it to upload the file in chunks.
+
+        @type path: C{str}
+        @keyword path: File path on the remote node.
+
+        @type fo: C{file}
+        @keyword fo: File object to read the contents from.
+
+        @type chmod: C{int}
+        @keyword chmod: chmod file to this after creation.
+
+        @type mode: C{str}
+        @keyword mode: Mode in which the file is opened.
+        """
+        return self.put(path=path, contents=fo.read(), chmod=chmod,
+                        mode=mode)
+
+    def put_many(self, files, chmod=None, mode='w'):
+        """
+        Upload multiple files to the remote node.
+
+        @type files: C{list}
+        @keyword files: List of (path, contents) or (path, contents, chmod)
+                        tuples. contents can also be a file object.
+
+        @type chmod: C{int}
+        @keyword chmod: chmod files without an explicit chmod to this after
+                        creation.
+
+        @type mode: C{str}
+        @keyword mode: Mode in which the files are opened.
+        """
+        for path, contents, file_chmod in self._get_put_many_files(files,
+                                                                   chmod):
+            if hasattr(contents, 'read'):
+                self.putfo(path=path, fo=contents, chmod=file_chmod,
+                           mode=mode)
+            else:
+                self.put(path=path, contents=contents, chmod=file_chmod,
+                         mode=mode)
+
+    def _get_put_many_files(self, files, chmod):
+        result = []
+
+        for item in files:
+            if len(item) == 2:
+                item = (item[0], item[1], chmod)
+
+            result.append(tuple(item))
+
+        return result
+
     def delete(self, path):
         """
         Delete/Unlink a file on the remote node.
@@ -127,8 +187,11 @@ class ParamikoSSHClient(BaseSSHClient):
                  key=None, timeout=None):
         super(ParamikoSSHClient, self).__init__(hostname, port, username,
                                                 password, key, timeout)
+        paramiko = _get_paramiko()
         self.client = paramiko.SSHClient()
         self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        self._sftp = None
+        self._directories = set()
 
     def connect(self):
         conninfo = {'hostname': self.hostname,
@@ -152,31 +215,89 @@ class ParamikoSSHClient(BaseSSHClient):
         return True
 
     def put(self, path, contents=None, chmod=None, mode='w'):
-        sftp = self.client.open_sftp()
-        # less than ideal, but we need to mkdir stuff otherwise file() fails
-        head, tail = psplit(path)
-        if path[0] == "/":
-            sftp.chdir("/")
-        for part in head.split("/"):
-            if part != "":
+        sftp = self._get_sftp()
+        self._make_directories(sftp, [psplit(path)[0]])
+        self._write_file(sftp, path, contents, chmod, mode)
+
+    def putfo(self, path, fo, chmod=None, mode='w'):
+        sftp = self._get_sftp()
+        self._make_directories(sftp, [psplit(path)[0]])
+        self._write_file(sftp, path, fo, chmod, mode)
+
+    def put_many(self, files, chmod=None, mode='w'):
+        files = self._get_put_many_files(files, chmod)
+        sftp = self._get_sftp()
+        self._make_directories(sftp, [psplit(item[0])[0] for item in files])
+
+        for path, contents, file_chmod in files:
+            self._write_file(sftp, path, contents, file_chmod, mode)
+
+    def delete(self, path):
+        sftp = self._get_sftp()
+        sftp.unlink(path)
+
+    def _get_sftp(self):
+        """
+        Return SFTP session which is shared by all the file operations.
+        """
+        if self._sftp is None:
+            self._sftp = self.client.open_sftp()
+            self._directories = set()
+
+        return self._sftp
+
+    def _make_directories(self, sftp, paths):
+        """
+        Create the given directories (and their parents) on the remote
+        node. Directories which are already known to exist are skipped.
+        """
+        for path in paths:
+            path = posixpath.normpath(path)
+
+            if path in ('', '.', '/') or path in self._directories:
+                continue
+
+            try:
+                sftp.stat(path)
+            except IOError:
+                # Create missing parents first
+                self._make_directories(sftp, [posixpath.dirname(path)])
+
                 try:
-                    sftp.mkdir(part)
+                    sftp.mkdir(path)
                 except IOError:
                     # so, there doesn't seem to be a way to
                     # catch EEXIST consistently *sigh*
                     pass
-                sftp.chdir(part)
-        ak = sftp.file(tail, mode=mode)
-        ak.write(contents)
-        if chmod is not None:
-            ak.chmod(chmod)
-        ak.close()
-        sftp.close()
 
-    def delete(self, path):
-        sftp = self.client.open_sftp()
-        sftp.unlink(path)
-        sftp.close()
+            # If the directory exists, so do all of its parents
+            while path not in ('', '.', '/') and \
+                    path not in self._directories:
+                self._directories.add(path)
+                path = posixpath.dirname(path)
+
+    def _write_file(self, sftp, path, contents, chmod, mode):
+        ak = sftp.file(path, mode=mode)
+
+        try:
+            # Don't wait for the server to acknowledge each write
+            ak.set_pipelined(True)
+
+            if hasattr(contents, 'read'):
+                while True:
+                    data = contents.read(CHUNK_SIZE)
+
+                    if not data:
+                        break
+
+                    ak.write(data)
+            else:
+                ak.write(contents)
+
+            if chmod is not None:
+                ak.chmod(chmod)
+        finally:
+            ak.close()
 
     def run(self, cmd):
         # based on exec_command()
@@ -195,12 +316,254 @@ class ParamikoSSHClient(BaseSSHClient):
         return [so, se, status]
 
     def close(self):
+        if self._sftp is not None:
+            self._sftp.close()
+            self._sftp = None
+            self._directories = set()
+
         self.client.close()
 
 
 class ShellOutSSHClient(BaseSSHClient):
-    # TODO: write this one
-    pass
+    """
+    A SSH Client which shells out to the OpenSSH ssh binary.
+
+    A master connection is established in connect() and all the following
+    commands and file transfers are multiplexed over it (ControlMaster), so
+    authentication only happens once. Password authentication is not
+    supported, use a key or an SSH agent.
+    """
+
+    def __init__(self, hostname, port=22, username='root', password=None,
+                 key=None, timeout=None, ssh_binary='ssh',
+                 control_persist=60):
+        """
+        @type ssh_binary: C{str}
+        @keyword ssh_binary: Name of or path to the ssh binary.
+
+        @type control_persist: C{int}
+        @keyword control_persist: Number of seconds the master connection
+                                  stays open in the background after it has
+                                  last been used.
+
+        @inherits: L{BaseSSHClient.__init__}
+        """
+        super(ShellOutSSHClient, self).__init__(hostname, port, username,
+                                                password, key, timeout)
+        self.ssh_binary = ssh_binary
+        self.control_persist = control_persist
+        self._control_dir = None
+
+    def connect(self):
+        if self.password and not self.key:
+            raise ValueError('ShellOutSSHClient doesn\'t support password '
+                             'authentication')
+
+        if self._control_dir is None:
+            import tempfile
+            self._control_dir = tempfile.mkdtemp(prefix='libcloud-ssh-')
+
+        # Start the master connection in the background
+        cmd = self._get_ssh_command(['-o', 'ControlMaster=yes',
+                                     '-o', 'ControlPersist=%s' %
+                                     (self.control_persist), '-N', '-f'])
+        stdout, stderr, status = self._execute(cmd)
+
+        if status != 0:
+            raise IOError('Failed to connect to %s: %s' %
+                          (self.hostname, self._get_error(stderr)))
+
+        return True
+
+    def put(self, path, contents=None, chmod=None, mode='w'):
+        cmd = self._get_put_command(path, chmod, mode)
+        stdout, stderr, status = self._execute(cmd, contents=contents)
+
+        if status != 0:
+            raise IOError('Failed to upload %s: %s' %
+                          (path, self._get_error(stderr)))
+
+    def putfo(self, path, fo, chmod=None, mode='w'):
+        return self.put(path=path, contents=fo, chmod=chmod, mode=mode)
+
+    def delete(self, path):
+        cmd = self._get_ssh_command(['--', 'rm %s' % (_quote(path))])
+        stdout, stderr, status = self._execute(cmd)
+
+        if status != 0:
+            raise IOError('Failed to delete %s: %s' %
+                          (path, self._get_error(stderr)))
+
+    def run(self, cmd):
+        cmd = self._get_ssh_command(['--', cmd])
+        stdout, stderr, status = self._execute(cmd)
+
+        if PY3:
+            stdout = stdout.decode('utf-8', 'replace')
+            stderr = stderr.decode('utf-8', 'replace')
+
+        return [stdout, stderr, status]
+
+    def close(self):
+        if self._control_dir is None:
+            return True
+
+        import shutil
+
+        try:
+            self._execute(self._get_ssh_command(['-O', 'exit']))
+        finally:
+            shutil.rmtree(self._control_dir, ignore_errors=True)
+            self._control_dir = None
+
+        return True
+
+    def _get_ssh_command(self, args):
+        """
+        Return ssh command line. Items of args which come before '--' are
+        passed as options and the rest is passed after the hostname.
+        """
+        index = len(args)
+
+        if '--' in args:
+            index = args.index('--')
+
+        # ssh uses the first value which is specified for an option so the
+        # options from args take precedence over the defaults
+        cmd = [self.ssh_binary] + args[:index]
+        cmd.extend(['-o', 'BatchMode=yes',
+                    '-o', 'StrictHostKeyChecking=no',
+                    '-o', 'UserKnownHostsFile=%s' % (os.devnull),
+                    '-o', 'LogLevel=ERROR',
+                    '-p', str(self.port),
+                    '-l', self.username])
+
+        if self._control_dir is not None:
+            # If the master connection is gone, ssh falls back to connecting
+            # normally
+            cmd.extend(['-o', 'ControlMaster=no',
+                        '-o', 'ControlPath=%s' %
+                        (os.path.join(self._control_dir, 'control'))])
+
+        if self.timeout:
+            cmd.extend(['-o', 'ConnectTimeout=%d' % (self.timeout)])
+
+        keys = self.key or []
+
+        if not isinstance(keys, (list, tuple)):
+            keys = [keys]
+
+        for key in keys:
+            cmd.extend(['-i', key])
+
+        return cmd + [self.hostname] + args[index + 1:]
+
+    def _get_put_command(self, path, chmod, mode):
+        head, tail = psplit(path)
+        commands = []
+
+        if head:
+            commands.append('mkdir -p %s' % (_quote(head)))
+
+        if 'a' in mode:
+            commands.append('cat >> %s' % (_quote(path)))
+        else:
+            commands.append('cat > %s' % (_quote(path)))
+
+        if chmod is not None:
+            commands.append('chmod %o %s' % (chmod, _quote(path)))
+
+        return self._get_ssh_command(['--', ' && '.join(commands)])
+
+    def _execute(self, cmd, contents=None):
+        """
+        Execute a command and return a [stdout, stderr, exit_status] list.
+
+        Output is redirected to temporary files because a background master
+        connection keeps the pipes open after ssh has exited.
+
+        @keyword contents: Data (string or a file object) which is written
+                           to the standard input of the command.
+        """
+        import tempfile
+        import subprocess
+
+        stdout = tempfile.TemporaryFile()
+        stderr = tempfile.TemporaryFile()
+
+        try:
+            if contents is None:
+                stdin = open(os.devnull, 'rb')
+            else:
+                stdin = subprocess.PIPE
+
+            process = subprocess.Popen(cmd, stdin=stdin, stdout=stdout,
+                                       stderr=stderr)
+
+            if contents is not None:
+                self._write_stdin(process.stdin, contents)
+            else:
+                stdin.close()
+
+            status = process.wait()
+
+            stdout.seek(0)
+            stderr.seek(0)
+            return [stdout.read(), stderr.read(), status]
+        finally:
+            stdout.close()
+            stderr.close()
+
+    def _write_stdin(self, stdin, contents):
+        try:
+            if hasattr(contents, 'read'):
+                while True:
+                    data = contents.read(CHUNK_SIZE)
+
+                    if not data:
+                        break
+
+                    stdin.write(b(data))
+            else:
+                stdin.write(b(contents))
+        except (IOError, OSError):
+            # The command has exited without reading all the data, the
+            # error is reported using the exit status
+            pass
+
+        try:
+            stdin.close()
+        except (IOError, OSError):
+            pass
+
+    def _get_error(self, stderr):
+        return stderr.decode('utf-8', 'replace').strip()
+
+
+def _get_paramiko():
+    """
+    Import paramiko on first use.
+    """
+    global paramiko
+
+    if paramiko is None:
+        # Depending on your version of Paramiko, it may cause a deprecation
+        # warning on Python 2.6.
+        # Ref: https://bugs.launchpad.net/paramiko/+bug/392973
+        import paramiko as module
+        paramiko = module
+
+    return paramiko
+
+
+def _quote(value):
+    try:
+        from shlex import quote
+    except ImportError:
+        from pipes import quote
+
+    return quote(value)
+
 
 SSHClient = ParamikoSSHClient
 if not have_paramiko:
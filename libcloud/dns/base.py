@@ -16,6 +16,7 @@
 __all__ = [
     'Zone',
     'Record',
+    'CompactRecord',
     'DNSDriver'
 ]
 
@@ -124,11 +125,53 @@ class Record(object):
                  self.data, self.driver.name))
 
 
+class CompactRecord(Record):
+    """
+    Record which uses less memory, meant for zones with a large number of
+    records.
+
+    The attributes are stored in slots instead of a per-instance
+    dictionary (which is only created if an attribute which isn't listed in
+    __slots__ is set) and the "extra" dictionary is only created once it's
+    accessed. Otherwise it behaves exactly like a Record.
+
+    Drivers create compact records when their recordCls attribute is set to
+    this class.
+    """
+
+    __slots__ = ('id', 'name', 'type', 'data', 'zone', 'driver', '_extra')
+
+    def __init__(self, id, name, type, data, zone, driver, extra=None):
+        self.id = str(id) if id else None
+        self.name = name
+        self.type = type
+        self.data = data
+        self.zone = zone
+        self.driver = driver
+        self._extra = extra or None
+
+    def _get_extra(self):
+        if self._extra is None:
+            self._extra = {}
+
+        return self._extra
+
+    def _set_extra(self, value):
+        self._extra = value
+
+    extra = property(fget=_get_extra, fset=_set_extra)
+
+
 class DNSDriver(BaseDriver):
     """
     DNS driver.
     """
     connectionCls = ConnectionUserAndKey
+
+    # Class of the records which are returned by list_records (set it to
+    # CompactRecord to reduce memory usage when listing large zones)
+    recordCls = Record
+
     name = None
     website = None
 
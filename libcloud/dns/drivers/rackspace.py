@@ -346,8 +346,9 @@ class RackspaceDNSDriver(DNSDriver, OpenStackDriverMixin):
         if 'comment' in data:
             extra['comment'] = data['comment']
 
-        record = Record(id=str(id), name=name, type=type, data=record_data,
-                        zone=zone, driver=self, extra=extra)
+        record = self.recordCls(id=str(id), name=name, type=type,
+                                data=record_data, zone=zone, driver=self,
+                                extra=extra)
         return record
 
     def _to_full_record_name(self, domain, name):
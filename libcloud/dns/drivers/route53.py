@@ -29,7 +29,7 @@ from libcloud.utils.py3 import b
 from libcloud.utils.xml import findtext, findall, fixxpath
 from libcloud.dns.types import Provider, RecordType
 from libcloud.dns.types import ZoneDoesNotExistError, RecordDoesNotExistError
-from libcloud.dns.base import DNSDriver, Zone, Record
+from libcloud.dns.base import DNSDriver, Zone
 from libcloud.common.types import LibcloudError
 from libcloud.common.aws import AWSBaseResponse
 from libcloud.common.base import ConnectionUserAndKey
@@ -202,6 +202,6 @@ class Route53DNSDriver(DNSDriver):
                         namespace=NAMESPACE)
 
         extra = {'ttl': ttl}
-        record = Record(id=name, name=name, type=type, data=data, zone=zone,
-                        driver=self, extra=extra)
+        record = self.recordCls(id=name, name=name, type=type, data=data,
+                                zone=zone, driver=self, extra=extra)
         return record
@@ -145,11 +145,13 @@ class ZerigoDNSDriver(DNSDriver):
 
     def list_zones(self):
         value_dict = {'type': 'zones'}
-        return LazyList(get_more=self._get_more, value_dict=value_dict)
+        return LazyList(get_more=self._get_more, value_dict=value_dict,
+                        prefetch=True)
 
     def list_records(self, zone):
         value_dict = {'type': 'records', 'zone': zone}
-        return LazyList(get_more=self._get_more, value_dict=value_dict)
+        return LazyList(get_more=self._get_more, value_dict=value_dict,
+                        prefetch=True)
 
     def get_zone(self, zone_id):
         path = API_ROOT + 'zones/%s.xml' % (zone_id)
@@ -18,6 +18,7 @@ from libcloud.common.types import LibcloudError
 
 __all__ = [
     "Member",
+    "CompactMember",
     "LoadBalancer",
     "Driver",
     "Algorithm"
@@ -38,6 +39,41 @@ class Member(object):
                                                     self.ip, self.port))
 
 
+class CompactMember(Member):
+    """
+    Member which uses less memory, meant for balancers with a large number
+    of members.
+
+    The attributes are stored in slots instead of a per-instance
+    dictionary (which is only created if an attribute which isn't listed in
+    __slots__ is set) and the "extra" dictionary is only created once it's
+    accessed. Otherwise it behaves exactly like a Member.
+
+    Drivers create compact members when their memberCls attribute is set to
+    this class.
+    """
+
+    __slots__ = ('id', 'ip', 'port', 'balancer', '_extra')
+
+    def __init__(self, id, ip, port, balancer=None, extra=None):
+        self.id = str(id) if id else None
+        self.ip = ip
+        self.port = port
+        self.balancer = balancer
+        self._extra = extra or None
+
+    def _get_extra(self):
+        if self._extra is None:
+            self._extra = {}
+
+        return self._extra
+
+    def _set_extra(self, value):
+        self._extra = value
+
+    extra = property(fget=_get_extra, fset=_set_extra)
+
+
 class Algorithm(object):
     RANDOM = 0
     ROUND_ROBIN = 1
@@ -97,6 +133,11 @@ class Driver(BaseDriver):
     """
 
     connectionCls = ConnectionKey
+
+    # Class of the members which are returned by balancer_list_members (set
+    # it to CompactMember to reduce memory usage when listing many members)
+    memberCls = Member
+
     _ALGORITHM_TO_VALUE_MAP = {}
     _VALUE_TO_ALGORITHM_MAP = {}
 
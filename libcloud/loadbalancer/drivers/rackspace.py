@@ -22,7 +22,7 @@ except ImportError:
 
 from libcloud.utils.py3 import httplib
 from libcloud.utils.misc import reverse_dict
-from libcloud.loadbalancer.base import LoadBalancer, Member, Driver, Algorithm
+from libcloud.loadbalancer.base import LoadBalancer, Driver, Algorithm
 from libcloud.loadbalancer.base import DEFAULT_ALGORITHM
 from libcloud.common.types import LibcloudError
 from libcloud.common.base import JsonResponse, PollingConnection
@@ -1399,11 +1399,11 @@ class RackspaceLBDriver(Driver, OpenStackDriverMixin):
         if 'status' in el:
             extra['status'] = el["status"]
 
-        lbmember = Member(id=el["id"],
-                          ip=el["address"],
-                          port=el["port"],
-                          balancer=balancer,
-                          extra=extra)
+        lbmember = self.memberCls(id=el["id"],
+                                  ip=el["address"],
+                                  port=el["port"],
+                                  balancer=balancer,
+                                  extra=extra)
         return lbmember
 
     def _protocol_to_value(self, protocol):
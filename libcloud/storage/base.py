@@ -21,20 +21,43 @@ Provides base classes for working with storage
 from __future__ import with_statement
 
 import os.path                          # pylint: disable-msg=W0404
+import re
+import mmap
+import socket
 import hashlib
+import threading
 from os.path import join as pjoin
 
 from libcloud.utils.py3 import httplib
 from libcloud.utils.py3 import next
 from libcloud.utils.py3 import b
+from libcloud.utils.py3 import PY25
+from libcloud.utils.py3 import buffer_view
 
 import libcloud.utils.files
-from libcloud.common.types import LibcloudError
+from libcloud.utils.compression import decompress_chunks
+from libcloud.utils.compression import CONTENT_ENCODING_TYPES
+from libcloud.utils.concurrency import DEFAULT_CONCURRENCY
+from libcloud.utils.concurrency import imap_unordered, call_with_retry
+from libcloud.common.types import LibcloudError, InvalidCredsError
 from libcloud.common.base import ConnectionUserAndKey, BaseDriver
+from libcloud.common.base import LoggingConnection
 from libcloud.storage.types import ObjectDoesNotExistError
+from libcloud.storage.types import ContainerDoesNotExistError
+from libcloud.storage.types import ObjectHashMismatchError
 
 CHUNK_SIZE = 8096
 
+# Size of a single read / send when uploading a file
+UPLOAD_CHUNK_SIZE = 256 * 1024
+
+# Object hashes which are plain MD5 digests (and not e.g. S3 multipart ETags)
+MD5_HASH_RE = re.compile(r'^[0-9a-f]{32}$')
+
+# Errors on which a batch operation is never retried
+BATCH_FATAL_ERRORS = (ObjectDoesNotExistError, ContainerDoesNotExistError,
+                      InvalidCredsError)
+
 
 class Object(object):
     """
@@ -81,10 +104,10 @@ class Object(object):
         return self.driver.enable_object_cdn(obj=self, **kwargs)
 
     def download(self, destination_path, overwrite_existing=False,
-                 delete_on_failure=True):
+                 delete_on_failure=True, ranged=False):
         return self.driver.download_object(self, destination_path,
                                            overwrite_existing,
-                                           delete_on_failure)
+                                           delete_on_failure, ranged)
 
     def as_stream(self, chunk_size=None):
         return self.driver.download_object_as_stream(self, chunk_size)
@@ -97,6 +120,56 @@ class Object(object):
                 (self.name, self.size, self.hash, self.driver.name))
 
 
+class CompactObject(Object):
+    """
+    Object which uses less memory, meant for listing containers with a
+    large number of objects.
+
+    The attributes are stored in slots instead of a per-instance
+    dictionary (which is only created if an attribute which isn't listed in
+    __slots__ is set) and the "extra" and "meta_data" dictionaries are only
+    created once they're accessed. Otherwise it behaves exactly like an
+    Object.
+
+    Drivers create compact objects when their objectCls attribute is set
+    to this class.
+    """
+
+    __slots__ = ('name', 'size', 'hash', 'container', 'driver', '_extra',
+                 '_meta_data')
+
+    def __init__(self, name, size, hash, extra, meta_data, container,
+                 driver):
+        self.name = name
+        self.size = size
+        self.hash = hash
+        self.container = container
+        self._extra = extra or None
+        self._meta_data = meta_data or None
+        self.driver = driver
+
+    def _get_extra(self):
+        if self._extra is None:
+            self._extra = {}
+
+        return self._extra
+
+    def _set_extra(self, value):
+        self._extra = value
+
+    def _get_meta_data(self):
+        if self._meta_data is None:
+            self._meta_data = {}
+
+        return self._meta_data
+
+    def _set_meta_data(self, value):
+        self._meta_data = value
+
+    extra = property(fget=_get_extra, fset=_set_extra)
+    meta_data = property(fget=_get_meta_data, fset=_set_meta_data)
+
+
 class Container(object):
     """
     Represents a container (bucket) which can hold multiple objects.
@@ -118,8 +191,8 @@ class Container(object):
         self.extra = extra or {}
         self.driver = driver
 
-    def list_objects(self):
-        return self.driver.list_container_objects(container=self)
+    def list_objects(self, **kwargs):
+        return self.driver.list_container_objects(container=self, **kwargs)
 
     def get_cdn_url(self):
         return self.driver.get_container_cdn_url(container=self)
@@ -140,10 +213,10 @@ class Container(object):
             iterator, self, object_name, extra)
 
     def download_object(self, obj, destination_path, overwrite_existing=False,
-                        delete_on_failure=True):
+                        delete_on_failure=True, ranged=False):
         return self.driver.download_object(
             obj, destination_path, overwrite_existing=overwrite_existing,
-            delete_on_failure=delete_on_failure)
+            delete_on_failure=delete_on_failure, ranged=ranged)
 
     def download_object_as_stream(self, obj, chunk_size=None):
         return self.driver.download_object_as_stream(obj, chunk_size)
@@ -165,10 +238,36 @@ class StorageDriver(BaseDriver):
     """
 
     connectionCls = ConnectionUserAndKey
+
+    # Class of the objects which are returned by list_container_objects (set
+    # it to CompactObject to reduce memory usage when listing large
+    # containers)
+    objectCls = Object
+
     name = None
     hash_type = 'md5'
     supports_chunked_encoding = False
 
+    # True if the driver implements _get_object_range and as such supports
+    # download_object(..., ranged=True)
+    supports_ranged_download = False
+
+    # True if the driver's list_container_objects method supports ex_prefix
+    # and ex_delimiter arguments
+    supports_prefix_listing = False
+
+    # Size of a single range request, maximum number of range requests which
+    # are in flight at the same time and how many times a failed range
+    # request is retried when downloading an object with ranged=True
+    ranged_download_part_size = 8 * 1024 * 1024
+    ranged_download_concurrency = DEFAULT_CONCURRENCY
+    ranged_download_retries = 2
+
+    # True to decompress objects which are served using the deflate or gzip
+    # Content-Encoding while they are being downloaded. This doesn't apply
+    # to ranged downloads.
+    decompress_downloads = False
+
     def __init__(self, key, secret=None, secure=True, host=None, port=None,
                  **kwargs):
         super(StorageDriver, self).__init__(key=key, secret=secret,
@@ -278,7 +377,7 @@ class StorageDriver(BaseDriver):
             'enable_object_cdn not implemented for this driver')
 
     def download_object(self, obj, destination_path, overwrite_existing=False,
-                        delete_on_failure=True):
+                        delete_on_failure=True, ranged=False):
         """
         Download an object to the specified destination path.
 
@@ -297,6 +396,13 @@ class StorageDriver(BaseDriver):
         the download was not successful (hash mismatch / file size).
         @type delete_on_failure: C{bool}
 
+        @param ranged: True to download the object using multiple concurrent
+        HTTP range requests. Data is written to "<file>.partial" and if the
+        download fails, calling this method again only downloads the ranges
+        which are missing. delete_on_failure is ignored in this mode.
+        Only supported by drivers with supports_ranged_download set to True.
+        @type ranged: C{bool}
+
         @return: True if an object has been successfully downloaded, False
         otherwise.
         @rtype: C{bool}
@@ -396,6 +502,247 @@ class StorageDriver(BaseDriver):
         raise NotImplementedError(
             'delete_object not implemented for this driver')
 
+    def upload_objects(self, items, container, verify_hash=True,
+                       concurrency=DEFAULT_CONCURRENCY, retries=0,
+                       retry_delay=1):
+        """
+        Upload multiple objects currently located on a disk concurrently.
+
+        @param items: An iterable of (file_path, object_name) or
+                      (file_path, object_name, extra) tuples.
+        @type items: C{iterable}
+
+        @param container: Destination container.
+        @type container: L{Container}
+
+        @param verify_hash: Verify hash
+        @type verify_hash: C{bool}
+
+        @param concurrency: Maximum number of objects which are uploaded in
+                            parallel.
+        @type concurrency: C{int}
+
+        @param retries: How many times to retry a failed upload.
+        @type retries: C{int}
+
+        @param retry_delay: How many seconds to wait before the first retry.
+        @type retry_delay: C{float}
+
+        @return: A generator which yields (item, L{Object}, error) tuples in
+                 the order in which the uploads finish. error is None if the
+                 upload has succeeded.
+        @rtype: C{generator}
+        """
+        def upload(item):
+            file_path, object_name = item[0], item[1]
+            extra = len(item) > 2 and item[2] or None
+
+            return self.upload_object(file_path=file_path,
+                                      container=container,
+                                      object_name=object_name, extra=extra,
+                                      verify_hash=verify_hash)
+
+        return self._run_batch(func=upload, items=items,
+                               concurrency=concurrency, retries=retries,
+                               retry_delay=retry_delay)
+
+    def download_objects(self, objs, destination_path,
+                         overwrite_existing=False, delete_on_failure=True,
+                         concurrency=DEFAULT_CONCURRENCY, retries=0,
+                         retry_delay=1):
+        """
+        Download multiple objects to the specified directory concurrently.
+
+        Each object is saved to destination_path/<object name>. Missing
+        intermediate directories are created. Objects whose name would
+        resolve to a path outside of destination_path (for example names
+        which are absolute or contain "..") are not downloaded and are
+        reported with a L{LibcloudError}.
+
+        @param objs: An iterable of L{Object} instances.
+        @type objs: C{iterable}
+
+        @param destination_path: Directory where the objects are saved.
+        @type destination_path: C{str}
+
+        @param overwrite_existing: True to overwrite existing files,
+            defaults to False.
+        @type overwrite_existing: C{bool}
+
+        @param delete_on_failure: True to delete a partially downloaded file if
+        the download was not successful (hash mismatch / file size).
+        @type delete_on_failure: C{bool}
+
+        @param concurrency: Maximum number of objects which are downloaded in
+                            parallel.
+        @type concurrency: C{int}
+
+        @param retries: How many times to retry a failed download.
+        @type retries: C{int}
+
+        @param retry_delay: How many seconds to wait before the first retry.
+        @type retry_delay: C{float}
+
+        @return: A generator which yields (L{Object}, result, error) tuples
+                 in the order in which the downloads finish. result is True
+                 and error is None if the download has succeeded.
+        @rtype: C{generator}
+        """
+        if not os.path.isdir(destination_path):
+            raise LibcloudError(
+                value='Path %s does not exist' % (destination_path),
+                driver=self)
+
+        base_path = os.path.abspath(destination_path)
+
+        # abspath only keeps the trailing separator of a root directory (e.g.
+        # "/" or "C:\\")
+        if not base_path.endswith(os.sep):
+            base_path += os.sep
+
+        def download(obj):
+            file_path = os.path.abspath(pjoin(base_path, obj.name))
+
+            if not file_path.startswith(base_path):
+                raise LibcloudError(value='Object name %s resolves to a '
+                                          'path outside of %s' %
+                                          (obj.name, destination_path),
+                                    driver=self)
+
+            directory = os.path.dirname(file_path)
+
+            if not os.path.isdir(directory):
+                try:
+                    os.makedirs(directory)
+                except OSError:
+                    # Directory has been created by another thread
+                    if not os.path.isdir(directory):
+                        raise
+
+            result = self.download_object(
+                obj=obj, destination_path=file_path,
+                overwrite_existing=overwrite_existing,
+                delete_on_failure=delete_on_failure)
+
+            if not result:
+                raise LibcloudError(value='Failed to download object %s' %
+                                          (obj.name), driver=self)
+
+            return result
+
+        return self._run_batch(func=download, items=objs,
+                               concurrency=concurrency, retries=retries,
+                               retry_delay=retry_delay)
+
+    def delete_objects(self, objs, concurrency=DEFAULT_CONCURRENCY,
+                       retries=0, retry_delay=1):
+        """
+        Delete multiple objects concurrently.
+
+        Drivers for providers which support deleting multiple objects using
+        a single request should override this method.
+
+        @param objs: An iterable of L{Object} instances.
+        @type objs: C{iterable}
+
+        @param concurrency: Maximum number of objects which are deleted in
+                            parallel.
+        @type concurrency: C{int}
+
+        @param retries: How many times to retry a failed delete.
+        @type retries: C{int}
+
+        @param retry_delay: How many seconds to wait before the first retry.
+        @type retry_delay: C{float}
+
+        @return: A generator which yields (L{Object}, result, error) tuples
+                 in the order in which the deletes finish. error is None if
+                 the delete has succeeded.
+        @rtype: C{generator}
+        """
+        def delete(obj):
+            return self.delete_object(obj=obj)
+
+        return self._run_batch(func=delete, items=objs,
+                               concurrency=concurrency, retries=retries,
+                               retry_delay=retry_delay)
+
+    def list_container_objects_parallel(self, container, prefixes=None,
+                                        delimiter='/',
+                                        concurrency=DEFAULT_CONCURRENCY,
+                                        retries=0, retry_delay=1):
+        """
+        List objects in a container by partitioning it by prefix and listing
+        the partitions concurrently.
+
+        If prefixes are not provided, the top level pseudo-directories are
+        used as partitions. Objects which are not located in any of them are
+        returned as well.
+
+        Only supported by drivers with supports_prefix_listing set to True.
+
+        @param container: Container instance.
+        @type container: L{Container}
+
+        @param prefixes: Prefixes of the partitions. Prefixes must not
+                         overlap.
+        @type prefixes: C{list} of C{str}
+
+        @param delimiter: Delimiter which is used to find the top level
+                          pseudo-directories if prefixes are not provided.
+        @type delimiter: C{str}
+
+        @param concurrency: Maximum number of partitions which are listed in
+                            parallel.
+        @type concurrency: C{int}
+
+        @param retries: How many times to retry listing a partition.
+        @type retries: C{int}
+
+        @param retry_delay: How many seconds to wait before the first retry.
+        @type retry_delay: C{float}
+
+        @return: A generator which yields L{Object} instances. Objects from a
+                 single partition are yielded in order, but partitions are
+                 yielded in the order in which they finish.
+        @rtype: C{generator}
+        """
+        if not self.supports_prefix_listing:
+            raise LibcloudError(value='Prefix listing is not supported by '
+                                      'this driver', driver=self)
+
+        def list_partition(prefix):
+            return list(self.list_container_objects(container=container,
+                                                    ex_prefix=prefix))
+
+        def iterate():
+            partitions = prefixes
+
+            if partitions is None:
+                partitions = []
+                objects = self.list_container_objects(container=container,
+                                                      ex_delimiter=delimiter)
+
+                for obj in objects:
+                    if obj.extra and obj.extra.get('is_directory', False):
+                        partitions.append(obj.name)
+                    else:
+                        yield obj
+
+            results = self._run_batch(func=list_partition, items=partitions,
+                                      concurrency=concurrency,
+                                      retries=retries,
+                                      retry_delay=retry_delay)
+
+            for _, objects, error in results:
+                if error is not None:
+                    raise error
+
+                for obj in objects:
+                    yield obj
+
+        return iterate()
+
     def create_container(self, container_name):
         """
         Create a new container.
@@ -422,6 +769,22 @@ class StorageDriver(BaseDriver):
         raise NotImplementedError(
             'delete_container not implemented for this driver')
 
+    def _run_batch(self, func, items, concurrency=DEFAULT_CONCURRENCY,
+                   retries=0, retry_delay=1):
+        """
+        Call func for each item using a pool of worker threads and retry the
+        failed calls.
+
+        @rtype: C{generator}
+        @return: A generator which yields (item, result, error) tuples.
+        """
+        def call(item):
+            return call_with_retry(lambda: func(item), retries=retries,
+                                   retry_delay=retry_delay,
+                                   fatal_exceptions=BATCH_FATAL_ERRORS)
+
+        return imap_unordered(call, items, concurrency=concurrency)
+
     def _get_object(self, obj, callback, callback_kwargs, response,
                     success_status_code=None):
         """
@@ -492,26 +855,24 @@ class StorageDriver(BaseDriver):
         """
 
         chunk_size = chunk_size or CHUNK_SIZE
+        file_path = self._get_download_file_path(
+            obj=obj, destination_path=destination_path,
+            overwrite_existing=overwrite_existing)
 
-        base_name = os.path.basename(destination_path)
+        # Number of bytes received before decompression
+        received = [0]
 
-        if not base_name and not os.path.exists(destination_path):
-            raise LibcloudError(
-                value='Path %s does not exist' % (destination_path),
-                driver=self)
+        def count(chunks):
+            for chunk in chunks:
+                received[0] += len(chunk)
+                yield chunk
 
-        if not base_name:
-            file_path = pjoin(destination_path, obj.name)
-        else:
-            file_path = destination_path
+        stream = count(libcloud.utils.files.read_in_chunks(response,
+                                                           chunk_size))
+        compression_type = self._get_download_compression_type(response)
 
-        if os.path.exists(file_path) and not overwrite_existing:
-            raise LibcloudError(
-                value='File %s already exists, but ' % (file_path) +
-                'overwrite_existing=False',
-                driver=self)
-
-        stream = libcloud.utils.files.read_in_chunks(response, chunk_size)
+        if compression_type is not None:
+            stream = decompress_chunks(compression_type, stream)
 
         try:
             data_read = next(stream)
@@ -531,7 +892,9 @@ class StorageDriver(BaseDriver):
                 except StopIteration:
                     data_read = ''
 
-        if int(obj.size) != int(bytes_transferred):
+        # Size of an object which has been stored compressed refers to the
+        # compressed data
+        if int(obj.size) not in (bytes_transferred, received[0]):
             # Transfer failed, support retry?
             if delete_on_failure:
                 try:
@@ -543,6 +906,313 @@ class StorageDriver(BaseDriver):
 
         return True
 
+    def _read_object_data(self, response, chunk_size=None):
+        """
+        Return a generator which yields object data from the provided
+        response.
+
+        If decompress_downloads is True and the object is served using the
+        deflate or gzip Content-Encoding, data is decompressed on the fly.
+
+        @type response: C{httplib.HTTPResponse}
+        @param response: HTTP response.
+
+        @type chunk_size: C{int}
+        @param chunk_size: Optional chunk size
+            (defaults to L{libcloud.storage.base.CHUNK_SIZE}, 8kb)
+
+        @rtype: C{generator}
+        """
+        stream = libcloud.utils.files.read_in_chunks(response, chunk_size)
+        compression_type = self._get_download_compression_type(response)
+
+        if compression_type is not None:
+            stream = decompress_chunks(compression_type, stream)
+
+        return stream
+
+    def _get_download_compression_type(self, response):
+        """
+        Return compression type which should be used to decompress the
+        provided response or None if it shouldn't be decompressed.
+        """
+        if not self.decompress_downloads or \
+           not hasattr(response, 'getheader'):
+            return None
+
+        encoding = response.getheader('content-encoding', None)
+
+        if not encoding:
+            return None
+
+        return CONTENT_ENCODING_TYPES.get(encoding.lower(), None)
+
+    def _get_download_file_path(self, obj, destination_path,
+                                overwrite_existing=False):
+        """
+        Return path to the local file to which the object is downloaded.
+
+        @type obj: L{Object}
+        @param obj: Object instance.
+
+        @type destination_path: C{str}
+        @param destination_path: Full path to a file or a directory.
+
+        @type overwrite_existing: C{bool}
+        @param overwrite_existing: True to overwrite a local path if it already
+                                   exists.
+
+        @rtype: C{str}
+        """
+        base_name = os.path.basename(destination_path)
+
+        if not base_name and not os.path.exists(destination_path):
+            raise LibcloudError(
+                value='Path %s does not exist' % (destination_path),
+                driver=self)
+
+        if not base_name:
+            file_path = pjoin(destination_path, obj.name)
+        else:
+            file_path = destination_path
+
+        if os.path.exists(file_path) and not overwrite_existing:
+            raise LibcloudError(
+                value='File %s already exists, but ' % (file_path) +
+                'overwrite_existing=False',
+                driver=self)
+
+        return file_path
+
+    def _get_object_range(self, obj, start_bytes, end_bytes):
+        """
+        Issue a GET request for the bytes start_bytes (inclusive) to
+        end_bytes (exclusive) of the object.
+
+        Drivers which support ranged downloads need to implement this method.
+
+        @type obj: L{Object}
+        @param obj: Object instance.
+
+        @rtype: L{RawResponse}
+        @return: Raw response of the request.
+        """
+        raise NotImplementedError(
+            'ranged download not implemented for this driver')
+
+    def _get_range_header(self, start_bytes, end_bytes):
+        """
+        Return value of the HTTP Range header for the bytes start_bytes
+        (inclusive) to end_bytes (exclusive).
+        """
+        return 'bytes=%d-%d' % (start_bytes, end_bytes - 1)
+
+    def _download_object_ranged(self, obj, destination_path,
+                                overwrite_existing=False):
+        """
+        Download an object using multiple concurrent HTTP range requests.
+
+        Data is written to "<file>.partial" which is preallocated to the
+        object size. Ranges which have been downloaded are recorded in
+        "<file>.partial.ranges" so if the download fails, the next call only
+        downloads the missing ranges. Once all the ranges have been
+        downloaded, the file is moved to its final location.
+
+        @type obj: L{Object}
+        @param obj: Object instance.
+
+        @type destination_path: C{str}
+        @param destination_path: Full path to a file or a directory.
+
+        @type overwrite_existing: C{bool}
+        @param overwrite_existing: True to overwrite a local path if it already
+                                   exists.
+
+        @return: True on success.
+        @rtype: C{bool}
+        """
+        if not self.supports_ranged_download:
+            raise LibcloudError(value='Ranged download is not supported by '
+                                      'this driver', driver=self)
+
+        file_path = self._get_download_file_path(
+            obj=obj, destination_path=destination_path,
+            overwrite_existing=overwrite_existing)
+        partial_path = file_path + '.partial'
+        journal_path = partial_path + '.ranges'
+
+        object_size = int(obj.size)
+        part_size = self.ranged_download_part_size
+        parts = []
+        for index, start_bytes in enumerate(range(0, object_size, part_size)):
+            end_bytes = min(start_bytes + part_size, object_size)
+            parts.append((index, start_bytes, end_bytes))
+
+        # Ranges can only be re-used if the object hasn't changed
+        journal_header = '%s %s %s' % (object_size, obj.hash, part_size)
+        completed = self._read_ranged_download_journal(
+            journal_path=journal_path, partial_path=partial_path,
+            journal_header=journal_header, object_size=object_size)
+
+        if completed is None:
+            completed = set()
+
+            with open(partial_path, 'wb') as file_handle:
+                file_handle.truncate(object_size)
+
+            with open(journal_path, 'w') as file_handle:
+                file_handle.write(journal_header + '\n')
+
+        pending = [part for part in parts if part[0] not in completed]
+        journal = open(journal_path, 'a')
+        journal_lock = threading.Lock()
+
+        def download_part(part):
+            index, start_bytes, end_bytes = part
+
+            def download():
+                response = self._get_object_range(obj=obj,
+                                                  start_bytes=start_bytes,
+                                                  end_bytes=end_bytes)
+                return self._get_object(
+                    obj=obj, callback=self._save_object_range,
+                    response=response,
+                    callback_kwargs={'obj': obj,
+                                     'response': response.response,
+                                     'file_path': partial_path,
+                                     'start_bytes': start_bytes,
+                                     'end_bytes': end_bytes},
+                    success_status_code=httplib.PARTIAL_CONTENT)
+
+            call_with_retry(download, retries=self.ranged_download_retries,
+                            fatal_exceptions=BATCH_FATAL_ERRORS)
+
+            journal_lock.acquire()
+            try:
+                journal.write('%s\n' % (index))
+                journal.flush()
+            finally:
+                journal_lock.release()
+
+        errors = []
+        try:
+            for _, _, error in imap_unordered(
+                    download_part, pending,
+                    concurrency=self.ranged_download_concurrency):
+                if error is not None:
+                    errors.append(error)
+        finally:
+            journal.close()
+
+        if errors:
+            # Downloaded ranges are kept so the download can be resumed
+            raise errors[0]
+
+        try:
+            self._verify_ranged_download(obj=obj, file_path=partial_path)
+        except LibcloudError:
+            # Data is corrupted so the next attempt needs to start over
+            os.unlink(partial_path)
+            os.unlink(journal_path)
+            raise
+
+        if os.path.exists(file_path):
+            os.unlink(file_path)
+
+        os.rename(partial_path, file_path)
+        os.unlink(journal_path)
+        return True
+
+    def _verify_ranged_download(self, obj, file_path):
+        """
+        Check the size of a file assembled from the downloaded ranges and its
+        MD5 digest if the object hash is a plain MD5 digest (multipart
+        upload ETags are not).
+        """
+        file_size = os.path.getsize(file_path)
+
+        if file_size != int(obj.size):
+            raise LibcloudError(
+                value='Downloaded file size (%s) of object %s doesn\'t match '
+                      'the object size (%s)' % (file_size, obj.name,
+                                                obj.size),
+                driver=self)
+
+        expected_hash = (obj.hash or '').strip('"').lower()
+
+        if not MD5_HASH_RE.match(expected_hash):
+            return
+
+        hasher = hashlib.md5()
+
+        with open(file_path, 'rb') as file_handle:
+            for data in libcloud.utils.files.read_in_chunks(file_handle,
+                                                            CHUNK_SIZE):
+                hasher.update(data)
+
+        if hasher.hexdigest() != expected_hash:
+            raise ObjectHashMismatchError(
+                value='MD5 hash of the downloaded file doesn\'t match the '
+                      'object hash %s' % (expected_hash),
+                object_name=obj.name, driver=self)
+
+    def _read_ranged_download_journal(self, journal_path, partial_path,
+                                      journal_header, object_size):
+        """
+        Return a set with indexes of the ranges which have already been
+        downloaded or None if there is nothing to resume.
+        """
+        if not os.path.exists(journal_path) or \
+           not os.path.exists(partial_path):
+            return None
+
+        if os.path.getsize(partial_path) != object_size:
+            return None
+
+        with open(journal_path, 'r') as file_handle:
+            lines = file_handle.read().splitlines()
+
+        if not lines or lines[0] != journal_header:
+            return None
+
+        # Last line can be incomplete if the process has been killed
+        return set([int(line) for line in lines[1:] if line.isdigit()])
+
+    def _save_object_range(self, response, obj, file_path, start_bytes,
+                           end_bytes, chunk_size=None):
+        """
+        Write a single range of the object to the provided (preallocated)
+        file.
+
+        @return: True on success.
+        @rtype: C{bool}
+        """
+        chunk_size = chunk_size or CHUNK_SIZE
+        stream = libcloud.utils.files.read_in_chunks(response, chunk_size)
+        range_size = end_bytes - start_bytes
+        bytes_transferred = 0
+
+        with open(file_path, 'r+b') as file_handle:
+            file_handle.seek(start_bytes)
+
+            for data in stream:
+                data = b(data)
+
+                # Never overwrite data which belongs to the other ranges
+                if bytes_transferred < range_size:
+                    file_handle.write(data[:range_size - bytes_transferred])
+
+                bytes_transferred += len(data)
+
+        if bytes_transferred != end_bytes - start_bytes:
+            raise LibcloudError(
+                value='Range %s-%s of object %s is incomplete (%s bytes '
+                      'received)' % (start_bytes, end_bytes, obj.name,
+                                     bytes_transferred),
+                driver=self)
+
+        return True
+
     def _upload_object(self, object_name, content_type, upload_func,
                        upload_func_kwargs, request_path, request_method='PUT',
                        headers=None, file_path=None, iterator=None):
@@ -741,30 +1411,140 @@ class StorageDriver(BaseDriver):
         """
         Upload a file to the server.
 
+        For plain HTTP connections, the file is memory mapped and handed to
+        the socket without copying it in user space (or sent using
+        sendfile(2) if the hash doesn't need to be calculated). Otherwise
+        the file is read in fixed size blocks into a single re-used buffer.
+        In both cases the hash is calculated in the same pass.
+
+        The socket is bypassed when debug logging is enabled
+        (LIBCLOUD_DEBUG) so the uploaded data is still logged.
+
         @type response: C{RawResponse}
         @param response: RawResponse object.
 
         @type file_path: C{str}
         @param file_path: Path to a local file.
 
-        @type iterator: C{}
-        @param response: An object which implements an iterator interface (File
-                         object, etc.)
+        @type chunked: C{boolean}
+        @param chunked: True if the chunked transfer encoding should be used
+                        (defaults to False).
+
+        @type calculate_hash: C{boolean}
+        @param calculate_hash: True to calculate hash of the transferred data
+                               (defaults to True).
 
         @rtype: C{tuple}
         @return: First item is a boolean indicator of success, second
                  one is the uploaded data MD5 hash and the third one
                  is the number of transferred bytes.
         """
+        if PY25:
+            # No bytearray support
+            with open(file_path, 'rb') as file_handle:
+                return self._stream_data(response=response,
+                                         iterator=iter(file_handle),
+                                         chunked=chunked,
+                                         calculate_hash=calculate_hash)
+
+        connection = response.connection.connection
+        sock = getattr(connection, 'sock', None)
+        use_socket = (sock is not None and not chunked and
+                      not response.connection.secure and
+                      not isinstance(connection, LoggingConnection))
+
+        data_hash = None
+        if calculate_hash:
+            data_hash = self._get_hash_function()
+
         with open(file_path, 'rb') as file_handle:
-            success, data_hash, bytes_transferred = (
-                self._stream_data(
-                    response=response,
-                    iterator=iter(file_handle),
-                    chunked=chunked,
-                    calculate_hash=calculate_hash))
+            file_size = os.fstat(file_handle.fileno()).st_size
+
+            try:
+                if use_socket and file_size > 0:
+                    bytes_transferred = self._send_file_to_socket(
+                        sock=sock, file_handle=file_handle,
+                        file_size=file_size, data_hash=data_hash)
+                else:
+                    bytes_transferred = self._send_file_buffered(
+                        connection=connection, file_handle=file_handle,
+                        chunked=chunked, data_hash=data_hash)
+            except (socket.error, IOError):
+                # Timeout, connection reset, etc.
+                return False, None, 0
+
+        if calculate_hash:
+            data_hash = data_hash.hexdigest()
+
+        return True, data_hash, bytes_transferred
+
+    def _send_file_to_socket(self, sock, file_handle, file_size, data_hash):
+        """
+        Send a file directly to a plain (non-TLS) socket.
+
+        @return: Number of transferred bytes.
+        @rtype: C{int}
+        """
+        if data_hash is None and hasattr(sock, 'sendfile'):
+            # Data never leaves the kernel
+            return sock.sendfile(file_handle)
+
+        mapped = mmap.mmap(file_handle.fileno(), 0, access=mmap.ACCESS_READ)
+        offset = 0
+        view = None
+
+        try:
+            while offset < file_size:
+                view = buffer_view(mapped, offset, UPLOAD_CHUNK_SIZE)
+
+                if data_hash is not None:
+                    data_hash.update(view)
+
+                sock.sendall(view)
+                offset += len(view)
+        finally:
+            # Map can't be closed while a view of it is still alive
+            view = None
+            mapped.close()
+
+        return offset
+
+    def _send_file_buffered(self, connection, file_handle, chunked,
+                            data_hash):
+        """
+        Read a file into a re-used buffer and send it using the
+        connection.
+
+        @return: Number of transferred bytes.
+        @rtype: C{int}
+        """
+        buf = bytearray(UPLOAD_CHUNK_SIZE)
+        bytes_transferred = 0
+
+        while True:
+            read = file_handle.readinto(buf)
+
+            if not read:
+                break
+
+            view = buffer_view(buf, 0, read)
+
+            if data_hash is not None:
+                data_hash.update(view)
+
+            if chunked:
+                connection.send(b('%X\r\n' % (read)))
+                connection.send(view)
+                connection.send(b('\r\n'))
+            else:
+                connection.send(view)
+
+            bytes_transferred += read
+
+        if chunked:
+            connection.send(b('0\r\n\r\n'))
 
-        return success, data_hash, bytes_transferred
+        return bytes_transferred
 
     def _get_hash_function(self):
         """
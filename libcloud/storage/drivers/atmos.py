@@ -19,7 +19,6 @@ import hashlib
 import hmac
 import time
 
-from libcloud.utils.py3 import PY3
 from libcloud.utils.py3 import b
 from libcloud.utils.py3 import httplib
 from libcloud.utils.py3 import next
@@ -28,18 +27,19 @@ from libcloud.utils.py3 import urlencode
 from libcloud.utils.py3 import urlquote
 from libcloud.utils.py3 import urlunquote
 
-if PY3:
-    from io import FileIO as file
-
 from libcloud.utils.files import read_in_chunks, guess_file_mime_type
+from libcloud.utils.concurrency import DEFAULT_CONCURRENCY, imap_unordered
 from libcloud.common.base import ConnectionUserAndKey, XmlResponse
 from libcloud.common.types import LazyList, LibcloudError
 
-from libcloud.storage.base import Object, Container, StorageDriver, CHUNK_SIZE
+from libcloud.storage.base import Object, Container, StorageDriver
 from libcloud.storage.types import ContainerAlreadyExistsError, \
     ContainerDoesNotExistError, ContainerIsNotEmptyError, \
     ObjectDoesNotExistError
 
+# Size of a single block which is written by upload_object_via_stream
+STREAM_UPLOAD_BLOCK_SIZE = 4 * 1024 * 1024
+
 
 def collapse(s):
     return ' '.join([x for x in s.split(' ') if x])
@@ -124,6 +124,7 @@ class AtmosDriver(StorageDriver):
     path = None
     api_name = 'atmos'
     supports_chunked_encoding = True
+    supports_ranged_download = True
     website = 'http://atmosonline.com/'
     name = 'atmos'
 
@@ -263,17 +264,26 @@ class AtmosDriver(StorageDriver):
                       extra, meta_data, container, self)
 
     def upload_object_via_stream(self, iterator, container, object_name,
-                                 extra=None):
-        if isinstance(iterator, file):
-            iterator = iter(iterator)
+                                 extra=None,
+                                 ex_block_size=STREAM_UPLOAD_BLOCK_SIZE,
+                                 ex_concurrency=DEFAULT_CONCURRENCY):
+        """
+        @inherits: L{StorageDriver.upload_object_via_stream}
 
+        Data is buffered into blocks of ex_block_size bytes. The first block
+        creates the object and the remaining ones are written using range
+        requests, up to ex_concurrency of them in parallel. At most
+        ex_concurrency + 1 blocks are held in memory at any given time.
+
+        @param ex_block_size: Size of a single block in bytes.
+        @type ex_block_size: C{int}
+
+        @param ex_concurrency: Maximum number of range requests which are in
+                               flight at the same time.
+        @type ex_concurrency: C{int}
+        """
         data_hash = hashlib.md5()
-        generator = read_in_chunks(iterator, CHUNK_SIZE, True)
-        bytes_transferred = 0
-        try:
-            chunk = next(generator)
-        except StopIteration:
-            chunk = ''
+        generator = read_in_chunks(iterator, ex_block_size, True)
 
         path = self._namespace_path(container.name + '/' + object_name)
         method = 'PUT'
@@ -298,28 +308,51 @@ class AtmosDriver(StorageDriver):
                 raise
             method = 'POST'
 
-        while True:
-            end = bytes_transferred + len(chunk) - 1
-            data_hash.update(b(chunk))
+        try:
+            chunk = next(generator)
+        except StopIteration:
+            chunk = b('')
+
+        data_hash.update(b(chunk))
+        self.connection.request(path, method=method, data=chunk,
+                                headers={'Content-Type': content_type})
+        bytes_transferred = len(chunk)
+        errors = []
+
+        def blocks(offset):
+            for chunk in generator:
+                if errors:
+                    # Stop reading the data as soon as any of the writes fails
+                    return
+
+                # Blocks are read in order so a single running hash can be
+                # used even though they are written out of order
+                data_hash.update(b(chunk))
+                yield offset, chunk
+                offset += len(chunk)
+
+        def write_block(item):
+            offset, chunk = item
             headers = {
-                'x-emc-meta': 'md5=' + data_hash.hexdigest(),
                 'Content-Type': content_type,
+                'Range': 'Bytes=%d-%d' % (offset, offset + len(chunk) - 1)
             }
+            self.connection.request(path, method='PUT', data=chunk,
+                                    headers=headers)
+
+        results = imap_unordered(write_block, blocks(bytes_transferred),
+                                 concurrency=ex_concurrency)
 
-            if len(chunk) > 0 and bytes_transferred > 0:
-                headers['Range'] = 'Bytes=%d-%d' % (bytes_transferred, end)
-                method = 'PUT'
+        for (_, chunk), _, error in results:
+            if error is not None:
+                # Wait for the writes which are in progress to finish
+                errors.append(error)
+                continue
 
-            result = self.connection.request(path, method=method, data=chunk,
-                                             headers=headers)
             bytes_transferred += len(chunk)
 
-            try:
-                chunk = next(generator)
-            except StopIteration:
-                break
-            if len(chunk) == 0:
-                break
+        if errors:
+            raise errors[0]
 
         data_hash = data_hash.hexdigest()
 
@@ -345,7 +378,12 @@ class AtmosDriver(StorageDriver):
                       meta_data, container, self)
 
     def download_object(self, obj, destination_path, overwrite_existing=False,
-                        delete_on_failure=True):
+                        delete_on_failure=True, ranged=False):
+        if ranged:
+            return self._download_object_ranged(
+                obj=obj, destination_path=destination_path,
+                overwrite_existing=overwrite_existing)
+
         path = self._namespace_path(obj.container.name + '/' + obj.name)
         response = self.connection.request(path, method='GET', raw=True)
 
@@ -364,14 +402,21 @@ class AtmosDriver(StorageDriver):
         path = self._namespace_path(obj.container.name + '/' + obj.name)
         response = self.connection.request(path, method='GET', raw=True)
 
-        return self._get_object(obj=obj, callback=read_in_chunks,
+        return self._get_object(obj=obj, callback=self._read_object_data,
                                 response=response,
                                 callback_kwargs={
-                                    'iterator': response.response,
+                                    'response': response.response,
                                     'chunk_size': chunk_size
                                 },
                                 success_status_code=httplib.OK)
 
+    def _get_object_range(self, obj, start_bytes, end_bytes):
+        path = self._namespace_path(obj.container.name + '/' + obj.name)
+        headers = {'Range': self._get_range_header(start_bytes, end_bytes)}
+
+        return self.connection.request(path, method='GET', headers=headers,
+                                       raw=True)
+
     def delete_object(self, obj):
         path = self._namespace_path(obj.container.name) + '/' +\
             self._clean_object_name(obj.name)
@@ -384,9 +429,20 @@ class AtmosDriver(StorageDriver):
             raise ObjectDoesNotExistError(e, self, obj.name)
         return True
 
-    def list_container_objects(self, container):
+    def list_container_objects(self, container, ex_keep_pages=True):
+        """
+        @inherits: L{StorageDriver.list_container_objects}
+
+        @param ex_keep_pages: If False, iterating over the returned list
+                              doesn't keep the retrieved objects in memory so
+                              large containers can be listed using memory
+                              bounded by the page size. Each iteration
+                              starts a new listing in this mode.
+        @type ex_keep_pages: C{bool}
+        """
         value_dict = {'container': container}
-        return LazyList(get_more=self._get_more, value_dict=value_dict)
+        return LazyList(get_more=self._get_more, value_dict=value_dict,
+                        prefetch=True, keep_pages=ex_keep_pages)
 
     def enable_object_cdn(self, obj):
         return True
@@ -33,9 +33,12 @@ from libcloud.utils.py3 import urlquote
 if PY3:
     from io import FileIO as file
 
-from libcloud.utils.files import read_in_chunks
+from libcloud.utils.concurrency import DEFAULT_CONCURRENCY
+from libcloud.utils.concurrency import imap_unordered, call_with_retry
 from libcloud.common.types import MalformedResponseError, LibcloudError
+from libcloud.common.types import InvalidCredsError
 from libcloud.common.base import Response, RawResponse
+from libcloud.common.base import ThreadLocalAttribute
 
 from libcloud.storage.providers import Provider
 from libcloud.storage.base import Object, Container, StorageDriver
@@ -105,6 +108,7 @@ class CloudFilesConnection(OpenStackBaseConnection):
     auth_url = AUTH_URL_US
     responseCls = CloudFilesResponse
     rawResponseCls = CloudFilesRawResponse
+    cdn_request = ThreadLocalAttribute('cdn_request', False)
 
     def __init__(self, user_id, key, secure=True, **kwargs):
         super(CloudFilesConnection, self).__init__(user_id, key, secure=secure,
@@ -223,6 +227,8 @@ class CloudFilesStorageDriver(StorageDriver, OpenStackDriverMixin):
     connectionCls = CloudFilesConnection
     hash_type = 'md5'
     supports_chunked_encoding = True
+    supports_ranged_download = True
+    supports_prefix_listing = True
 
     def __init__(self, *args, **kwargs):
         OpenStackDriverMixin.__init__(self, *args, **kwargs)
@@ -238,9 +244,38 @@ class CloudFilesStorageDriver(StorageDriver, OpenStackDriverMixin):
 
         raise LibcloudError('Unexpected status code: %s' % (response.status))
 
-    def list_container_objects(self, container):
-        value_dict = {'container': container}
-        return LazyList(get_more=self._get_more, value_dict=value_dict)
+    def list_container_objects(self, container, ex_prefix=None,
+                               ex_delimiter=None, ex_page_size=None,
+                               ex_keep_pages=True):
+        """
+        @inherits: L{StorageDriver.list_container_objects}
+
+        @param ex_prefix: Only return objects whose names start with this
+                          prefix.
+        @type ex_prefix: C{str}
+
+        @param ex_delimiter: If provided, objects whose names contain the
+                             delimiter after the prefix are rolled up into a
+                             single pseudo-directory L{Object} (with
+                             extra['is_directory'] set to True) per common
+                             prefix.
+        @type ex_delimiter: C{str}
+
+        @param ex_page_size: Maximum number of objects which are retrieved in
+                             a single request (defaults to 10000).
+        @type ex_page_size: C{int}
+
+        @param ex_keep_pages: If False, iterating over the returned list
+                              doesn't keep the retrieved objects in memory so
+                              large containers can be listed using memory
+                              bounded by the page size. Each iteration
+                              starts a new listing in this mode.
+        @type ex_keep_pages: C{bool}
+        """
+        value_dict = {'container': container, 'prefix': ex_prefix,
+                      'delimiter': ex_delimiter, 'page_size': ex_page_size}
+        return LazyList(get_more=self._get_more, value_dict=value_dict,
+                        prefetch=True, keep_pages=ex_keep_pages)
 
     def get_container(self, container_name):
         response = self.connection.request('/%s' % (container_name),
@@ -345,7 +380,12 @@ class CloudFilesStorageDriver(StorageDriver, OpenStackDriverMixin):
                                            container_name=name, driver=self)
 
     def download_object(self, obj, destination_path, overwrite_existing=False,
-                        delete_on_failure=True):
+                        delete_on_failure=True, ranged=False):
+        if ranged:
+            return self._download_object_ranged(
+                obj=obj, destination_path=destination_path,
+                overwrite_existing=overwrite_existing)
+
         container_name = obj.container.name
         object_name = obj.name
         response = self.connection.request('/%s/%s' % (container_name,
@@ -368,12 +408,22 @@ class CloudFilesStorageDriver(StorageDriver, OpenStackDriverMixin):
                                                        object_name),
                                            method='GET', raw=True)
 
-        return self._get_object(obj=obj, callback=read_in_chunks,
+        return self._get_object(obj=obj, callback=self._read_object_data,
                                 response=response,
-                                callback_kwargs={'iterator': response.response,
+                                callback_kwargs={'response': response.response,
                                                  'chunk_size': chunk_size},
                                 success_status_code=httplib.OK)
 
+    def _get_object_range(self, obj, start_bytes, end_bytes):
+        container_name = obj.container.name
+        object_name = obj.name
+        headers = {'Range': self._get_range_header(start_bytes, end_bytes)}
+
+        return self.connection.request('/%s/%s' % (container_name,
+                                                   object_name),
+                                       method='GET', headers=headers,
+                                       raw=True)
+
     def upload_object(self, file_path, container, object_name, extra=None,
                       verify_hash=True):
         """
@@ -382,7 +432,8 @@ class CloudFilesStorageDriver(StorageDriver, OpenStackDriverMixin):
         Note: This will override file with a same name if it already exists.
         """
         upload_func = self._upload_file
-        upload_func_kwargs = {'file_path': file_path}
+        upload_func_kwargs = {'file_path': file_path,
+                              'calculate_hash': verify_hash}
 
         return self._put_object(container=container, object_name=object_name,
                                 upload_func=upload_func,
@@ -445,20 +496,106 @@ class CloudFilesStorageDriver(StorageDriver, OpenStackDriverMixin):
 
     def ex_multipart_upload_object(self, file_path, container, object_name,
                                    chunk_size=33554432, extra=None,
-                                   verify_hash=True):
+                                   verify_hash=True,
+                                   concurrency=DEFAULT_CONCURRENCY,
+                                   resume=False, retries=0, retry_delay=1):
+        """
+        Upload a large object as a set of segments and a manifest object
+        which ties them together.
+
+        Segments are uploaded concurrently and named
+        C{<object_name>/<segment number>}.
+
+        If C{resume} is True, segments which already exist in the container
+        (e.g. from a previous upload which has been interrupted) and whose
+        hash matches the hash of the corresponding local chunk are not
+        uploaded again.
+
+        @param file_path: Path to the local file.
+        @type file_path: C{str}
+
+        @param container: Destination container.
+        @type container: L{Container}
+
+        @param object_name: Object name.
+        @type object_name: C{str}
+
+        @param chunk_size: Segment size in bytes.
+        @type chunk_size: C{int}
+
+        @param concurrency: Maximum number of segments which are uploaded at
+                            the same time.
+        @type concurrency: C{int}
+
+        @param resume: Only upload segments which are missing or don't match
+                       the local file.
+        @type resume: C{bool}
+
+        @param retries: How many times to retry a failed segment upload.
+        @type retries: C{int}
+
+        @param retry_delay: How many seconds to wait before the first retry.
+        @type retry_delay: C{float}
+
+        @rtype: L{Object}
+        """
         object_size = os.path.getsize(file_path)
         if object_size < chunk_size:
             return self.upload_object(file_path, container, object_name,
                                       extra=extra, verify_hash=verify_hash)
 
-        iter_chunk_reader = FileChunkReader(file_path, chunk_size)
-
-        for index, iterator in enumerate(iter_chunk_reader):
-            self._upload_object_part(container=container,
-                                     object_name=object_name,
-                                     part_number=index,
-                                     iterator=iterator,
-                                     verify_hash=verify_hash)
+        segments = []
+        for index, start_block in enumerate(range(0, object_size,
+                                                  chunk_size)):
+            end_block = min(start_block + chunk_size, object_size)
+            segments.append((index, start_block, end_block))
+
+        existing_segments = {}
+        if resume:
+            existing_segments = self._get_object_segments(
+                container=container, object_name=object_name)
+
+        def upload_segment(segment):
+            index, start_block, end_block = segment
+            existing = existing_segments.get(index, None)
+
+            if existing is not None and \
+               existing.size == end_block - start_block and \
+               existing.hash == self._get_file_range_hash(
+                   file_path, start_block, end_block):
+                return existing
+
+            def upload():
+                iterator = ChunkStreamReader(file_path=file_path,
+                                             start_block=start_block,
+                                             end_block=end_block,
+                                             chunk_size=8192)
+                return self._upload_object_part(container=container,
+                                                object_name=object_name,
+                                                part_number=index,
+                                                iterator=iterator,
+                                                verify_hash=verify_hash)
+
+            return call_with_retry(upload, retries=retries,
+                                   retry_delay=retry_delay,
+                                   fatal_exceptions=(InvalidCredsError,))
+
+        errors = []
+        for _, _, error in imap_unordered(upload_segment, segments,
+                                          concurrency=concurrency):
+            if error is not None:
+                errors.append(error)
+
+        if errors:
+            # Segments which have been uploaded are left in place so the
+            # upload can be resumed later on
+            raise errors[0]
+
+        # Segments from a previous (larger) upload would otherwise end up
+        # being part of the object
+        for index, obj in existing_segments.items():
+            if index >= len(segments):
+                self.delete_object(obj)
 
         return self._upload_object_manifest(container=container,
                                             object_name=object_name,
@@ -581,12 +718,12 @@ class CloudFilesStorageDriver(StorageDriver, OpenStackDriverMixin):
         part_name = object_name + '/%08d' % part_number
         extra = {'content_type': 'application/octet-stream'}
 
-        self._put_object(container=container,
-                         object_name=part_name,
-                         upload_func=upload_func,
-                         upload_func_kwargs=upload_func_kwargs,
-                         extra=extra, iterator=iterator,
-                         verify_hash=verify_hash)
+        return self._put_object(container=container,
+                                object_name=part_name,
+                                upload_func=upload_func,
+                                upload_func_kwargs=upload_func_kwargs,
+                                extra=extra, iterator=iterator,
+                                verify_hash=verify_hash)
 
     def _upload_object_manifest(self, container, object_name, extra=None,
                                 verify_hash=True):
@@ -627,13 +764,52 @@ class CloudFilesStorageDriver(StorageDriver, OpenStackDriverMixin):
 
         return obj
 
+    def _get_object_segments(self, container, object_name):
+        """
+        Return a dictionary which maps segment number to L{Object} for all
+        the existing segments of a multipart object.
+        """
+        prefix = object_name + '/'
+        segments = {}
+
+        for obj in self.list_container_objects(container=container,
+                                               ex_prefix=prefix):
+            suffix = obj.name[len(prefix):]
+
+            if len(suffix) == 8 and suffix.isdigit():
+                segments[int(suffix)] = obj
+
+        return segments
+
+    def _get_file_range_hash(self, file_path, start_block, end_block):
+        hash_function = self._get_hash_function()
+        iterator = ChunkStreamReader(file_path=file_path,
+                                     start_block=start_block,
+                                     end_block=end_block,
+                                     chunk_size=8192)
+
+        for data in iterator:
+            hash_function.update(data)
+
+        return hash_function.hexdigest()
+
     def _get_more(self, last_key, value_dict):
         container = value_dict['container']
+        page_size = value_dict.get('page_size', None)
         params = {}
 
         if last_key:
             params['marker'] = last_key
 
+        if value_dict.get('prefix', None):
+            params['prefix'] = value_dict['prefix']
+
+        if value_dict.get('delimiter', None):
+            params['delimiter'] = value_dict['delimiter']
+
+        if page_size:
+            params['limit'] = page_size
+
         response = self.connection.request('/%s' % (container.name),
                                            params=params)
 
@@ -648,7 +824,9 @@ class CloudFilesStorageDriver(StorageDriver, OpenStackDriverMixin):
             if len(objects) == 0:
                 return [], None, True
 
-            return objects, objects[-1].name, False
+            # A short page means there are no more objects
+            exhausted = bool(page_size) and len(objects) < int(page_size)
+            return objects, objects[-1].name, exhausted
 
         raise LibcloudError('Unexpected status code: %s' % (response.status))
 
@@ -741,12 +919,21 @@ class CloudFilesStorageDriver(StorageDriver, OpenStackDriverMixin):
         objects = []
 
         for obj in response:
+            if 'subdir' in obj:
+                # Pseudo-directory which is returned if a delimiter has been
+                # specified
+                objects.append(self.objectCls(
+                    name=obj['subdir'], size=0, hash=None,
+                    extra={'is_directory': True}, meta_data={},
+                    container=container, driver=self))
+                continue
+
             name = obj['name']
             size = int(obj['bytes'])
             hash = obj['hash']
             extra = {'content_type': obj['content_type'],
                      'last_modified': obj['last_modified']}
-            objects.append(Object(
+            objects.append(self.objectCls(
                 name=name, size=size, hash=hash, extra=extra,
                 meta_data=None, container=container, driver=self))
 
@@ -334,7 +334,7 @@ class DummyStorageDriver(StorageDriver):
         return True
 
     def download_object(self, obj, destination_path, overwrite_existing=False,
-                        delete_on_failure=True):
+                        delete_on_failure=True, ranged=False):
         kwargs_dict = {'obj': obj,
                        'response': DummyFileObject(),
                        'destination_path': destination_path,
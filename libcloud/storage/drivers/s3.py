@@ -13,6 +13,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
+import sys
 import time
 import copy
 import base64
@@ -27,7 +29,10 @@ from libcloud.utils.py3 import urlquote
 from libcloud.utils.py3 import b
 
 from libcloud.utils.xml import fixxpath, findtext
-from libcloud.utils.files import read_in_chunks
+from libcloud.utils.files import read_in_chunks, guess_file_mime_type
+from libcloud.utils.cache import TTLCache
+from libcloud.utils.concurrency import DEFAULT_CONCURRENCY
+from libcloud.utils.concurrency import imap_unordered, call_with_retry
 from libcloud.common.types import InvalidCredsError, LibcloudError
 from libcloud.common.base import ConnectionUserAndKey, RawResponse
 from libcloud.common.aws import AWSBaseResponse
@@ -53,6 +58,11 @@ S3_AP_NORTHEAST_HOST = 's3-ap-northeast-1.amazonaws.com'
 API_VERSION = '2006-03-01'
 NAMESPACE = 'http://s3.amazonaws.com/doc/%s/' % (API_VERSION)
 
+# Default size of a single part used with multipart uploads
+MULTIPART_PART_SIZE = 8 * 1024 * 1024
+# S3 requires all the parts except the last one to be at least 5 MB in size
+MULTIPART_MIN_PART_SIZE = 5 * 1024 * 1024
+
 
 class S3Response(AWSBaseResponse):
 
@@ -169,49 +179,120 @@ class S3StorageDriver(StorageDriver):
     connectionCls = S3Connection
     hash_type = 'md5'
     supports_chunked_encoding = False
+    supports_ranged_download = True
+    supports_prefix_listing = True
+    supports_s3_multipart_upload = True
     ex_location_name = ''
     namespace = NAMESPACE
 
+    # How many seconds containers returned by get_container are cached for
+    # (0 disables caching) and maximum number of cached containers
+    container_cache_ttl = 60
+    container_cache_size = 1000
+
+    def __init__(self, *args, **kwargs):
+        super(S3StorageDriver, self).__init__(*args, **kwargs)
+        self._container_cache = TTLCache(ttl=self.container_cache_ttl,
+                                         max_size=self.container_cache_size)
+
     def list_containers(self):
-        response = self.connection.request('/')
+        response = self._streaming_request('/')
         if response.status == httplib.OK:
             containers = self._to_containers(obj=response.object,
                                              xpath='Buckets/Bucket')
+
+            for container in containers:
+                self._container_cache.set(container.name, container)
+
             return containers
 
         raise LibcloudError('Unexpected status code: %s' % (response.status),
                             driver=self)
 
-    def list_container_objects(self, container):
-        value_dict = {'container': container}
-        return LazyList(get_more=self._get_more, value_dict=value_dict)
+    def list_container_objects(self, container, ex_prefix=None,
+                               ex_delimiter=None, ex_page_size=None,
+                               ex_keep_pages=True):
+        """
+        @inherits: L{StorageDriver.list_container_objects}
+
+        @param ex_prefix: Only return objects whose names start with this
+                          prefix.
+        @type ex_prefix: C{str}
+
+        @param ex_delimiter: If provided, objects whose names contain the
+                             delimiter after the prefix are rolled up into a
+                             single pseudo-directory L{Object} (with
+                             extra['is_directory'] set to True) per common
+                             prefix.
+        @type ex_delimiter: C{str}
+
+        @param ex_page_size: Maximum number of objects which are retrieved in
+                             a single request (defaults to 1000).
+        @type ex_page_size: C{int}
+
+        @param ex_keep_pages: If False, iterating over the returned list
+                              doesn't keep the retrieved objects in memory so
+                              large containers can be listed using memory
+                              bounded by the page size. Each iteration
+                              starts a new listing in this mode.
+        @type ex_keep_pages: C{bool}
+        """
+        value_dict = {'container': container, 'prefix': ex_prefix,
+                      'delimiter': ex_delimiter, 'page_size': ex_page_size}
+        return LazyList(get_more=self._get_more, value_dict=value_dict,
+                        prefetch=True, keep_pages=ex_keep_pages)
 
     def get_container(self, container_name):
-        # This is very inefficient, but afaik it's the only way to do it
-        containers = self.list_containers()
+        """
+        @inherits: L{StorageDriver.get_container}
 
-        try:
-            container = [c for c in containers if c.name == container_name][0]
-        except IndexError:
+        The existence of the container is checked using a HEAD request
+        which means that, unlike containers returned by list_containers,
+        'extra' dictionary doesn't contain the creation date. Containers are
+        cached for container_cache_ttl seconds.
+        """
+        container = self._container_cache.get(container_name)
+
+        if container is not None:
+            return container
+
+        response = self.connection.request('/%s' % (container_name),
+                                           method='HEAD')
+
+        if response.status == httplib.OK:
+            container = Container(name=container_name, extra=None,
+                                  driver=self)
+            self._container_cache.set(container_name, container)
+            return container
+        elif response.status == httplib.NOT_FOUND:
             raise ContainerDoesNotExistError(value=None, driver=self,
                                              container_name=container_name)
 
-        return container
+        raise LibcloudError('Unexpected status code: %s' % (response.status),
+                            driver=self)
 
     def get_object(self, container_name, object_name):
-        # TODO: Figure out what is going on when the object or container
-        # does not exist- it seems that Amazon just keeps the connection open
-        # and doesn't return a response.
-        container = self.get_container(container_name=container_name)
         response = self.connection.request('/%s/%s' % (container_name,
                                                        object_name),
                                            method='HEAD')
         if response.status == httplib.OK:
+            # The object exists so the container does as well and there is
+            # no need to issue a separate request for it
+            container = self._container_cache.get(container_name)
+
+            if container is None:
+                container = Container(name=container_name, extra=None,
+                                      driver=self)
+                self._container_cache.set(container_name, container)
+
             obj = self._headers_to_object(object_name=object_name,
                                           container=container,
                                           headers=response.headers)
             return obj
 
+        # Raises ContainerDoesNotExistError if the container doesn't exist
+        self.get_container(container_name=container_name)
+
         raise ObjectDoesNotExistError(value=None, driver=self,
                                       object_name=object_name)
 
@@ -235,6 +316,7 @@ class S3StorageDriver(StorageDriver):
 
         if response.status == httplib.OK:
             container = Container(name=container_name, extra=None, driver=self)
+            self._container_cache.set(container_name, container)
             return container
         elif response.status == httplib.CONFLICT:
             raise InvalidContainerNameError(
@@ -254,6 +336,9 @@ class S3StorageDriver(StorageDriver):
         # Note: All the objects in the container must be deleted first
         response = self.connection.request('/%s' % (container.name),
                                            method='DELETE')
+        if response.status in [httplib.NO_CONTENT, httplib.NOT_FOUND]:
+            self._container_cache.delete(container.name)
+
         if response.status == httplib.NO_CONTENT:
             return True
         elif response.status == httplib.CONFLICT:
@@ -268,7 +353,12 @@ class S3StorageDriver(StorageDriver):
         return False
 
     def download_object(self, obj, destination_path, overwrite_existing=False,
-                        delete_on_failure=True):
+                        delete_on_failure=True, ranged=False):
+        if ranged:
+            return self._download_object_ranged(
+                obj=obj, destination_path=destination_path,
+                overwrite_existing=overwrite_existing)
+
         container_name = self._clean_object_name(obj.container.name)
         object_name = self._clean_object_name(obj.name)
 
@@ -294,12 +384,22 @@ class S3StorageDriver(StorageDriver):
                                                        object_name),
                                            method='GET', raw=True)
 
-        return self._get_object(obj=obj, callback=read_in_chunks,
+        return self._get_object(obj=obj, callback=self._read_object_data,
                                 response=response,
-                                callback_kwargs={'iterator': response.response,
+                                callback_kwargs={'response': response.response,
                                                  'chunk_size': chunk_size},
                                 success_status_code=httplib.OK)
 
+    def _get_object_range(self, obj, start_bytes, end_bytes):
+        container_name = self._clean_object_name(obj.container.name)
+        object_name = self._clean_object_name(obj.name)
+        headers = {'Range': self._get_range_header(start_bytes, end_bytes)}
+
+        return self.connection.request('/%s/%s' % (container_name,
+                                                   object_name),
+                                       method='GET', headers=headers,
+                                       raw=True)
+
     def upload_object(self, file_path, container, object_name, extra=None,
                       verify_hash=True, ex_storage_class=None):
         """
@@ -309,7 +409,8 @@ class S3StorageDriver(StorageDriver):
         @type ex_storage_class: C{str}
         """
         upload_func = self._upload_file
-        upload_func_kwargs = {'file_path': file_path}
+        upload_func_kwargs = {'file_path': file_path,
+                              'calculate_hash': verify_hash}
 
         return self._put_object(container=container, object_name=object_name,
                                 upload_func=upload_func,
@@ -338,6 +439,102 @@ class S3StorageDriver(StorageDriver):
                                 verify_hash=False,
                                 storage_class=ex_storage_class)
 
+    def ex_multipart_upload_object(self, file_path, container, object_name,
+                                   extra=None, ex_storage_class=None,
+                                   part_size=MULTIPART_PART_SIZE,
+                                   concurrency=DEFAULT_CONCURRENCY,
+                                   retries=2, retry_delay=1):
+        """
+        Upload an object currently located on a disk using the S3 multipart
+        upload API. Parts are uploaded in parallel.
+
+        Only the parts which are currently being uploaded are held in memory
+        so the memory usage is bounded by part_size * concurrency.
+
+        @param file_path: Path to the object on disk.
+        @type file_path: C{str}
+
+        @param container: Destination container.
+        @type container: L{Container}
+
+        @param object_name: Object name.
+        @type object_name: C{str}
+
+        @param extra: (optional) Extra attributes (content_type, meta_data).
+        @type extra: C{dict}
+
+        @param ex_storage_class: Storage class
+        @type ex_storage_class: C{str}
+
+        @param part_size: Size of a single part in bytes (must be at least
+                          5 MB).
+        @type part_size: C{int}
+
+        @param concurrency: Maximum number of parts which are uploaded in
+                            parallel.
+        @type concurrency: C{int}
+
+        @param retries: How many times to retry a failed part upload.
+        @type retries: C{int}
+
+        @param retry_delay: How many seconds to wait before the first retry.
+        @type retry_delay: C{float}
+
+        @rtype: L{Object}
+        """
+        if not os.path.exists(file_path):
+            raise OSError('File %s does not exist' % (file_path))
+
+        def read_parts():
+            file_handle = open(file_path, 'rb')
+
+            try:
+                data = file_handle.read(part_size)
+                while data:
+                    yield data
+                    data = file_handle.read(part_size)
+            finally:
+                file_handle.close()
+
+        return self._multipart_upload(container=container,
+                                      object_name=object_name,
+                                      parts=read_parts(), extra=extra,
+                                      file_path=file_path,
+                                      storage_class=ex_storage_class,
+                                      part_size=part_size,
+                                      concurrency=concurrency,
+                                      retries=retries,
+                                      retry_delay=retry_delay)
+
+    def ex_multipart_upload_object_via_stream(self, iterator, container,
+                                              object_name, extra=None,
+                                              ex_storage_class=None,
+                                              part_size=MULTIPART_PART_SIZE,
+                                              concurrency=DEFAULT_CONCURRENCY,
+                                              retries=2, retry_delay=1):
+        """
+        Upload an object using an iterator and the S3 multipart upload API.
+
+        Unlike upload_object_via_stream, the iterator is not exhausted in
+        advance. Data is buffered one part at a time and at most one part per
+        worker is held in memory.
+
+        @inherits: L{S3StorageDriver.ex_multipart_upload_object}
+
+        @param iterator: An object which implements the iterator interface.
+        @type iterator: C{object}
+        """
+        parts = read_in_chunks(iterator=iterator, chunk_size=part_size,
+                               fill_size=True)
+        return self._multipart_upload(container=container,
+                                      object_name=object_name, parts=parts,
+                                      extra=extra,
+                                      storage_class=ex_storage_class,
+                                      part_size=part_size,
+                                      concurrency=concurrency,
+                                      retries=retries,
+                                      retry_delay=retry_delay)
+
     def delete_object(self, obj):
         object_name = self._clean_object_name(name=obj.name)
         response = self.connection.request('/%s/%s' % (obj.container.name,
@@ -355,6 +552,19 @@ class S3StorageDriver(StorageDriver):
         name = urlquote(name)
         return name
 
+    def _streaming_request(self, action, params=None):
+        """
+        Perform a GET request whose response is parsed in the streaming mode
+        (used by the listing calls which can return large documents).
+        """
+        context = self.connection.context
+        self.connection.set_context({'streaming': True})
+
+        try:
+            return self.connection.request(action, params=params)
+        finally:
+            self.connection.set_context(context)
+
     def _get_more(self, last_key, value_dict):
         container = value_dict['container']
         params = {}
@@ -362,17 +572,41 @@ class S3StorageDriver(StorageDriver):
         if last_key:
             params['marker'] = last_key
 
-        response = self.connection.request('/%s' % (container.name),
+        if value_dict.get('prefix', None):
+            params['prefix'] = value_dict['prefix']
+
+        if value_dict.get('delimiter', None):
+            params['delimiter'] = value_dict['delimiter']
+
+        if value_dict.get('page_size', None):
+            params['max-keys'] = value_dict['page_size']
+
+        response = self._streaming_request('/%s' % (container.name),
                                            params=params)
 
         if response.status == httplib.OK:
             objects = self._to_objs(obj=response.object,
                                     xpath='Contents', container=container)
+            directories = self._to_directories(obj=response.object,
+                                               container=container)
             is_truncated = response.object.findtext(fixxpath(
                 xpath='IsTruncated', namespace=self.namespace)).lower()
             exhausted = (is_truncated == 'false')
 
-            if (len(objects) > 0):
+            if directories:
+                # Keys and common prefixes are returned in a lexicographical
+                # order
+                objects = sorted(objects + directories,
+                                 key=lambda obj: obj.name)
+
+            # NextMarker is only returned if a delimiter has been specified
+            next_marker = findtext(element=response.object,
+                                   xpath='NextMarker',
+                                   namespace=self.namespace)
+
+            if next_marker:
+                last_key = next_marker
+            elif (len(objects) > 0):
                 last_key = objects[-1].name
             else:
                 last_key = None
@@ -384,25 +618,15 @@ class S3StorageDriver(StorageDriver):
     def _put_object(self, container, object_name, upload_func,
                     upload_func_kwargs, extra=None, file_path=None,
                     iterator=None, verify_hash=True, storage_class=None):
-        headers = {}
         extra = extra or {}
-        storage_class = storage_class or 'standard'
-        if storage_class not in ['standard', 'reduced_redundancy']:
-            raise ValueError(
-                'Invalid storage class value: %s' % (storage_class))
-
-        headers['x-amz-storage-class'] = storage_class.upper()
+        headers = self._get_upload_headers(extra=extra,
+                                           storage_class=storage_class)
 
         container_name_cleaned = container.name
         object_name_cleaned = self._clean_object_name(object_name)
         content_type = extra.get('content_type', None)
         meta_data = extra.get('meta_data', None)
 
-        if meta_data:
-            for key, value in list(meta_data.items()):
-                key = 'x-amz-meta-%s' % (key)
-                headers[key] = value
-
         request_path = '/%s/%s' % (container_name_cleaned, object_name_cleaned)
         # TODO: Let the underlying exceptions bubble up and capture the SIGPIPE
         # here.
@@ -436,6 +660,216 @@ class S3StorageDriver(StorageDriver):
                 'Unexpected status code, status_code=%s' % (response.status),
                 driver=self)
 
+    def _get_upload_headers(self, extra, storage_class=None):
+        """
+        Return headers which are sent when uploading an object (storage
+        class and meta data).
+        """
+        headers = {}
+        storage_class = storage_class or 'standard'
+        if storage_class not in ['standard', 'reduced_redundancy']:
+            raise ValueError(
+                'Invalid storage class value: %s' % (storage_class))
+
+        headers['x-amz-storage-class'] = storage_class.upper()
+
+        meta_data = extra.get('meta_data', None)
+
+        if meta_data:
+            for key, value in list(meta_data.items()):
+                key = 'x-amz-meta-%s' % (key)
+                headers[key] = value
+
+        return headers
+
+    def _multipart_upload(self, container, object_name, parts, extra=None,
+                          file_path=None, storage_class=None,
+                          part_size=MULTIPART_PART_SIZE,
+                          concurrency=DEFAULT_CONCURRENCY, retries=2,
+                          retry_delay=1):
+        """
+        Initiate a multipart upload, upload the parts provided by the parts
+        iterator in parallel and complete the upload.
+
+        Upload is aborted if any of the parts fails to upload.
+        """
+        if not self.supports_s3_multipart_upload:
+            raise LibcloudError('Multipart uploads are not supported by ' +
+                                'this driver', driver=self)
+
+        if part_size < MULTIPART_MIN_PART_SIZE:
+            raise ValueError('part_size must be at least %s bytes' %
+                             (MULTIPART_MIN_PART_SIZE))
+
+        extra = extra or {}
+        headers = self._get_upload_headers(extra=extra,
+                                           storage_class=storage_class)
+        content_type = extra.get('content_type', None)
+        meta_data = extra.get('meta_data', None)
+
+        if not content_type:
+            content_type, _ = guess_file_mime_type(file_path or object_name)
+
+            if not content_type:
+                raise AttributeError(
+                    'File content-type could not be guessed and' +
+                    ' no content_type value provided')
+
+        headers['Content-Type'] = content_type
+
+        request_path = '/%s/%s' % (container.name,
+                                   self._clean_object_name(object_name))
+        upload_id = self._initiate_multipart_upload(request_path=request_path,
+                                                    headers=headers)
+
+        errors = []
+
+        def numbered_parts():
+            part_number = 0
+
+            for data in parts:
+                if errors:
+                    # Stop reading the data as soon as any of the parts fails
+                    return
+
+                part_number += 1
+                yield part_number, data
+
+            if part_number == 0:
+                # Empty object, upload a single zero-length part
+                yield 1, b('')
+
+        def upload_part(item):
+            part_number, data = item
+
+            def upload():
+                return self._upload_multipart_part(request_path=request_path,
+                                                   upload_id=upload_id,
+                                                   part_number=part_number,
+                                                   data=data)
+
+            return call_with_retry(upload, retries=retries,
+                                   retry_delay=retry_delay,
+                                   fatal_exceptions=(InvalidCredsError,))
+
+        etags = {}
+        bytes_transferred = 0
+        results = imap_unordered(upload_part, numbered_parts(),
+                                 concurrency=concurrency)
+
+        try:
+            for (part_number, data), etag, error in results:
+                if error is not None:
+                    # Wait for the parts which are in progress to finish
+                    # before aborting the upload
+                    errors.append(error)
+                    continue
+
+                etags[part_number] = etag
+                bytes_transferred += len(data)
+
+            if errors:
+                raise errors[0]
+
+            server_hash = self._complete_multipart_upload(
+                request_path=request_path, upload_id=upload_id, etags=etags)
+        except Exception:
+            e = sys.exc_info()[1]
+            results.close()
+            self._abort_multipart_upload(request_path=request_path,
+                                         upload_id=upload_id)
+            raise e
+
+        obj = Object(name=object_name, size=bytes_transferred,
+                     hash=server_hash, extra=None, meta_data=meta_data,
+                     container=container, driver=self)
+        return obj
+
+    def _initiate_multipart_upload(self, request_path, headers):
+        response = self.connection.request('%s?uploads' % (request_path),
+                                           method='POST', headers=headers)
+
+        if response.status != httplib.OK:
+            raise LibcloudError('Unexpected status code: %s' %
+                                (response.status), driver=self)
+
+        return findtext(element=response.object, xpath='UploadId',
+                        namespace=self.namespace)
+
+    def _upload_multipart_part(self, request_path, upload_id, part_number,
+                               data):
+        """
+        Upload a single part and verify its MD5 hash.
+
+        @return: ETag of the uploaded part.
+        @rtype: C{str}
+        """
+        data = b(data)
+        data_hash = self._get_hash_function()
+        data_hash.update(data)
+
+        headers = {'Content-MD5':
+                   base64.b64encode(data_hash.digest()).decode('utf-8')}
+        action = '%s?partNumber=%d&uploadId=%s' % (request_path, part_number,
+                                                   upload_id)
+        response = self.connection.request(action, method='PUT', data=data,
+                                           headers=headers)
+
+        if response.status != httplib.OK:
+            raise LibcloudError('Unexpected status code: %s' %
+                                (response.status), driver=self)
+
+        server_hash = response.headers['etag'].replace('"', '')
+
+        if server_hash != data_hash.hexdigest():
+            raise ObjectHashMismatchError(
+                value='MD5 hash checksum of part %d does not match' %
+                      (part_number),
+                object_name=request_path, driver=self)
+
+        return server_hash
+
+    def _complete_multipart_upload(self, request_path, upload_id, etags):
+        root = Element('CompleteMultipartUpload')
+
+        part_numbers = list(etags.keys())
+        part_numbers.sort()
+
+        for part_number in part_numbers:
+            part = SubElement(root, 'Part')
+            SubElement(part, 'PartNumber').text = str(part_number)
+            SubElement(part, 'ETag').text = '"%s"' % (etags[part_number])
+
+        if PY3:
+            encoding = 'unicode'
+        else:
+            encoding = None
+        data = tostring(root, encoding=encoding)
+
+        response = self.connection.request('%s?uploadId=%s' % (request_path,
+                                                               upload_id),
+                                           method='POST', data=data)
+        body = response.object
+
+        # S3 can return an error inside a 200 OK response
+        if response.status != httplib.OK or not hasattr(body, 'tag') or \
+           body.tag.endswith('Error'):
+            raise LibcloudError('Failed to complete multipart upload: %s' %
+                                (response.body), driver=self)
+
+        return findtext(element=body, xpath='ETag',
+                        namespace=self.namespace).replace('"', '')
+
+    def _abort_multipart_upload(self, request_path, upload_id):
+        try:
+            self.connection.request('%s?uploadId=%s' % (request_path,
+                                                        upload_id),
+                                    method='DELETE')
+        except Exception:
+            # Parts which have been uploaded are cleaned up by the lifecycle
+            # rules (if any), nothing else we can do here
+            pass
+
     def _to_containers(self, obj, xpath):
         return [self._to_container(element) for element in
                 obj.findall(fixxpath(
@@ -445,6 +879,14 @@ class S3StorageDriver(StorageDriver):
         return [self._to_obj(element, container) for element in
                 obj.findall(fixxpath(xpath=xpath, namespace=self.namespace))]
 
+    def _to_directories(self, obj, container):
+        elements = obj.findall(fixxpath(xpath='CommonPrefixes/Prefix',
+                                        namespace=self.namespace))
+        return [self.objectCls(name=element.text, size=0, hash=None,
+                               extra={'is_directory': True}, meta_data={},
+                               container=container, driver=self)
+                for element in elements]
+
     def _to_container(self, element):
         extra = {
             'creation_date': findtext(element=element, xpath='CreationDate',
@@ -490,17 +932,17 @@ class S3StorageDriver(StorageDriver):
         meta_data = {'owner': {'id': owner_id,
                                'display_name': owner_display_name}}
 
-        obj = Object(name=findtext(element=element, xpath='Key',
-                                   namespace=self.namespace),
-                     size=int(findtext(element=element, xpath='Size',
-                                       namespace=self.namespace)),
-                     hash=findtext(element=element, xpath='ETag',
-                                   namespace=self.namespace).replace('"', ''),
-                     extra=None,
-                     meta_data=meta_data,
-                     container=container,
-                     driver=self
-                     )
+        obj = self.objectCls(
+            name=findtext(element=element, xpath='Key',
+                          namespace=self.namespace),
+            size=int(findtext(element=element, xpath='Size',
+                              namespace=self.namespace)),
+            hash=findtext(element=element, xpath='ETag',
+                          namespace=self.namespace).replace('"', ''),
+            extra=None,
+            meta_data=meta_data,
+            container=container,
+            driver=self)
 
         return obj
 
@@ -1,10 +1,32 @@
+import os
 import sys
+import stat
+import time
+import shutil
+import tempfile
+import threading
 import unittest
 
 from mock import Mock
 
 from libcloud.common.openstack import OpenStackBaseConnection
+from libcloud.common.openstack import OpenStackServiceCatalog
+from libcloud.common.openstack import OpenStackMemoryAuthTokenCache
+from libcloud.common.openstack import OpenStackFileAuthTokenCache
+from libcloud.common.openstack import parse_auth_token_expires
 from libcloud.utils.py3 import PY25
+from libcloud.utils.py3 import httplib
+
+try:
+    import simplejson as json
+except ImportError:
+    import json
+
+from libcloud.test import MockHttp
+from libcloud.test.file_fixtures import OpenStackFixtures
+
+# Expiration of the token in _v2_0__auth.json
+TOKEN_EXPIRES = parse_auth_token_expires('2011-11-23T21:00:14.000-06:00')
 
 
 class OpenStackBaseConnectionTest(unittest.TestCase):
@@ -30,5 +52,267 @@ class OpenStackBaseConnectionTest(unittest.TestCase):
                                                                timeout=10)
 
 
+class OpenStackServiceCatalogTest(unittest.TestCase):
+
+    def setUp(self):
+        body = json.loads(OpenStackFixtures().load('_v2_0__auth.json'))
+        self.catalog = OpenStackServiceCatalog(
+            body['access']['serviceCatalog'], ex_force_auth_version='2.0')
+
+    def test_get_endpoint(self):
+        endpoint = self.catalog.get_endpoint(service_type='compute',
+                                             name='cloudServersOpenStack',
+                                             region='ORD')
+        self.assertEqual(endpoint['publicURL'],
+                         'https://ord.servers.api.rackspacecloud.com/v2/1337')
+
+        endpoint = self.catalog.get_endpoint(service_type='compute',
+                                             name='cloudServers')
+        self.assertEqual(endpoint['publicURL'],
+                         'https://servers.api.rackspacecloud.com/v1.0/1337')
+
+        endpoint = self.catalog.get_endpoint(service_type='compute',
+                                             name='cloudServersOpenStack',
+                                             region='LON')
+        self.assertEqual(endpoint, {})
+        self.assertEqual(self.catalog.get_endpoint(name='cloudServers'), {})
+
+    def test_get_endpoints(self):
+        endpoints = self.catalog.get_endpoints(service_type='compute',
+                                               name='cloudServersOpenStack')
+        self.assertEqual(sorted([ep['region'] for ep in endpoints]),
+                         ['DFW', 'ORD'])
+
+        # The returned list is a copy of the index
+        endpoints.pop()
+        self.assertEqual(len(self.catalog.get_endpoints(
+            service_type='compute', name='cloudServersOpenStack')), 2)
+        self.assertEqual(self.catalog.get_endpoints(service_type='compute',
+                                                    name='missing'), [])
+
+    def test_auth_v1_catalog_ignores_service_type(self):
+        catalog = OpenStackServiceCatalog(
+            {'cloudServers': [{'publicURL': 'https://servers.example.com'}],
+             'cloudFiles': [{'publicURL': 'https://ord.files.example.com',
+                             'region': 'ORD'},
+                            {'publicURL': 'https://dfw.files.example.com',
+                             'region': 'DFW'}]},
+            ex_force_auth_version='1.1')
+
+        self.assertEqual(catalog.get_endpoint(service_type='compute',
+                                              name='cloudServers'),
+                         {'publicURL': 'https://servers.example.com'})
+        self.assertEqual(catalog.get_endpoint(name='cloudFiles',
+                                              region='DFW')['publicURL'],
+                         'https://dfw.files.example.com')
+        self.assertEqual(len(catalog.get_endpoints(name='cloudFiles')), 2)
+
+
+class TokenCacheMockHttp(MockHttp):
+    fixtures = OpenStackFixtures()
+    auth_requests = 0
+    # Token which is returned by the next authentication (defaults to the
+    # token in the fixture)
+    auth_token = None
+    revoked_tokens = []
+
+    def _v2_0_tokens(self, method, url, body, headers):
+        TokenCacheMockHttp.auth_requests += 1
+        body = self.fixtures.load('_v2_0__auth.json')
+
+        if self.auth_token is not None:
+            body = body.replace('aaaaaaaaaaaa-bbb-cccccccccccccc',
+                                self.auth_token)
+
+        return (httplib.OK, body, {'content-type': 'application/json'},
+                httplib.responses[httplib.OK])
+
+    def _v1_1_1337_servers(self, method, url, body, headers):
+        if headers['X-Auth-Token'] in self.revoked_tokens:
+            return (httplib.UNAUTHORIZED, '', {},
+                    httplib.responses[httplib.UNAUTHORIZED])
+
+        return (httplib.OK, 'ok', {}, httplib.responses[httplib.OK])
+
+
+class TokenCacheConnection(OpenStackBaseConnection):
+    conn_classes = (TokenCacheMockHttp, TokenCacheMockHttp)
+    accept_format = 'application/json'
+
+
+class OpenStackAuthTokenCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        TokenCacheMockHttp.auth_requests = 0
+        TokenCacheMockHttp.auth_token = None
+        TokenCacheMockHttp.revoked_tokens = []
+        self.now = TOKEN_EXPIRES - 3600
+        self.cache = OpenStackMemoryAuthTokenCache(clock=self._clock)
+
+    def _clock(self):
+        return self.now
+
+    def _get_connection(self, key='bar', cache=None):
+        connection = TokenCacheConnection(
+            'foo', key, ex_force_auth_version='2.0',
+            ex_force_auth_url='https://auth.api.example.com/v2.0/',
+            ex_force_base_url='https://api.example.com/v1.1/1337',
+            ex_tenant_name='tenant', ex_auth_token_cache=cache or self.cache)
+        connection.driver = Mock()
+        return connection
+
+    def test_parse_auth_token_expires(self):
+        self.assertEqual(parse_auth_token_expires('2011-11-24T03:00:14Z'),
+                         TOKEN_EXPIRES)
+        self.assertEqual(parse_auth_token_expires('2011-11-24T04:30:14+0130'),
+                         TOKEN_EXPIRES)
+        self.assertEqual(parse_auth_token_expires('2011-11-24T03:00:14'),
+                         TOKEN_EXPIRES)
+        self.assertEqual(parse_auth_token_expires('tomorrow'), None)
+        self.assertEqual(parse_auth_token_expires(None), None)
+
+    def test_token_is_shared_between_connections(self):
+        connection1 = self._get_connection()
+        connection2 = self._get_connection()
+
+        connection1._populate_hosts_and_request_paths()
+        connection2._populate_hosts_and_request_paths()
+        connection2._populate_hosts_and_request_paths()
+
+        self.assertEqual(TokenCacheMockHttp.auth_requests, 1)
+        self.assertEqual(connection2.auth_token,
+                         'aaaaaaaaaaaa-bbb-cccccccccccccc')
+        self.assertEqual(connection2.auth_token_expires,
+                         '2011-11-23T21:00:14.000-06:00')
+        self.assertEqual(connection2.auth_user_info['name'], 'testuser')
+        self.assertTrue(connection2.service_catalog is not None)
+        self.assertEqual(connection2.host, 'api.example.com')
+        self.assertEqual(connection2.request_path, '/v1.1/1337')
+        self.assertEqual(list(connection2._endpoint_tuples.keys()),
+                         ['https://api.example.com/v1.1/1337'])
+
+        # Different credentials don't share the token
+        self._get_connection(key='baz')._populate_hosts_and_request_paths()
+        self.assertEqual(TokenCacheMockHttp.auth_requests, 2)
+
+    def test_token_is_refreshed_before_it_expires(self):
+        connection = self._get_connection()
+        connection._populate_hosts_and_request_paths()
+
+        self.now = TOKEN_EXPIRES - self.cache.refresh_margin - 1
+        connection._populate_hosts_and_request_paths()
+        self.assertEqual(TokenCacheMockHttp.auth_requests, 1)
+
+        self.now = TOKEN_EXPIRES - self.cache.refresh_margin + 1
+        connection._populate_hosts_and_request_paths()
+        self.assertEqual(TokenCacheMockHttp.auth_requests, 2)
+
+    def test_expired_token_is_not_cached(self):
+        self.now = TOKEN_EXPIRES + 1
+        connection1 = self._get_connection()
+        connection1._populate_hosts_and_request_paths()
+        self._get_connection()._populate_hosts_and_request_paths()
+
+        self.assertEqual(TokenCacheMockHttp.auth_requests, 2)
+        self.assertEqual(connection1.auth_token,
+                         'aaaaaaaaaaaa-bbb-cccccccccccccc')
+
+    def test_revoked_token_is_removed_from_cache(self):
+        connection1 = self._get_connection()
+        connection1._populate_hosts_and_request_paths()
+
+        # Token is revoked while it's cached
+        TokenCacheMockHttp.revoked_tokens = ['aaaaaaaaaaaa-bbb-cccccccccccccc']
+        TokenCacheMockHttp.auth_token = 'new-token'
+
+        response = connection1.request(action='/servers')
+        self.assertEqual(response.status, httplib.OK)
+        self.assertEqual(connection1.auth_token, 'new-token')
+        self.assertEqual(TokenCacheMockHttp.auth_requests, 2)
+
+        # Other connections get the new token from the cache
+        connection2 = self._get_connection()
+        response = connection2.request(action='/servers')
+        self.assertEqual(response.status, httplib.OK)
+        self.assertEqual(connection2.auth_token, 'new-token')
+        self.assertEqual(TokenCacheMockHttp.auth_requests, 2)
+
+    def test_request_is_retried_only_once_on_unauthorized(self):
+        connection = self._get_connection()
+        TokenCacheMockHttp.revoked_tokens = ['aaaaaaaaaaaa-bbb-cccccccccccccc']
+
+        self.assertRaises(Exception, connection.request, action='/servers')
+        self.assertEqual(TokenCacheMockHttp.auth_requests, 2)
+
+    def test_delete_keeps_replaced_token(self):
+        key = ('key', )
+
+        def authenticate():
+            return {'auth_token': 'token',
+                    'auth_token_expires': '2011-11-24T03:00:14Z',
+                    'auth_user_info': None, 'urls': {}}
+
+        self.cache.get_token(key, authenticate)
+        self.cache.delete(key, auth_token='old-token')
+        self.assertTrue(self.cache._get(self.cache._get_key(key)) is not None)
+
+        self.cache.delete(key, auth_token='token')
+        self.assertEqual(self.cache._get(self.cache._get_key(key)), None)
+
+    def test_single_authentication_in_flight(self):
+        calls = []
+        results = []
+
+        def authenticate():
+            calls.append(1)
+            time.sleep(0.1)
+            return {'auth_token': 'token',
+                    'auth_token_expires': '2011-11-24T03:00:14Z',
+                    'auth_user_info': None, 'urls': {}}
+
+        def worker():
+            results.append(self.cache.get_token(('key', ), authenticate))
+
+        threads = [threading.Thread(target=worker) for _ in range(5)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([entry['auth_token'] for entry in results],
+                         ['token'] * 5)
+
+    def test_file_cache(self):
+        directory = tempfile.mkdtemp()
+
+        try:
+            path = os.path.join(directory, 'tokens.json')
+
+            # Two cache instances behave like two processes
+            cache1 = OpenStackFileAuthTokenCache(path, clock=self._clock)
+            cache2 = OpenStackFileAuthTokenCache(path, clock=self._clock)
+
+            connection = self._get_connection(cache=cache1)
+            connection._populate_hosts_and_request_paths()
+            connection = self._get_connection(cache=cache2)
+            connection._populate_hosts_and_request_paths()
+
+            self.assertEqual(TokenCacheMockHttp.auth_requests, 1)
+            self.assertEqual(connection.auth_token,
+                             'aaaaaaaaaaaa-bbb-cccccccccccccc')
+            self.assertEqual(stat.S_IMODE(os.stat(path).st_mode),
+                             int('600', 8))
+
+            cache2.delete(connection._get_auth_token_cache_key())
+            connection = self._get_connection(cache=cache1)
+            connection._populate_hosts_and_request_paths()
+            self.assertEqual(TokenCacheMockHttp.auth_requests, 2)
+        finally:
+            shutil.rmtree(directory)
+
+
 if __name__ == '__main__':
     sys.exit(unittest.main())
@@ -12,12 +12,17 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import os
 import sys
+import tempfile
+import threading
 import unittest
 
 from libcloud.common.base import Response
 from libcloud.common.base import Connection, ConnectionKey, ConnectionUserAndKey
 from libcloud.compute.base import Node, NodeSize, NodeImage, NodeDriver
+from libcloud.compute.base import NodeLocation, CompactNode
+from libcloud.compute.drivers.dummy import DummyNodeDriver
 
 from libcloud.test import MockResponse           # pylint: disable-msg=E0611
 
@@ -30,6 +35,27 @@ class BaseTests(unittest.TestCase):
         Node(id=0, name=0, state=0, public_ips=0, private_ips=0,
              driver=FakeDriver())
 
+    def test_compact_node(self):
+        node = CompactNode(id=1, name='node', state=0, public_ips=None,
+                           private_ips=['10.0.0.1'], driver=FakeDriver())
+        self.assertTrue(isinstance(node, Node))
+        self.assertEqual(node.id, '1')
+        self.assertEqual(node.public_ips, [])
+        self.assertEqual(node.private_ip, ['10.0.0.1'])
+        self.assertEqual(len(node.uuid), 40)
+
+        # extra is only created when it's accessed
+        self.assertEqual(node._extra, None)
+        node.extra['foo'] = 'bar'
+        self.assertEqual(node.extra, {'foo': 'bar'})
+
+        node.extra = {'bar': 'baz'}
+        self.assertEqual(node.extra, {'bar': 'baz'})
+
+        # Attributes which aren't in __slots__ can still be set
+        node.password = 'secret'
+        self.assertEqual(node.password, 'secret')
+
     def test_base_node_size(self):
         NodeSize(id=0, name=0, ram=0, disk=0, bandwidth=0, price=0,
                  driver=FakeDriver())
@@ -52,5 +78,156 @@ class BaseTests(unittest.TestCase):
     def test_base_connection_timeout(self):
         Connection(timeout=10)
 
+
+class CountingDummyNodeDriver(DummyNodeDriver):
+    def __init__(self, creds):
+        super(CountingDummyNodeDriver, self).__init__(creds)
+        self.calls = []
+
+    def list_sizes(self, location=None):
+        self.calls.append(('list_sizes', location))
+        return super(CountingDummyNodeDriver, self).list_sizes(location)
+
+    def list_images(self, location=None):
+        self.calls.append(('list_images', location))
+        return super(CountingDummyNodeDriver, self).list_images(location)
+
+    def create_image(self, node, name):
+        self.calls.append(('create_image', name))
+        return NodeImage(id=4, name=name, driver=self)
+
+
+class MetadataCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.driver = CountingDummyNodeDriver(0)
+        self.driver.enable_metadata_cache()
+
+    def test_cached_results(self):
+        sizes1 = self.driver.list_sizes()
+        sizes2 = self.driver.list_sizes()
+
+        self.assertEqual(len(self.driver.calls), 1)
+        self.assertEqual([size.id for size in sizes1],
+                         [size.id for size in sizes2])
+        self.assertTrue(sizes2[0].driver is self.driver)
+
+        # Results are keyed on arguments
+        location = NodeLocation(id=1, name='loc', country='US',
+                                driver=self.driver)
+        self.driver.list_sizes(location=location)
+        self.driver.list_sizes(location=location)
+        self.assertEqual(len(self.driver.calls), 2)
+
+        stats = self.driver.get_metadata_cache_stats()
+        self.assertEqual(stats['list_sizes'], {'hits': 2, 'misses': 2})
+        self.assertEqual(stats['list_images'], {'hits': 0, 'misses': 0})
+
+    def test_equivalent_calls_share_cached_result(self):
+        location = NodeLocation(id=1, name='loc', country='US',
+                                driver=self.driver)
+        self.driver.list_sizes(location)
+        self.driver.list_sizes(location=location)
+
+        # Omitted arguments are keyed on their default values
+        self.driver.list_sizes()
+        self.driver.list_sizes(None)
+        self.driver.list_sizes(location=None)
+
+        self.assertEqual(len(self.driver.calls), 2)
+        stats = self.driver.get_metadata_cache_stats()
+        self.assertEqual(stats['list_sizes'], {'hits': 3, 'misses': 2})
+
+    def test_stats_are_counted_from_multiple_threads(self):
+        def list_sizes():
+            for _ in range(200):
+                self.driver.list_sizes()
+
+        threads = [threading.Thread(target=list_sizes) for _ in range(4)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        stats = self.driver.get_metadata_cache_stats()['list_sizes']
+        self.assertEqual(stats['hits'] + stats['misses'], 800)
+
+    def test_cached_objects_are_copies(self):
+        images = self.driver.list_images()
+        images[0].extra['foo'] = 'bar'
+        images[1].name = 'changed'
+
+        images = self.driver.list_images()
+        self.assertFalse('foo' in images[0].extra)
+        self.assertNotEqual(images[1].name, 'changed')
+
+        images[0].extra['foo'] = 'bar'
+        self.assertFalse('foo' in self.driver.list_images()[0].extra)
+        self.assertEqual(len(self.driver.calls), 1)
+
+    def test_invalidation(self):
+        self.driver.list_sizes()
+        self.driver.list_images()
+
+        self.driver.invalidate_metadata_cache(method_name='list_sizes')
+        self.driver.list_sizes()
+        self.driver.list_images()
+        self.assertEqual([call[0] for call in self.driver.calls],
+                         ['list_sizes', 'list_images', 'list_sizes'])
+
+        # create_image invalidates list_images results
+        self.driver.create_image(node=None, name='new')
+        self.driver.list_images()
+        self.driver.list_sizes()
+        self.assertEqual([call[0] for call in self.driver.calls][3:],
+                         ['create_image', 'list_images'])
+
+        self.driver.invalidate_metadata_cache()
+        self.driver.list_sizes()
+        self.assertEqual(self.driver.calls[-1][0], 'list_sizes')
+
+    def test_disable_metadata_cache(self):
+        self.driver.list_sizes()
+        self.driver.disable_metadata_cache()
+        self.driver.list_sizes()
+
+        self.assertEqual(len(self.driver.calls), 2)
+        self.assertEqual(self.driver.get_metadata_cache_stats(), {})
+        self.assertFalse('list_sizes' in self.driver.__dict__)
+
+    def test_custom_ttls(self):
+        self.driver.enable_metadata_cache(ttls={'list_images': 60})
+        self.driver.list_sizes()
+        self.driver.list_sizes()
+        self.driver.list_images()
+        self.driver.list_images()
+
+        self.assertEqual([call[0] for call in self.driver.calls],
+                         ['list_sizes', 'list_sizes', 'list_images'])
+
+    def test_persistent_cache(self):
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        os.unlink(path)
+
+        try:
+            self.driver.enable_metadata_cache(path=path)
+            self.driver.list_images()
+            self.assertTrue(os.path.exists(path))
+
+            driver = CountingDummyNodeDriver(0)
+            driver.enable_metadata_cache(path=path)
+            images = driver.list_images()
+
+            self.assertEqual(driver.calls, [])
+            self.assertEqual(len(images), 3)
+            self.assertTrue(images[0].driver is driver)
+        finally:
+            if os.path.exists(path):
+                os.unlink(path)
+
+
 if __name__ == '__main__':
     sys.exit(unittest.main())
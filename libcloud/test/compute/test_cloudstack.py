@@ -58,6 +58,11 @@ class CloudStackNodeDriverTest(unittest.TestCase, TestCaseMixin):
             return
         self.assertTrue(False)
 
+    def test_list_images_filters(self):
+        images = self.driver.list_images(ex_filters={'name': 'Test',
+                                                     'templatefilter': 'self'})
+        self.assertEqual(13, len(images))
+
     def test_list_images_no_images_available(self):
         CloudStackMockHttp.fixture_tag = 'notemplates'
 
@@ -146,6 +151,18 @@ class CloudStackMockHttp(MockHttpTestCase):
             body, obj = self._load_fixture(fixture)
             return (httplib.OK, body, obj, httplib.responses[httplib.OK])
 
+    def _cmd_listTemplates(self, templatefilter, **kwargs):
+        if 'name' in kwargs:
+            # test_list_images_filters
+            self.assertEqual(templatefilter, 'self')
+            self.assertEqual(kwargs['name'], 'Test')
+        else:
+            self.assertEqual(templatefilter, 'executable')
+
+        fixture = 'listTemplates_' + self.fixture_tag + '.json'
+        body, obj = self._load_fixture(fixture)
+        return (httplib.OK, body, obj, httplib.responses[httplib.OK])
+
     def _cmd_queryAsyncJobResult(self, jobid):
         fixture = 'queryAsyncJobResult' + '_' + str(jobid) + '.json'
         body, obj = self._load_fixture(fixture)
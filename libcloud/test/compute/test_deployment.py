@@ -17,18 +17,21 @@
 import os
 import sys
 import time
+import threading
 import unittest
 
 from libcloud.utils.py3 import httplib
 from libcloud.utils.py3 import u
+from libcloud.utils.py3 import next
 
 from libcloud.compute.deployment import MultiStepDeployment, Deployment
 from libcloud.compute.deployment import SSHKeyDeployment, ScriptDeployment
 from libcloud.compute.deployment import FileDeployment
-from libcloud.compute.base import Node
+from libcloud.compute.base import Node, NodeWaiter
 from libcloud.compute.types import NodeState, DeploymentError, LibcloudError
 from libcloud.compute.ssh import BaseSSHClient
 from libcloud.compute.drivers.rackspace import RackspaceNodeDriver as Rackspace
+from libcloud.compute.drivers.dummy import DummyNodeDriver
 
 from libcloud.test import MockHttp, XML_HEADERS
 from libcloud.test.file_fixtures import ComputeFileFixtures, OpenStackFixtures
@@ -58,6 +61,133 @@ class MockClient(BaseSSHClient):
         return True
 
 
+class PollingDummyNodeDriver(DummyNodeDriver):
+    """
+    Driver which reports node as running once it has been listed
+    running_after[node.id] times.
+    """
+
+    def __init__(self, running_after, supports_list_nodes_by_id=False):
+        DummyNodeDriver.__init__(self, 0)
+        self.nl = [Node(id=str(i), name='dummy-%d' % (i),
+                        state=NodeState.PENDING,
+                        public_ips=['127.0.0.%d' % (i)], private_ips=[],
+                        driver=self) for i in range(1, 4)]
+        self.running_after = running_after
+        self.supports_list_nodes_by_id = supports_list_nodes_by_id
+        self.calls = []
+
+    def list_nodes(self, ex_node_ids=None):
+        self.calls.append(ex_node_ids)
+        nodes = []
+
+        for node in self.nl:
+            if ex_node_ids is not None and node.id not in ex_node_ids:
+                continue
+
+            if len(self.calls) >= self.running_after.get(node.id, 1):
+                state = NodeState.RUNNING
+            else:
+                state = NodeState.PENDING
+
+            nodes.append(Node(id=node.id, name=node.name, state=state,
+                              public_ips=node.public_ips, private_ips=[],
+                              driver=self))
+
+        return nodes
+
+
+class NodeWaiterTests(unittest.TestCase):
+
+    def test_wait_multiple_nodes_single_listing_per_poll(self):
+        driver = PollingDummyNodeDriver(running_after={'1': 1, '2': 2, '3': 3})
+        waiter = NodeWaiter(driver=driver, wait_period=0.01)
+
+        result = waiter.wait(driver.nl, timeout=10)
+
+        self.assertEqual([node.id for node, _ in result], ['1', '2', '3'])
+        self.assertEqual([ips for _, ips in result],
+                         [['127.0.0.1'], ['127.0.0.2'], ['127.0.0.3']])
+        self.assertEqual(len(driver.calls), 3)
+
+    def test_wait_uses_node_ids_filter(self):
+        driver = PollingDummyNodeDriver(running_after={'1': 1, '3': 2},
+                                        supports_list_nodes_by_id=True)
+        waiter = NodeWaiter(driver=driver, wait_period=0.01)
+
+        waiter.wait([driver.nl[0], driver.nl[2]], timeout=10)
+        # The second poll only lists the node which is still pending
+        self.assertEqual(driver.calls, [['1', '3'], ['3']])
+
+    def test_callbacks_and_timeout(self):
+        driver = PollingDummyNodeDriver(running_after={'1': 1, '2': 1000})
+        waiter = NodeWaiter(driver=driver, wait_period=0.01)
+        results = []
+
+        def callback(node, ip_addresses, error):
+            results.append((node.id, ip_addresses, error))
+
+        request1 = waiter.add(driver.nl[0], timeout=10, callback=callback)
+        request2 = waiter.add(driver.nl[1], timeout=0.1, callback=callback)
+
+        self.assertEqual(request1.result()[1], ['127.0.0.1'])
+        self.assertRaises(LibcloudError, request2.result)
+        self.assertTrue(request1.done() and request2.done())
+
+        self.assertEqual(results[0], ('1', ['127.0.0.1'], None))
+        self.assertEqual(results[1][0], '2')
+        self.assertTrue(str(results[1][2]).find('Timed out') != -1)
+
+    def test_list_nodes_error_is_propagated(self):
+        driver = PollingDummyNodeDriver(running_after={})
+        driver.list_nodes = Mock(side_effect=LibcloudError('bam'))
+        waiter = NodeWaiter(driver=driver, wait_period=0.01)
+
+        request = waiter.add(driver.nl[0], timeout=10)
+        self.assertRaises(LibcloudError, request.result)
+
+    def test_filtered_listing_not_found_falls_back_to_full_listing(self):
+        driver = PollingDummyNodeDriver(running_after={'1': 1},
+                                        supports_list_nodes_by_id=True)
+        list_nodes = driver.list_nodes
+
+        def list_nodes_not_found(ex_node_ids=None):
+            if ex_node_ids is not None:
+                raise Exception('InvalidInstanceID.NotFound: not found')
+
+            return list_nodes()
+
+        driver.list_nodes = list_nodes_not_found
+        driver._is_node_not_found_error = \
+            lambda error: str(error).find('NotFound') != -1
+        waiter = NodeWaiter(driver=driver, wait_period=0.01)
+
+        waiter.wait([driver.nl[0]], timeout=10)
+        self.assertEqual(driver.calls, [None])
+
+    def test_filtered_listing_error_is_propagated(self):
+        driver = PollingDummyNodeDriver(running_after={},
+                                        supports_list_nodes_by_id=True)
+        driver.list_nodes = Mock(side_effect=LibcloudError('throttled'))
+        waiter = NodeWaiter(driver=driver, wait_period=0.01)
+
+        request = waiter.add(driver.nl[0], timeout=10)
+        self.assertRaises(LibcloudError, request.result)
+        self.assertEqual(driver.list_nodes.call_count, 1)
+        self.assertEqual(driver.list_nodes.call_args[1],
+                         {'ex_node_ids': ['1']})
+
+    def test_driver_wait_until_running_shares_waiter(self):
+        driver = PollingDummyNodeDriver(running_after={'1': 1, '2': 2})
+
+        result = driver.wait_until_running(driver.nl[:2], wait_period=0.01,
+                                           timeout=10)
+        self.assertEqual(len(result), 2)
+        self.assertEqual(len(driver.calls), 2)
+        self.assertTrue(driver._get_node_waiter(wait_period=0.01) is
+                        driver._get_node_waiter(wait_period=0.01))
+
+
 class DeploymentTests(unittest.TestCase):
 
     def setUp(self):
@@ -337,6 +467,111 @@ class DeploymentTests(unittest.TestCase):
         node = self.driver.deploy_node(deploy=Mock())
         self.assertEqual(self.node.id, node.id)
 
+    @patch('libcloud.compute.base.SSHClient')
+    @patch('libcloud.compute.ssh')
+    def test_deploy_nodes_success_and_create_node_failure(self,
+                                                          mock_ssh_module,
+                                                          mock_ssh_client):
+        def create_node(name, **kwargs):
+            if name == 'fail':
+                raise Exception('quota exceeded')
+
+            return Node(id=12345, name=name, state=NodeState.PENDING,
+                        public_ips=[], private_ips=[], driver=self.driver)
+
+        self.driver.create_node = Mock(side_effect=create_node)
+        mock_ssh_module.have_paramiko = True
+        deploy = Mock()
+
+        results = self.driver.deploy_nodes([{'name': 'web'},
+                                            {'name': 'fail'}],
+                                           concurrency=2, deploy=deploy,
+                                           ssh_username='admin')
+        results = dict([(item['name'], (node, error)) for item, node, error
+                        in results])
+
+        node, error = results['web']
+        self.assertEqual(error, None)
+        self.assertEqual(node.id, '12345')
+        self.assertEqual(node.state, NodeState.RUNNING)
+        self.assertEqual(deploy.run.call_count, 1)
+        self.assertEqual(mock_ssh_client.call_args[1]['hostname'],
+                         '67.23.21.33')
+        self.assertEqual(mock_ssh_client.call_args[1]['username'], 'admin')
+
+        node, error = results['fail']
+        self.assertEqual(node, None)
+        self.assertEqual(str(error), 'quota exceeded')
+
+    @patch('libcloud.compute.base.SSHClient')
+    @patch('libcloud.compute.ssh')
+    def test_deploy_nodes_deployment_error(self, mock_ssh_module, _):
+        self.driver.create_node = Mock()
+        self.driver.create_node.return_value = self.node
+        mock_ssh_module.have_paramiko = True
+
+        deploy = Mock()
+        deploy.run = Mock()
+        deploy.run.side_effect = Exception('foo')
+
+        results = list(self.driver.deploy_nodes([{'name': 'web'}],
+                                                deploy=deploy))
+        self.assertEqual(len(results), 1)
+
+        item, node, error = results[0]
+        self.assertEqual(item, {'name': 'web'})
+        self.assertEqual(node.id, '12345')
+        self.assertTrue(isinstance(error, DeploymentError))
+        self.assertEqual(error.node.id, '12345')
+
+    @patch('libcloud.compute.ssh')
+    def test_deploy_nodes_stops_creating_nodes_when_closed(self,
+                                                          mock_ssh_module):
+        proceed = threading.Event()
+
+        def create_node(name, **kwargs):
+            if name != 'web0':
+                proceed.wait(5)
+
+            raise Exception('quota exceeded')
+
+        self.driver.create_node = Mock(side_effect=create_node)
+        mock_ssh_module.have_paramiko = True
+
+        results = self.driver.deploy_nodes([{'name': 'web%s' % (index)}
+                                            for index in range(5)],
+                                           concurrency=1, deploy=Mock())
+        item, node, error = next(results)
+        self.assertEqual(item, {'name': 'web0'})
+        results.close()
+        proceed.set()
+
+        # Only the node which was being created when the generator has been
+        # closed can still be created
+        time.sleep(0.5)
+        self.assertTrue(self.driver.create_node.call_count <= 2)
+
+    @patch('libcloud.compute.ssh')
+    def test_deploy_node_ssh_client_class(self, mock_ssh_module):
+        self.driver.create_node = Mock()
+        self.driver.create_node.return_value = self.node
+        mock_ssh_module.have_paramiko = False
+        ssh_client_class = Mock()
+
+        node = self.driver.deploy_node(deploy=Mock(), ssh_key='/tmp/key',
+                                       ssh_client_class=ssh_client_class)
+        self.assertEqual(self.node.id, node.id)
+        self.assertEqual(ssh_client_class.call_args[1]['key'], '/tmp/key')
+        self.assertTrue(ssh_client_class.return_value.connect.called)
+
+    @patch('libcloud.compute.ssh')
+    def test_deploy_nodes_not_implemented(self, mock_ssh_module):
+        self.driver.features = {'create_node': []}
+        mock_ssh_module.have_paramiko = True
+
+        self.assertRaises(NotImplementedError, self.driver.deploy_nodes,
+                          [{'name': 'web'}], deploy=Mock())
+
     @patch('libcloud.compute.base.SSHClient')
     @patch('libcloud.compute.ssh')
     def test_exception_is_thrown_is_paramiko_is_not_available(self,
@@ -360,6 +595,20 @@ class DeploymentTests(unittest.TestCase):
         node = self.driver.deploy_node(deploy=Mock())
         self.assertEqual(self.node.id, node.id)
 
+    @patch('libcloud.compute.ssh')
+    def test_exception_is_thrown_if_paramiko_import_fails(self,
+                                                          mock_ssh_module):
+        self.driver.features = {'create_node': ['password']}
+        self.driver.create_node = Mock()
+        mock_ssh_module.have_paramiko = True
+        mock_ssh_module._get_paramiko.side_effect = ImportError('broken')
+
+        self.assertRaises(RuntimeError, self.driver.deploy_node,
+                          deploy=Mock())
+        self.assertRaises(RuntimeError, self.driver.deploy_nodes,
+                          [{'name': 'web'}], deploy=Mock())
+        self.assertFalse(self.driver.create_node.called)
+
 
 class RackspaceMockHttp(MockHttp):
 
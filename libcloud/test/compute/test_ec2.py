@@ -22,7 +22,7 @@ from libcloud.compute.drivers.ec2 import NimbusNodeDriver, EucNodeDriver
 from libcloud.compute.drivers.ec2 import EC2APNENodeDriver
 from libcloud.compute.drivers.ec2 import IdempotentParamError
 from libcloud.compute.base import Node, NodeImage, NodeSize, NodeLocation
-from libcloud.compute.base import StorageVolume
+from libcloud.compute.base import StorageVolume, CompactNode
 
 from libcloud.test import MockHttp, LibcloudTestCase
 from libcloud.test.compute import TestCaseMixin
@@ -99,6 +99,14 @@ class EC2Tests(LibcloudTestCase, TestCaseMixin):
         self.assertEqual(node.id, 'i-2ba64342')
         self.assertEqual(node.name, 'foo')
 
+    def test_list_nodes_compact(self):
+        self.driver.nodeCls = CompactNode
+        node = self.driver.list_nodes()[0]
+        self.assertTrue(isinstance(node, CompactNode))
+        self.assertEqual(node.id, 'i-4382922a')
+        self.assertEqual(node.extra['launchdatetime'],
+                         '2009-08-07T05:47:04.000Z')
+
     def test_list_nodes(self):
         node = self.driver.list_nodes()[0]
         public_ips = sorted(node.public_ips)
@@ -128,12 +136,34 @@ class EC2Tests(LibcloudTestCase, TestCaseMixin):
                                         '2009-08-07T05:47:04.000Z')
         self.assertTrue('instancetype' in ret_node2.extra)
 
+    def test_is_node_not_found_error(self):
+        error = Exception('InvalidInstanceID.NotFound: The instance ID '
+                          '\'i-4382922a\' does not exist')
+        self.assertTrue(self.driver._is_node_not_found_error(error))
+        error = Exception('RequestLimitExceeded: Request limit exceeded.')
+        self.assertFalse(self.driver._is_node_not_found_error(error))
+
     def test_list_nodes_with_name_tag(self):
         EC2MockHttp.type = 'WITH_TAGS'
         node = self.driver.list_nodes()[0]
         self.assertEqual(node.id, 'i-8474834a')
         self.assertEqual(node.name, 'foobar1')
 
+    def test_list_images_filters(self):
+        EC2MockHttp.type = 'FILTERS'
+        images = self.driver.list_images(
+            ex_image_ids=['ami-be3adfd7', 'ami-57ba933a'],
+            ex_owners=['self'], ex_executable_by=['all'],
+            ex_filters={'architecture': 'i386',
+                        'state': ['available', 'pending']})
+
+        # Nested block device mapping items are not treated as images
+        self.assertEqual([image.id for image in images],
+                         ['ami-be3adfd7', 'ami-57ba933a'])
+        self.assertEqual(images[1].extra['state'], 'pending')
+        self.assertEqual(images[1].extra['rootdevicetype'], 'ebs')
+        self.assertEqual(self.driver.connection.context, {})
+
     def test_list_location(self):
         locations = self.driver.list_locations()
         self.assertTrue(len(locations) > 0)
@@ -383,6 +413,22 @@ class EC2MockHttp(MockHttp):
         body = self.fixtures.load('describe_images.xml')
         return (httplib.OK, body, {}, httplib.responses[httplib.OK])
 
+    def _FILTERS_DescribeImages(self, method, url, body, headers):
+        # test_list_images_filters
+        expected = ['ImageId.1=ami-be3adfd7', 'ImageId.2=ami-57ba933a',
+                    'Owner.1=self', 'ExecutableBy.1=all',
+                    'Filter.1.Name=architecture', 'Filter.1.Value.1=i386',
+                    'Filter.2.Name=state', 'Filter.2.Value.1=available',
+                    'Filter.2.Value.2=pending']
+
+        for param in expected:
+            if url.find(param) == -1:
+                return (httplib.BAD_REQUEST, '', {},
+                        httplib.responses[httplib.BAD_REQUEST])
+
+        body = self.fixtures.load('describe_images_filtered.xml')
+        return (httplib.OK, body, {}, httplib.responses[httplib.OK])
+
     def _RunInstances(self, method, url, body, headers):
         body = self.fixtures.load('run_instances.xml')
         return (httplib.OK, body, {}, httplib.responses[httplib.OK])
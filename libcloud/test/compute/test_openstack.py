@@ -673,6 +673,12 @@ class OpenStack_1_1_Tests(unittest.TestCase, TestCaseMixin):
             self.assertEqual(size.price, pricing[size.id],
                              'Size price should match')
 
+    def test_list_images_filters(self):
+        filters = {'server': '52415800-8b69-11e0-9b19-734f335aa7b3',
+                   'type': 'SNAPSHOT'}
+        images = self.driver.list_images(ex_filters=filters)
+        self.assertEqual(len(images), 13, 'Wrong images count')
+
     def test_list_images(self):
         images = self.driver.list_images()
         self.assertEqual(len(images), 13, 'Wrong images count')
@@ -891,6 +897,12 @@ class OpenStack_1_1_MockHttp(MockHttpTestCase):
         return (httplib.OK, body, self.json_content_headers, httplib.responses[httplib.OK])
 
     def _v1_1_slug_images_detail(self, method, url, body, headers):
+        if url.find('server=') != -1:
+            # test_list_images_filters
+            self.assertTrue(url.find(
+                'server=52415800-8b69-11e0-9b19-734f335aa7b3') != -1)
+            self.assertTrue(url.find('type=SNAPSHOT') != -1)
+
         body = self.fixtures.load('_images_detail.json')
         return (httplib.OK, body, self.json_content_headers, httplib.responses[httplib.OK])
 
@@ -14,16 +14,259 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
 import sys
+import stat
+import shutil
+import tempfile
 import unittest
 
 import libcloud.compute.ssh
+from libcloud.compute.ssh import ParamikoSSHClient, ShellOutSSHClient
+from libcloud.utils.py3 import b
 
-from mock import Mock
+from mock import Mock, call, patch
+
+
+class FileObject(object):
+    def __init__(self, data):
+        self.data = data
+        self.reads = 0
+
+    def read(self, size=-1):
+        self.reads += 1
+
+        if size < 0:
+            size = len(self.data)
+
+        result, self.data = self.data[:size], self.data[size:]
+        return result
 
 
 class ParamikoSSHClientTests(unittest.TestCase):
-    pass
+
+    def setUp(self):
+        self.patcher = patch('libcloud.compute.ssh.paramiko', create=True)
+        self.patcher.start()
+
+        self.client = ParamikoSSHClient(hostname='localhost')
+        self.client.client = Mock()
+        self.sftp = self.client.client.open_sftp.return_value
+        self.file = self.sftp.file.return_value
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def test_put_reuses_sftp_session_and_known_directories(self):
+        self.sftp.stat.side_effect = IOError('No such file')
+
+        self.client.put('/tmp/a/b/file1', contents='foo', chmod=int('755', 8))
+        self.client.put('/tmp/a/b/file2', contents='bar')
+        self.client.put('/tmp/a/file3', contents='baz')
+        self.client.delete('/tmp/a/file3')
+
+        self.assertEqual(self.client.client.open_sftp.call_count, 1)
+        self.assertEqual(self.sftp.stat.call_count, 3)
+        self.assertEqual(self.sftp.mkdir.call_args_list,
+                         [call('/tmp'), call('/tmp/a'), call('/tmp/a/b')])
+        self.assertEqual(self.sftp.file.call_args_list,
+                         [call('/tmp/a/b/file1', mode='w'),
+                          call('/tmp/a/b/file2', mode='w'),
+                          call('/tmp/a/file3', mode='w')])
+        self.file.chmod.assert_called_once_with(int('755', 8))
+        self.assertEqual(self.file.close.call_count, 3)
+        self.sftp.unlink.assert_called_once_with('/tmp/a/file3')
+        self.assertFalse(self.sftp.close.called)
+
+    def test_existing_directory_marks_parents_as_known(self):
+        self.client.put('/tmp/a/b/file1', contents='foo')
+        self.client.put('/tmp/a/file2', contents='bar')
+        self.client.put('relative/file3', contents='baz')
+
+        self.assertEqual(self.sftp.stat.call_args_list,
+                         [call('/tmp/a/b'), call('relative')])
+        self.assertFalse(self.sftp.mkdir.called)
+
+    def test_putfo_uploads_in_chunks(self):
+        data = 'a' * (libcloud.compute.ssh.CHUNK_SIZE + 10)
+        fo = FileObject(data)
+
+        self.client.putfo('/tmp/file', fo=fo, chmod=int('644', 8))
+
+        self.assertEqual(fo.reads, 3)
+        self.file.set_pipelined.assert_called_once_with(True)
+        self.assertEqual(self.file.write.call_count, 2)
+        self.assertEqual(''.join([c[0][0] for c in
+                                  self.file.write.call_args_list]), data)
+        self.file.chmod.assert_called_once_with(int('644', 8))
+
+    def test_put_many(self):
+        self.client.put_many([('/tmp/a/file1', 'foo'),
+                              ('/tmp/a/file2', FileObject('bar')),
+                              ('/tmp/b/file3', 'baz', int('700', 8))],
+                             chmod=int('644', 8))
+
+        self.assertEqual(self.client.client.open_sftp.call_count, 1)
+        self.assertEqual(self.sftp.stat.call_args_list,
+                         [call('/tmp/a'), call('/tmp/b')])
+        self.assertEqual(self.file.write.call_args_list,
+                         [call('foo'), call('bar'), call('baz')])
+        self.assertEqual(self.file.chmod.call_args_list,
+                         [call(int('644', 8)), call(int('644', 8)),
+                          call(int('700', 8))])
+
+    def test_close_closes_sftp_session(self):
+        self.sftp.stat.side_effect = IOError('No such file')
+        self.client.put('/tmp/file1', contents='foo')
+        self.client.close()
+
+        self.sftp.close.assert_called_once_with()
+        self.client.client.close.assert_called_once_with()
+
+        self.client.put('/tmp/file2', contents='bar')
+        self.assertEqual(self.client.client.open_sftp.call_count, 2)
+        self.assertEqual(self.sftp.mkdir.call_count, 2)
+
+
+# Fake ssh binary which logs its arguments and runs the remote command
+# locally
+FAKE_SSH = """#!/bin/sh
+echo "$@" >> "$(dirname "$0")/ssh.log"
+master=0
+
+while [ $# -gt 0 ]; do
+    case "$1" in
+        -N) master=1 ;;
+        -O) exit 0 ;;
+        -o|-p|-l|-i) shift ;;
+        -*) ;;
+        *) host="$1"; shift; break ;;
+    esac
+    shift
+done
+
+if [ "$host" = "unreachable" ]; then
+    echo "ssh: connect to host unreachable: Connection refused" >&2
+    exit 255
+fi
+
+if [ $master -eq 1 ]; then
+    exit 0
+fi
+
+exec /bin/sh -c "$*"
+"""
+
+
+class ShellOutSSHClientTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        ssh_path = os.path.join(self.tmp_dir, 'ssh')
+
+        fp = open(ssh_path, 'w')
+        fp.write(FAKE_SSH)
+        fp.close()
+        os.chmod(ssh_path, int('755', 8))
+
+        self.old_path = os.environ.get('PATH', '')
+        os.environ['PATH'] = self.tmp_dir + os.pathsep + self.old_path
+
+        self.client = ShellOutSSHClient(hostname='localhost', port=2222,
+                                        username='ubuntu', key='/tmp/key',
+                                        timeout=5)
+
+    def tearDown(self):
+        os.environ['PATH'] = self.old_path
+        shutil.rmtree(self.tmp_dir)
+
+    def _get_log(self):
+        fp = open(os.path.join(self.tmp_dir, 'ssh.log'))
+
+        try:
+            return fp.read().splitlines()
+        finally:
+            fp.close()
+
+    def _read(self, path):
+        fp = open(path, 'rb')
+
+        try:
+            return fp.read()
+        finally:
+            fp.close()
+
+    def test_commands_share_master_connection(self):
+        self.assertTrue(self.client.connect())
+        control_dir = self.client._control_dir
+        self.assertTrue(os.path.isdir(control_dir))
+
+        stdout, stderr, status = self.client.run('echo foo; echo bar >&2; '
+                                                 'exit 3')
+        self.assertEqual(stdout, 'foo\n')
+        self.assertEqual(stderr, 'bar\n')
+        self.assertEqual(status, 3)
+
+        log = self._get_log()
+        self.assertEqual(len(log), 2)
+        self.assertTrue(log[0].startswith('-o ControlMaster=yes '
+                                          '-o ControlPersist=60 -N -f '))
+        self.assertTrue(log[0].endswith('localhost'))
+
+        control_path = 'ControlPath=%s' % (os.path.join(control_dir,
+                                                        'control'))
+
+        for line in log:
+            self.assertTrue(control_path in line)
+            self.assertTrue('-p 2222 -l ubuntu' in line)
+            self.assertTrue('-o ConnectTimeout=5 -i /tmp/key' in line)
+
+        self.assertTrue(self.client.close())
+        self.assertTrue(self._get_log()[-1].startswith('-O exit '))
+        self.assertFalse(os.path.exists(control_dir))
+
+    def test_put_putfo_and_delete(self):
+        self.client.connect()
+        path = os.path.join(self.tmp_dir, 'a', 'b c', 'file')
+
+        self.client.put(path, contents='foo', chmod=int('640', 8))
+        self.assertEqual(self._read(path), b('foo'))
+        self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), int('640', 8))
+
+        self.client.put(path, contents='bar', mode='a')
+        self.assertEqual(self._read(path), b('foobar'))
+
+        fp = open(__file__, 'rb')
+
+        try:
+            self.client.putfo(path, fo=fp)
+        finally:
+            fp.close()
+
+        self.assertEqual(self._read(path), self._read(__file__))
+
+        self.client.delete(path)
+        self.assertFalse(os.path.exists(path))
+        self.assertRaises(IOError, self.client.delete, path)
+
+        self.client.close()
+
+    def test_connect_failure(self):
+        self.client.hostname = 'unreachable'
+
+        try:
+            self.client.connect()
+        except IOError:
+            e = sys.exc_info()[1]
+            self.assertTrue('Connection refused' in str(e))
+        else:
+            self.fail('Exception was not thrown')
+
+        self.client.close()
+
+    def test_password_authentication_is_not_supported(self):
+        client = ShellOutSSHClient(hostname='localhost', password='secret')
+        self.assertRaises(ValueError, client.connect)
 
 
 if __name__ == '__main__':
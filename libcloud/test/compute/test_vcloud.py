@@ -239,6 +239,17 @@ class VCloud_1_5_Tests(unittest.TestCase, TestCaseMixin):
     def test_ex_list_nodes(self):
         self.assertEqual(len(self.driver.ex_list_nodes()), len(self.driver.list_nodes()))
 
+    def test_ex_list_nodes_concurrency(self):
+        # The removed vApp is skipped in both modes and the order is kept
+        sequential = self.driver.ex_list_nodes(ex_concurrency=1)
+        concurrent = self.driver.ex_list_nodes(ex_concurrency=8)
+
+        self.assertEqual(len(sequential), 2)
+        self.assertEqual([node.id for node in concurrent],
+                         [node.id for node in sequential])
+        self.assertEqual([node.name for node in concurrent],
+                         ['testNode', 'testNode2'])
+
     def test_ex_power_off(self):
         node = Node('https://vm-vcloud/api/vApp/vapp-8c57a5b6-e61b-48ca-8a78-3b70ee65ef6b', 'testNode', NodeState.RUNNING, [], [], self.driver)
         self.driver.ex_power_off_node(node)
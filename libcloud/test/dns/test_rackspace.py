@@ -18,6 +18,7 @@ import unittest
 from libcloud.utils.py3 import httplib
 
 from libcloud.common.types import LibcloudError
+from libcloud.dns.base import CompactRecord
 from libcloud.dns.types import RecordType, ZoneDoesNotExistError
 from libcloud.dns.types import RecordDoesNotExistError
 from libcloud.dns.drivers.rackspace import RackspaceUSDNSDriver
@@ -258,6 +259,20 @@ class RackspaceUSTests(unittest.TestCase):
         self.assertEqual(updated_record.type, record.type)
         self.assertEqual(updated_record.data, '127.3.3.3')
 
+    def test_update_record_compact(self):
+        self.driver.recordCls = CompactRecord
+        zone = self.driver.list_zones()[0]
+        record = self.driver.list_records(zone=zone)[0]
+        self.assertTrue(isinstance(record, CompactRecord))
+
+        updated_record = self.driver.update_record(record=record,
+                                                   data='127.3.3.3')
+        self.assertEqual(updated_record.id, record.id)
+        self.assertEqual(updated_record.name, record.name)
+        self.assertEqual(updated_record.zone, record.zone)
+        self.assertEqual(updated_record.data, '127.3.3.3')
+        self.assertEqual(updated_record.extra['fqdn'], record.extra['fqdn'])
+
     def test_delete_zone_success(self):
         zone = self.driver.list_zones()[0]
         status = self.driver.delete_zone(zone=zone)
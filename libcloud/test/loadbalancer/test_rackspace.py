@@ -26,6 +26,7 @@ from libcloud.utils.py3 import httplib
 from libcloud.utils.py3 import urlencode
 
 from libcloud.loadbalancer.base import LoadBalancer, Member, Algorithm
+from libcloud.loadbalancer.base import CompactMember
 from libcloud.loadbalancer.types import MemberCondition
 from libcloud.loadbalancer.drivers.rackspace import RackspaceLBDriver, RackspaceHealthMonitor, RackspaceHTTPHealthMonitor, RackspaceConnectionThrottle, RackspaceAccessRule
 from libcloud.loadbalancer.drivers.rackspace import RackspaceUKLBDriver
@@ -671,6 +672,16 @@ class RackspaceLBTests(unittest.TestCase):
         self.assertEquals(expected, set(["%s:%s" % (member.ip, member.port) for
                                          member in members]))
 
+    def test_balancer_list_members_compact(self):
+        self.driver.memberCls = CompactMember
+        balancer = self.driver.get_balancer(balancer_id='8290')
+        members = balancer.list_members()
+
+        self.assertEquals(len(members), 3)
+        self.assertTrue(isinstance(members[0], CompactMember))
+        self.assertEquals(members[0].balancer, balancer)
+        self.assertTrue('condition' in members[0].extra)
+
     def test_balancer_members_extra_weight(self):
         balancer = self.driver.get_balancer(balancer_id='8290')
         members = balancer.list_members()
@@ -14,7 +14,9 @@
 # limitations under the License.
 
 import base64
+import hashlib
 import os.path
+import socket
 import sys
 import unittest
 
@@ -218,6 +220,47 @@ class AtmosTests(unittest.TestCase):
         else:
             self.fail('Object does not exist but an exception was not thrown')
 
+    def test_download_object_ranged(self):
+        container = Container(name='foo_bar_container', extra={},
+                              driver=self.driver)
+        obj = Object(name='foo_bar_object', size=1000, hash=None, extra={},
+                     container=container, meta_data=None,
+                     driver=self.driver)
+        calls = []
+
+        def request(action, **kwargs):
+            calls.append((action, kwargs))
+            return 'response'
+
+        def download_object_ranged(**kwargs):
+            calls.append(kwargs)
+            return True
+
+        old_request = self.driver.connection.request
+        self.driver.connection.request = request
+        self.driver._download_object_ranged = download_object_ranged
+
+        try:
+            response = self.driver._get_object_range(obj=obj, start_bytes=100,
+                                                     end_bytes=200)
+            result = self.driver.download_object(obj=obj,
+                                                 destination_path='/tmp/a',
+                                                 ranged=True)
+        finally:
+            self.driver.connection.request = old_request
+
+        self.assertTrue(self.driver.supports_ranged_download)
+        self.assertEqual(response, 'response')
+        self.assertTrue(result)
+
+        action, kwargs = calls[0]
+        self.assertTrue(action.endswith('/rest/namespace/foo_bar_container/foo_bar_object'))
+        self.assertEqual(kwargs['method'], 'GET')
+        self.assertEqual(kwargs['headers'], {'Range': 'bytes=100-199'})
+        self.assertTrue(kwargs['raw'])
+        self.assertEqual(calls[1]['obj'], obj)
+        self.assertEqual(calls[1]['destination_path'], '/tmp/a')
+
     def test_download_object_success(self):
         container = Container(name='foo_bar_container', extra={},
                               driver=self.driver)
@@ -328,8 +371,8 @@ class AtmosTests(unittest.TestCase):
         def dummy_content_type(name):
             return 'application/zip', None
 
-        def send(instance):
-            raise Exception('')
+        def send(instance, data):
+            raise socket.timeout('')
 
         old_func1 = libcloud.utils.files.guess_file_mime_type
         libcloud.utils.files.guess_file_mime_type = dummy_content_type
@@ -408,6 +451,25 @@ class AtmosTests(unittest.TestCase):
         finally:
             libcloud.storage.drivers.atmos.guess_file_mime_type = old_func
 
+    def test_upload_object_via_stream_multiple_blocks(self):
+        container = Container(name='fbc', extra={}, driver=self)
+        iterator = DummyIterator(data=['12345', '6789', '0'])
+        AtmosMockHttp.written_blocks = {}
+        AtmosMockHttp.user_meta = []
+
+        obj = self.driver.upload_object_via_stream(
+            container=container, object_name='ftsdb', iterator=iterator,
+            extra={'content_type': 'text/plain'}, ex_block_size=3,
+            ex_concurrency=2)
+
+        expected_hash = hashlib.md5(b('1234567890')).hexdigest()
+        self.assertEqual(obj.size, 10)
+        self.assertEqual(obj.hash, expected_hash)
+        self.assertEqual(AtmosMockHttp.written_blocks,
+                         {None: b('123'), 'Bytes=3-5': b('456'),
+                          'Bytes=6-8': b('789'), 'Bytes=9-9': b('0')})
+        self.assertEqual(AtmosMockHttp.user_meta, ['md5=' + expected_hash])
+
     def test_upload_object_via_stream_no_content_type(self):
         def no_content_type(name):
             return None, None
@@ -721,6 +783,21 @@ class AtmosMockHttp(StorageMockHttp, unittest.TestCase):
         self.assertTrue('x-emc-meta' in headers)
         return (httplib.OK, '', {}, httplib.responses[httplib.OK])
 
+    def _rest_namespace_fbc_ftsdb_metadata_system(self, method, url, body,
+                                                  headers):
+        return self._rest_namespace_fbc_ftsde_metadata_system(method, url,
+                                                              body, headers)
+
+    def _rest_namespace_fbc_ftsdb(self, method, url, body, headers):
+        self.assertEqual(method, 'PUT')
+        self.written_blocks[headers.get('Range', None)] = b(body)
+        return (httplib.OK, '', {}, httplib.responses[httplib.OK])
+
+    def _rest_namespace_fbc_ftsdb_metadata_user(self, method, url, body,
+                                                headers):
+        self.user_meta.append(headers['x-emc-meta'])
+        return (httplib.OK, '', {}, httplib.responses[httplib.OK])
+
     def _rest_namespace_fbc_ftsd_metadata_system(self, method, url, body,
                                                  headers):
         meta = {
@@ -13,20 +13,32 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
 import sys
-import unittest
+import socket
+import shutil
 import hashlib
+import tempfile
+import zlib
+import threading
+import unittest
 
 from mock import Mock
 
 from libcloud.utils.py3 import StringIO
 from libcloud.utils.py3 import PY3
 from libcloud.utils.py3 import b
+from libcloud.utils.py3 import httplib
 
 if PY3:
     from io import FileIO as file
 
-from libcloud.storage.base import StorageDriver
+from libcloud.common.types import LibcloudError
+from libcloud.common.base import LoggingConnection
+from libcloud.storage.base import StorageDriver, Container, Object
+from libcloud.storage.base import CompactObject
+from libcloud.storage.types import ObjectDoesNotExistError
+from libcloud.storage.types import ObjectHashMismatchError
 
 from libcloud.test import StorageMockHttp # pylint: disable-msg=E0611
 
@@ -41,6 +53,22 @@ class BaseStorageTests(unittest.TestCase):
         self.driver2 = StorageDriver('username', 'key', host='localhost')
         self.driver2.supports_chunked_encoding = False
 
+    def test_compact_object(self):
+        container = Container(name='container', extra=None,
+                              driver=self.driver1)
+        obj = CompactObject(name='foo', size=10, hash='abc', extra=None,
+                            meta_data={'key': 'value'},
+                            container=container, driver=self.driver1)
+        self.assertTrue(isinstance(obj, Object))
+        self.assertEqual(obj.name, 'foo')
+        self.assertEqual(obj.container, container)
+        self.assertEqual(obj.meta_data, {'key': 'value'})
+
+        self.assertEqual(obj._extra, None)
+        self.assertEqual(obj.extra, {})
+        obj.extra['content_type'] = 'text/plain'
+        self.assertEqual(obj.extra, {'content_type': 'text/plain'})
+
     def test__upload_object_iterator_must_have_next_method(self):
         class Iterator(object):
             def next(self):
@@ -148,5 +176,526 @@ class BaseStorageTests(unittest.TestCase):
         else:
             self.fail('Invalid hash type but exception was not thrown')
 
+    def _get_objects(self, count):
+        container = Container(name='test', extra={}, driver=self.driver1)
+        return [Object(name='dir/object%d' % (index), size=1, hash=None,
+                       extra=None, meta_data=None, container=container,
+                       driver=self.driver1) for index in range(count)]
+
+    def test_upload_objects(self):
+        container = Container(name='test', extra={}, driver=self.driver1)
+        calls = []
+
+        def upload_object(file_path, container, object_name, extra=None,
+                          verify_hash=True):
+            calls.append((file_path, object_name, extra))
+
+            if object_name == 'fail':
+                raise LibcloudError('Upload failed')
+
+            return Object(name=object_name, size=1, hash=None, extra=None,
+                          meta_data=None, container=container, driver=None)
+
+        self.driver1.upload_object = upload_object
+        items = [('/tmp/a', 'a'), ('/tmp/b', 'b', {'content_type': 'foo'}),
+                 ('/tmp/fail', 'fail')]
+        results = list(self.driver1.upload_objects(items=items,
+                                                   container=container,
+                                                   concurrency=2))
+
+        self.assertEqual(len(results), 3)
+        self.assertTrue(('/tmp/b', 'b', {'content_type': 'foo'}) in calls)
+
+        for item, obj, error in results:
+            if item[1] == 'fail':
+                self.assertEqual(obj, None)
+                self.assertTrue(isinstance(error, LibcloudError))
+            else:
+                self.assertEqual(obj.name, item[1])
+                self.assertEqual(error, None)
+
+    def test_delete_objects_retry(self):
+        objs = self._get_objects(count=10)
+        attempts = {}
+
+        def delete_object(obj):
+            attempts[obj.name] = attempts.get(obj.name, 0) + 1
+
+            if obj.name == 'dir/object3':
+                raise ObjectDoesNotExistError(value='', driver=self.driver1,
+                                              object_name=obj.name)
+            elif attempts[obj.name] == 1:
+                raise LibcloudError('Temporary failure')
+
+            return True
+
+        self.driver1.delete_object = delete_object
+        results = list(self.driver1.delete_objects(objs=objs, concurrency=4,
+                                                   retries=1, retry_delay=0))
+
+        self.assertEqual(len(results), 10)
+        for obj, result, error in results:
+            if obj.name == 'dir/object3':
+                # Errors such as ObjectDoesNotExistError are never retried
+                self.assertTrue(isinstance(error, ObjectDoesNotExistError))
+                self.assertEqual(attempts[obj.name], 1)
+            else:
+                self.assertTrue(result)
+                self.assertEqual(error, None)
+                self.assertEqual(attempts[obj.name], 2)
+
+    def test_download_objects(self):
+        objs = self._get_objects(count=3)
+        destination = tempfile.mkdtemp()
+
+        def download_object(obj, destination_path, overwrite_existing=False,
+                            delete_on_failure=True):
+            if obj.name == 'dir/object1':
+                return False
+
+            fp = open(destination_path, 'wb')
+            fp.write(b('a'))
+            fp.close()
+            return True
+
+        self.driver1.download_object = download_object
+
+        try:
+            results = list(self.driver1.download_objects(
+                objs=objs, destination_path=destination))
+
+            self.assertEqual(len(results), 3)
+            for obj, result, error in results:
+                file_path = os.path.join(destination, obj.name)
+                if obj.name == 'dir/object1':
+                    self.assertTrue(isinstance(error, LibcloudError))
+                    self.assertFalse(os.path.exists(file_path))
+                else:
+                    self.assertTrue(result)
+                    self.assertTrue(os.path.exists(file_path))
+        finally:
+            shutil.rmtree(destination)
+
+    def test_download_objects_name_outside_of_destination(self):
+        container = Container(name='test', extra={}, driver=self.driver1)
+        names = ['../x', '/etc/x', 'dir/../../x', '../destination2/x',
+                 'dir/../ok']
+        objs = [Object(name=name, size=1, hash=None, extra=None,
+                       meta_data=None, container=container,
+                       driver=self.driver1) for name in names]
+        base = tempfile.mkdtemp()
+        destination = os.path.join(base, 'destination')
+        os.mkdir(destination)
+        called = []
+
+        def download_object(obj, destination_path, overwrite_existing=False,
+                            delete_on_failure=True):
+            called.append(destination_path)
+            return True
+
+        self.driver1.download_object = download_object
+
+        try:
+            results = list(self.driver1.download_objects(
+                objs=objs, destination_path=destination))
+
+            self.assertEqual(len(results), 5)
+            for obj, result, error in results:
+                if obj.name == 'dir/../ok':
+                    self.assertTrue(result)
+                    self.assertEqual(error, None)
+                else:
+                    self.assertEqual(result, None)
+                    self.assertTrue(isinstance(error, LibcloudError))
+
+            self.assertEqual(called, [os.path.join(destination, 'ok')])
+            self.assertEqual(os.listdir(base), ['destination'])
+        finally:
+            shutil.rmtree(base)
+
+    def test_download_objects_root_destination(self):
+        container = Container(name='test', extra={}, driver=self.driver1)
+        root = os.path.abspath(os.sep)
+        objs = [Object(name=name, size=1, hash=None, extra=None,
+                       meta_data=None, container=container,
+                       driver=self.driver1) for name in ['x', '../y']]
+        called = []
+
+        def download_object(obj, destination_path, overwrite_existing=False,
+                            delete_on_failure=True):
+            called.append(destination_path)
+            return True
+
+        self.driver1.download_object = download_object
+
+        results = list(self.driver1.download_objects(objs=objs,
+                                                     destination_path=root))
+
+        for obj, result, error in results:
+            self.assertTrue(result)
+            self.assertEqual(error, None)
+
+        self.assertEqual(sorted(called), [os.path.join(root, 'x'),
+                                          os.path.join(root, 'y')])
+
+    def test_download_objects_destination_doesnt_exist(self):
+        objs = self._get_objects(count=1)
+        self.assertRaises(LibcloudError, self.driver1.download_objects,
+                          objs=objs, destination_path='/does/not/exist')
+
+    def _setup_ranged_download(self, data, fail_ranges=None):
+        self.driver1.supports_ranged_download = True
+        self.driver1.ranged_download_part_size = 16
+        self.driver1.ranged_download_concurrency = 3
+        self.driver1.ranged_download_retries = 0
+
+        requested = []
+        fail_ranges = fail_ranges or []
+
+        def get_object_range(obj, start_bytes, end_bytes):
+            requested.append(start_bytes)
+
+            if start_bytes in fail_ranges:
+                # Connection dropped in the middle of a range
+                end_bytes = start_bytes + 5
+
+            return RangeResponse(httplib.PARTIAL_CONTENT,
+                                 data[start_bytes:end_bytes])
+
+        self.driver1._get_object_range = get_object_range
+        return requested
+
+    def _get_ranged_object(self, data, hash='etag'):
+        container = Container(name='test', extra={}, driver=self.driver1)
+        return Object(name='object', size=len(data), hash=hash, extra=None,
+                      meta_data=None, container=container,
+                      driver=self.driver1)
+
+    def test_download_object_ranged(self):
+        data = 'abcdefghij' * 10
+        requested = self._setup_ranged_download(data)
+        obj = self._get_ranged_object(data)
+        destination = tempfile.mkdtemp()
+        file_path = os.path.join(destination, 'object')
+
+        try:
+            result = self.driver1._download_object_ranged(
+                obj=obj, destination_path=file_path)
+
+            self.assertTrue(result)
+            self.assertEqual(sorted(requested), list(range(0, 100, 16)))
+            self.assertEqual(open(file_path, 'rb').read(), b(data))
+            self.assertEqual(os.listdir(destination), ['object'])
+        finally:
+            shutil.rmtree(destination)
+
+    def test_download_object_ranged_resume(self):
+        data = 'abcdefghij' * 10
+        obj = self._get_ranged_object(data)
+        destination = tempfile.mkdtemp()
+        file_path = os.path.join(destination, 'object')
+
+        try:
+            requested = self._setup_ranged_download(data, fail_ranges=[48])
+            self.assertRaises(LibcloudError,
+                              self.driver1._download_object_ranged,
+                              obj=obj, destination_path=file_path)
+
+            # Downloaded ranges are kept, but the file is not created
+            self.assertFalse(os.path.exists(file_path))
+            self.assertTrue(os.path.exists(file_path + '.partial'))
+
+            requested = self._setup_ranged_download(data)
+            result = self.driver1._download_object_ranged(
+                obj=obj, destination_path=file_path)
+
+            self.assertTrue(result)
+            self.assertEqual(requested, [48])
+            self.assertEqual(open(file_path, 'rb').read(), b(data))
+            self.assertEqual(os.listdir(destination), ['object'])
+        finally:
+            shutil.rmtree(destination)
+
+    def test_download_object_ranged_object_has_changed(self):
+        data = 'abcdefghij' * 10
+        destination = tempfile.mkdtemp()
+        file_path = os.path.join(destination, 'object')
+
+        try:
+            self._setup_ranged_download(data, fail_ranges=[48])
+            self.assertRaises(LibcloudError,
+                              self.driver1._download_object_ranged,
+                              obj=self._get_ranged_object(data),
+                              destination_path=file_path)
+
+            data = 'jihgfedcba' * 10
+            requested = self._setup_ranged_download(data)
+            self.driver1._download_object_ranged(
+                obj=self._get_ranged_object(data, hash='etag2'),
+                destination_path=file_path)
+
+            self.assertEqual(len(requested), 7)
+            self.assertEqual(open(file_path, 'rb').read(), b(data))
+        finally:
+            shutil.rmtree(destination)
+
+    def test_download_object_ranged_verifies_md5(self):
+        data = 'abcdefghij' * 10
+        md5 = hashlib.md5(b(data)).hexdigest()
+        destination = tempfile.mkdtemp()
+        file_path = os.path.join(destination, 'object')
+
+        try:
+            self._setup_ranged_download(data)
+            result = self.driver1._download_object_ranged(
+                obj=self._get_ranged_object(data, hash='"%s"' % (md5)),
+                destination_path=file_path)
+            self.assertTrue(result)
+
+            # Data doesn't match the hash. Ranges are not kept because they
+            # can't be resumed.
+            self._setup_ranged_download('x' + data[1:])
+            self.assertRaises(ObjectHashMismatchError,
+                              self.driver1._download_object_ranged,
+                              obj=self._get_ranged_object(data, hash=md5),
+                              destination_path=file_path,
+                              overwrite_existing=True)
+            self.assertEqual(os.listdir(destination), ['object'])
+            self.assertEqual(open(file_path, 'rb').read(), b(data))
+
+            # Multipart upload ETags are not MD5 digests of the data
+            self._setup_ranged_download('x' + data[1:])
+            result = self.driver1._download_object_ranged(
+                obj=self._get_ranged_object(data, hash=md5 + '-2'),
+                destination_path=file_path, overwrite_existing=True)
+            self.assertTrue(result)
+        finally:
+            shutil.rmtree(destination)
+
+    def test_download_object_ranged_not_supported(self):
+        obj = self._get_ranged_object('data')
+        self.assertRaises(LibcloudError,
+                          self.driver1._download_object_ranged,
+                          obj=obj, destination_path='/tmp/object')
+
+    def _upload_file(self, data, secure=False, chunked=False,
+                     calculate_hash=True, connection_cls=None):
+        sock, remote = socket.socketpair()
+        received = []
+
+        def read():
+            while True:
+                chunk = remote.recv(65536)
+                if not chunk:
+                    break
+                received.append(chunk)
+
+        reader = threading.Thread(target=read)
+        reader.start()
+
+        fd, file_path = tempfile.mkstemp()
+        os.write(fd, data)
+        os.close(fd)
+
+        connection = (connection_cls or FakeHTTPConnection)(sock)
+        response = FakeRawResponse(connection, secure=secure)
+
+        try:
+            result = self.driver1._upload_file(response=response,
+                                               file_path=file_path,
+                                               chunked=chunked,
+                                               calculate_hash=calculate_hash)
+        finally:
+            sock.close()
+            reader.join()
+            remote.close()
+            os.unlink(file_path)
+
+        return result, b('').join(received), connection.send_called
+
+    def test__upload_file_plain_connection(self):
+        data = os.urandom(600 * 1024 + 13)
+        result, received, send_called = self._upload_file(data)
+
+        self.assertEqual(result, (True, hashlib.md5(data).hexdigest(),
+                                  len(data)))
+        self.assertEqual(received, data)
+        # Data is written directly to the socket
+        self.assertEqual(send_called, 0)
+
+    def test__upload_file_plain_connection_without_hash(self):
+        data = os.urandom(600 * 1024 + 13)
+        result, received, send_called = self._upload_file(
+            data, calculate_hash=False)
+
+        self.assertEqual(result, (True, None, len(data)))
+        self.assertEqual(received, data)
+        self.assertEqual(send_called, 0)
+
+    def test__upload_file_secure_connection(self):
+        data = os.urandom(600 * 1024 + 13)
+        result, received, send_called = self._upload_file(data, secure=True)
+
+        self.assertEqual(result, (True, hashlib.md5(data).hexdigest(),
+                                  len(data)))
+        self.assertEqual(received, data)
+        self.assertEqual(send_called, 3)
+
+    def test__upload_file_chunked(self):
+        data = os.urandom(300 * 1024)
+        result, received, _ = self._upload_file(data, chunked=True)
+
+        self.assertEqual(result, (True, hashlib.md5(data).hexdigest(),
+                                  len(data)))
+        expected = b('%X\r\n' % (256 * 1024)) + data[:256 * 1024] + \
+            b('\r\n%X\r\n' % (44 * 1024)) + data[256 * 1024:] + \
+            b('\r\n0\r\n\r\n')
+        self.assertEqual(received, expected)
+
+    def test__upload_file_debug_logging(self):
+        data = os.urandom(300 * 1024)
+        result, received, send_called = self._upload_file(
+            data, connection_cls=FakeLoggingHTTPConnection)
+
+        self.assertEqual(result, (True, hashlib.md5(data).hexdigest(),
+                                  len(data)))
+        self.assertEqual(received, data)
+        # Data goes through the (logging) connection
+        self.assertEqual(send_called, 2)
+
+    def test__upload_file_socket_error(self):
+        def send_file_to_socket(**kwargs):
+            raise socket.error('Connection reset by peer')
+
+        self.driver1._send_file_to_socket = send_file_to_socket
+        result, _, _ = self._upload_file(os.urandom(1024))
+        self.assertEqual(result, (False, None, 0))
+
+    def test__upload_file_unexpected_error_is_propagated(self):
+        def send_file_to_socket(**kwargs):
+            raise TypeError('unexpected')
+
+        self.driver1._send_file_to_socket = send_file_to_socket
+        self.assertRaises(TypeError, self._upload_file, os.urandom(1024))
+
+    def test__upload_file_empty_file(self):
+        for secure in [False, True]:
+            result, received, _ = self._upload_file(b(''), secure=secure)
+            self.assertEqual(result, (True, hashlib.md5().hexdigest(), 0))
+            self.assertEqual(received, b(''))
+
+
+    def _save_object(self, data, size, headers=None):
+        response = FakeHTTPResponse(data, headers or {})
+        obj = Object(name='foo', size=size, hash=None, extra={},
+                     meta_data={}, container=None, driver=self.driver1)
+        tmp_dir = tempfile.mkdtemp()
+
+        try:
+            file_path = os.path.join(tmp_dir, 'foo')
+            result = self.driver1._save_object(response=response, obj=obj,
+                                               destination_path=file_path)
+
+            if not result:
+                return result, None
+
+            fp = open(file_path, 'rb')
+            try:
+                return result, fp.read()
+            finally:
+                fp.close()
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test__save_object_decompress_downloads(self):
+        data = b('foo bar ') * 1000
+        compressed = zlib.compress(data)
+        headers = {'content-encoding': 'deflate'}
+
+        # Data is saved as is by default
+        result = self._save_object(compressed, len(compressed), headers)
+        self.assertEqual(result, (True, compressed))
+
+        self.driver1.decompress_downloads = True
+
+        # Object size can refer either to the compressed data (object has
+        # been stored compressed) or to the decompressed data (compression
+        # has been applied by the server)
+        for size in [len(compressed), len(data)]:
+            result = self._save_object(compressed, size, headers)
+            self.assertEqual(result, (True, data))
+
+        result = self._save_object(compressed, 10, headers)
+        self.assertEqual(result, (False, None))
+
+        # Not compressed
+        result = self._save_object(data, len(data))
+        self.assertEqual(result, (True, data))
+
+    def test__read_object_data(self):
+        data = b('foo bar ') * 1000
+        compressed = zlib.compress(data)
+        response = FakeHTTPResponse(compressed,
+                                    {'content-encoding': 'deflate'})
+        self.driver1.decompress_downloads = True
+
+        result = self.driver1._read_object_data(response=response,
+                                                chunk_size=100)
+        self.assertEqual(b('').join(result), data)
+
+
+class FakeHTTPResponse(object):
+    def __init__(self, data, headers):
+        self.headers = headers
+
+        if PY3:
+            from io import BytesIO
+            self._stream = BytesIO(data)
+        else:
+            self._stream = StringIO(data)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        data = self._stream.read(100)
+
+        if not data:
+            raise StopIteration
+
+        return data
+
+    next = __next__
+
+    def getheader(self, name, default=None):
+        return self.headers.get(name.lower(), default)
+
+
+class FakeHTTPConnection(object):
+    def __init__(self, sock):
+        self.sock = sock
+        self.send_called = 0
+
+    def send(self, data):
+        self.send_called += 1
+        self.sock.sendall(data)
+
+
+class FakeLoggingHTTPConnection(FakeHTTPConnection, LoggingConnection):
+    pass
+
+
+class FakeRawResponse(object):
+    def __init__(self, connection, secure):
+        self.connection = Mock()
+        self.connection.connection = connection
+        self.connection.secure = secure
+
+
+class RangeResponse(object):
+    def __init__(self, status, data):
+        self.status = status
+        self.response = StringIO(data)
+
 if __name__ == '__main__':
     sys.exit(unittest.main())
@@ -17,8 +17,11 @@ import hmac
 import os
 import os.path                          # pylint: disable-msg=W0404
 import math
+import socket
 import sys
 import copy
+import json
+import tempfile
 import unittest
 
 import mock
@@ -33,7 +36,7 @@ if PY3:
     from io import FileIO as file
 
 from libcloud.common.types import LibcloudError, MalformedResponseError
-from libcloud.storage.base import Container, Object
+from libcloud.storage.base import Container, Object, CompactObject
 from libcloud.storage.types import ContainerAlreadyExistsError
 from libcloud.storage.types import ContainerDoesNotExistError
 from libcloud.storage.types import ContainerIsNotEmptyError
@@ -160,6 +163,21 @@ class CloudFilesTests(unittest.TestCase):
         self.assertEqual(obj.size, 1160520)
         self.assertEqual(obj.container.name, 'test_container')
 
+    def test_list_container_objects_compact(self):
+        CloudFilesMockHttp.type = None
+        self.driver.objectCls = CompactObject
+        container = Container(
+            name='test_container', extra={}, driver=self.driver)
+        objects = self.driver.list_container_objects(container=container)
+        self.assertEqual(len(objects), 4)
+
+        obj = [o for o in objects if o.name == 'foo test 1'][0]
+        self.assertTrue(isinstance(obj, CompactObject))
+        self.assertEqual(obj.hash, '16265549b5bda64ecdaa5156de4c97cc')
+        self.assertEqual(obj.size, 1160520)
+        self.assertEqual(obj.meta_data, {})
+        self.assertTrue('content_type' in obj.extra)
+
     def test_list_container_objects_iterator(self):
         CloudFilesMockHttp.type = 'ITERATOR'
         container = Container(
@@ -172,6 +190,28 @@ class CloudFilesTests(unittest.TestCase):
         self.assertEqual(obj.size, 1160520)
         self.assertEqual(obj.container.name, 'test_container')
 
+    def test_list_container_objects_dont_keep_pages(self):
+        CloudFilesMockHttp.type = 'ITERATOR'
+        container = Container(
+            name='test_container', extra={}, driver=self.driver)
+        objects = self.driver.list_container_objects(container=container,
+                                                     ex_keep_pages=False)
+
+        self.assertEqual(len([obj for obj in objects]), 5)
+        # Retrieved objects are not stored by the list
+        self.assertEqual(objects._data, [])
+
+    def test_list_container_objects_delimiter(self):
+        CloudFilesMockHttp.type = 'DELIMITER'
+        container = Container(
+            name='test_container', extra={}, driver=self.driver)
+        objects = container.list_objects(ex_delimiter='/', ex_page_size=10)
+
+        self.assertEqual([o.name for o in objects], ['a.txt', 'logs/'])
+        self.assertFalse(objects[0].extra.get('is_directory', False))
+        self.assertTrue(objects[1].extra['is_directory'])
+        self.assertEqual(objects[1].size, 0)
+
     def test_get_container(self):
         container = self.driver.get_container(container_name='test_container')
         self.assertEqual(container.name, 'test_container')
@@ -273,6 +313,47 @@ class CloudFilesTests(unittest.TestCase):
         else:
             self.fail('Container is not empty but an exception was not thrown')
 
+    def test_download_object_ranged(self):
+        container = Container(name='foo_bar_container', extra={},
+                              driver=self.driver)
+        obj = Object(name='foo_bar_object', size=1000, hash=None, extra={},
+                     container=container, meta_data=None,
+                     driver=self.driver)
+        calls = []
+
+        def request(action, **kwargs):
+            calls.append((action, kwargs))
+            return 'response'
+
+        def download_object_ranged(**kwargs):
+            calls.append(kwargs)
+            return True
+
+        old_request = self.driver.connection.request
+        self.driver.connection.request = request
+        self.driver._download_object_ranged = download_object_ranged
+
+        try:
+            response = self.driver._get_object_range(obj=obj, start_bytes=100,
+                                                     end_bytes=200)
+            result = self.driver.download_object(obj=obj,
+                                                 destination_path='/tmp/a',
+                                                 ranged=True)
+        finally:
+            self.driver.connection.request = old_request
+
+        self.assertTrue(self.driver.supports_ranged_download)
+        self.assertEqual(response, 'response')
+        self.assertTrue(result)
+
+        action, kwargs = calls[0]
+        self.assertTrue(action.endswith('/foo_bar_container/foo_bar_object'))
+        self.assertEqual(kwargs['method'], 'GET')
+        self.assertEqual(kwargs['headers'], {'Range': 'bytes=100-199'})
+        self.assertTrue(kwargs['raw'])
+        self.assertEqual(calls[1]['obj'], obj)
+        self.assertEqual(calls[1]['destination_path'], '/tmp/a')
+
     def test_download_object_success(self):
         container = Container(name='foo_bar_container', extra={}, driver=self)
         obj = Object(name='foo_bar_object', size=1000, hash=None, extra={},
@@ -422,8 +503,8 @@ class CloudFilesTests(unittest.TestCase):
         def dummy_content_type(name):
             return 'application/zip', None
 
-        def send(instance):
-            raise Exception('')
+        def send(instance, data):
+            raise socket.timeout('')
 
         old_func1 = libcloud.utils.files.guess_file_mime_type
         libcloud.utils.files.guess_file_mime_type = dummy_content_type
@@ -556,6 +637,96 @@ class CloudFilesTests(unittest.TestCase):
         self.assertEqual(mocked__upload_object_part.call_count, parts)
         self.assertTrue(mocked__upload_object_manifest.call_count, 1)
 
+    def _create_segmented_file(self, segment_size, segment_count):
+        fd, file_path = tempfile.mkstemp()
+
+        fp = os.fdopen(fd, 'wb')
+        for index in range(segment_count):
+            fp.write(b(str(index) * segment_size))
+        fp.close()
+
+        return file_path
+
+    def _segment_listing_entry(self, index, data):
+        hash_function = self.driver._get_hash_function()
+        hash_function.update(b(data))
+        return {'name': 'foo_test_upload/%08d' % (index),
+                'bytes': len(data), 'hash': hash_function.hexdigest(),
+                'content_type': 'application/octet-stream',
+                'last_modified': '2013-01-01T00:00:00.000000'}
+
+    @mock.patch.object(CloudFilesStorageDriver, 'delete_object')
+    @mock.patch.object(CloudFilesStorageDriver, '_upload_object_manifest')
+    @mock.patch.object(CloudFilesStorageDriver, '_upload_object_part')
+    def test_ex_multipart_upload_object_resume(self, upload_part,
+                                              upload_manifest,
+                                              delete_object):
+        upload_part.return_value = 'test_part'
+        upload_manifest.return_value = 'test_manifest'
+
+        # Segment 0 and 2 are up to date, 1 is corrupted, 3 and 4 are
+        # missing and 5 is left over from a larger upload
+        CloudFilesMockHttp.type = 'SEGMENTS'
+        CloudFilesMockHttp.segments = [
+            self._segment_listing_entry(0, '0' * 100),
+            self._segment_listing_entry(1, 'x' * 100),
+            self._segment_listing_entry(2, '2' * 100),
+            self._segment_listing_entry(5, '5' * 100)]
+
+        container = Container(name='foo_bar_container', extra={},
+                              driver=self.driver)
+        file_path = self._create_segmented_file(segment_size=100,
+                                                segment_count=5)
+
+        try:
+            obj = self.driver.ex_multipart_upload_object(
+                file_path=file_path, container=container,
+                object_name='foo_test_upload', chunk_size=100,
+                concurrency=3, resume=True)
+        finally:
+            os.remove(file_path)
+
+        self.assertEqual(obj, 'test_manifest')
+
+        uploaded = sorted([kwargs['part_number'] for _, kwargs in
+                           upload_part.call_args_list])
+        self.assertEqual(uploaded, [1, 3, 4])
+
+        self.assertEqual(delete_object.call_count, 1)
+        self.assertEqual(delete_object.call_args[0][0].name,
+                         'foo_test_upload/00000005')
+        self.assertEqual(upload_manifest.call_count, 1)
+
+    @mock.patch.object(CloudFilesStorageDriver, '_upload_object_manifest')
+    @mock.patch.object(CloudFilesStorageDriver, '_upload_object_part')
+    def test_ex_multipart_upload_object_segment_failure(self, upload_part,
+                                                        upload_manifest):
+        def side_effect(**kwargs):
+            if kwargs['part_number'] == 2:
+                raise LibcloudError('segment upload failed')
+            return 'test_part'
+
+        upload_part.side_effect = side_effect
+
+        container = Container(name='foo_bar_container', extra={},
+                              driver=self.driver)
+        file_path = self._create_segmented_file(segment_size=100,
+                                                segment_count=4)
+
+        try:
+            self.assertRaises(LibcloudError,
+                              self.driver.ex_multipart_upload_object,
+                              file_path=file_path, container=container,
+                              object_name='foo_test_upload', chunk_size=100,
+                              retries=1, retry_delay=0)
+        finally:
+            os.remove(file_path)
+
+        # Failed segment is retried and the other segments are still
+        # uploaded, but the manifest is never written
+        self.assertEqual(upload_part.call_count, 5)
+        self.assertFalse(upload_manifest.called)
+
     def test__upload_object_part(self):
         _put_object = CloudFilesStorageDriver._put_object
         mocked__put_object = mock.Mock(return_value="test")
@@ -789,6 +960,20 @@ class CloudFilesMockHttp(StorageMockHttp):
 
         return (status_code, body, headers, httplib.responses[httplib.OK])
 
+    def _v1_MossoCloudFS_test_container_DELIMITER(self, method, url, body,
+                                                  headers):
+        headers = copy.deepcopy(self.base_headers)
+
+        # A short page means there are no more objects so a request with a
+        # marker should never be sent
+        if url.find('marker') != -1 or url.find('delimiter=%2F') == -1 or \
+           url.find('limit=10') == -1:
+            return (httplib.BAD_REQUEST, '', headers,
+                    httplib.responses[httplib.BAD_REQUEST])
+
+        body = self.fixtures.load('list_container_objects_delimiter.json')
+        return (httplib.OK, body, headers, httplib.responses[httplib.OK])
+
     def _v1_MossoCloudFS_test_container_not_found(
         self, method, url, body, headers):
         # test_get_container_not_found
@@ -850,6 +1035,18 @@ class CloudFilesMockHttp(StorageMockHttp):
             status_code = httplib.ACCEPTED
         return (status_code, body, headers, httplib.responses[httplib.OK])
 
+    def _v1_MossoCloudFS_foo_bar_container_SEGMENTS(
+        self, method, url, body, headers):
+        # test_ex_multipart_upload_object_resume
+        if url.find('marker') == -1:
+            body = json.dumps(self.segments)
+            status_code = httplib.OK
+        else:
+            body = ''
+            status_code = httplib.NO_CONTENT
+        return (status_code, body, self.base_headers,
+                httplib.responses[httplib.OK])
+
     def _v1_MossoCloudFS_foo_bar_container_NOT_FOUND(
         self, method, url, body, headers):
 
@@ -15,13 +15,18 @@
 
 import os
 import sys
+import base64
+import hashlib
 import unittest
 
+from xml.etree import ElementTree as ET
+
 from libcloud.utils.py3 import httplib
+from libcloud.utils.py3 import b
 
 from libcloud.common.types import InvalidCredsError
 from libcloud.common.types import LibcloudError
-from libcloud.storage.base import Container, Object
+from libcloud.storage.base import Container, Object, CompactObject
 from libcloud.storage.types import ContainerDoesNotExistError
 from libcloud.storage.types import ContainerIsNotEmptyError
 from libcloud.storage.types import InvalidContainerNameError
@@ -31,6 +36,7 @@ from libcloud.storage.drivers.s3 import S3StorageDriver, S3USWestStorageDriver
 from libcloud.storage.drivers.s3 import S3EUWestStorageDriver
 from libcloud.storage.drivers.s3 import S3APSEStorageDriver
 from libcloud.storage.drivers.s3 import S3APNEStorageDriver
+from libcloud.storage.drivers import s3
 from libcloud.storage.drivers.dummy import DummyIterator
 
 from libcloud.test import StorageMockHttp, MockRawResponse # pylint: disable-msg=E0611
@@ -42,6 +48,8 @@ class S3MockHttp(StorageMockHttp):
 
     fixtures = StorageFileFixtures('s3')
     base_headers = {}
+    multipart_requests = []
+    failing_parts = []
 
     def _UNAUTHORIZED(self, method, url, body, headers):
         return (httplib.UNAUTHORIZED,
@@ -96,6 +104,21 @@ class S3MockHttp(StorageMockHttp):
                 self.base_headers,
                 httplib.responses[httplib.OK])
 
+    def _test_container_PREFIX(self, method, url, body, headers):
+        if url.find('prefix=logs') != -1:
+            file_name = 'list_container_objects_prefix_logs.xml'
+        elif url.find('prefix=photos') != -1:
+            file_name = 'list_container_objects_prefix_photos.xml'
+        else:
+            assert url.find('delimiter=%2F') != -1
+            file_name = 'list_container_objects_delimiter.xml'
+
+        body = self.fixtures.load(file_name)
+        return (httplib.OK,
+                body,
+                self.base_headers,
+                httplib.responses[httplib.OK])
+
     def _test2_test_list_containers(self, method, url, body, headers):
         # test_get_object
         body = self.fixtures.load('list_containers.xml')
@@ -111,6 +134,41 @@ class S3MockHttp(StorageMockHttp):
                 headers,
                 httplib.responses[httplib.OK])
 
+    def _test1(self, method, url, body, headers):
+        # test_get_container_success
+        return (httplib.OK,
+                '',
+                self.base_headers,
+                httplib.responses[httplib.OK])
+
+    def _container1(self, method, url, body, headers):
+        # test_get_container_doesnt_exist
+        return (httplib.NOT_FOUND,
+                '',
+                self.base_headers,
+                httplib.responses[httplib.NOT_FOUND])
+
+    def _test_inexistent_test(self, method, url, body, headers):
+        # test_get_object_container_doesnt_exist
+        return (httplib.NOT_FOUND,
+                '',
+                self.base_headers,
+                httplib.responses[httplib.NOT_FOUND])
+
+    def _test_inexistent(self, method, url, body, headers):
+        # test_get_object_container_doesnt_exist
+        return (httplib.NOT_FOUND,
+                '',
+                self.base_headers,
+                httplib.responses[httplib.NOT_FOUND])
+
+    def _test1_test(self, method, url, body, headers):
+        # test_get_object_doesnt_exist
+        return (httplib.NOT_FOUND,
+                '',
+                self.base_headers,
+                httplib.responses[httplib.NOT_FOUND])
+
     def _new_container_INVALID_NAME(self, method, url, body, headers):
         # test_create_container
         return (httplib.BAD_REQUEST,
@@ -182,6 +240,52 @@ class S3MockHttp(StorageMockHttp):
                 httplib.responses[httplib.OK])
 
 
+    def _foo_bar_container_foo_test_multipart(self, method, url, body,
+                                              headers):
+        # test_ex_multipart_upload_object
+        self.multipart_requests.append((method, url, body))
+
+        if method == 'POST' and url.find('?uploads') != -1:
+            body = self.fixtures.load('initiate_multipart_upload.xml')
+            return (httplib.OK, body, {}, httplib.responses[httplib.OK])
+        elif method == 'PUT':
+            data_hash = hashlib.md5(b(body))
+            content_md5 = base64.b64encode(data_hash.digest()).decode('utf-8')
+
+            if headers['Content-MD5'] != content_md5:
+                return (httplib.BAD_REQUEST, '', {},
+                        httplib.responses[httplib.BAD_REQUEST])
+
+            part_number = int(url.split('partNumber=')[1].split('&')[0])
+
+            if part_number in self.failing_parts:
+                self.failing_parts.remove(part_number)
+                return (httplib.INTERNAL_SERVER_ERROR, '', {},
+                        httplib.responses[httplib.INTERNAL_SERVER_ERROR])
+
+            if self.type == 'INVALID_HASH':
+                etag = 'invalid'
+            else:
+                etag = data_hash.hexdigest()
+
+            return (httplib.OK, '', {'etag': '"%s"' % (etag)},
+                    httplib.responses[httplib.OK])
+        elif method == 'POST':
+            if self.type == 'EMPTY_COMPLETE':
+                body = ''
+            else:
+                body = self.fixtures.load('complete_multipart_upload.xml')
+            return (httplib.OK, body, {}, httplib.responses[httplib.OK])
+        elif method == 'DELETE':
+            return (httplib.NO_CONTENT, '', {},
+                    httplib.responses[httplib.NO_CONTENT])
+
+    _foo_bar_container_foo_test_multipart_INVALID_HASH = \
+        _foo_bar_container_foo_test_multipart
+    _foo_bar_container_foo_test_multipart_EMPTY_COMPLETE = \
+        _foo_bar_container_foo_test_multipart
+
+
 class S3MockRawResponse(MockRawResponse):
 
     fixtures = StorageFileFixtures('s3')
@@ -326,6 +430,22 @@ class S3Tests(unittest.TestCase):
         self.assertEqual(obj.container.name, 'test_container')
         self.assertTrue('owner' in obj.meta_data)
 
+    def test_list_container_objects_compact(self):
+        self.mock_response_klass.type = None
+        self.driver.objectCls = CompactObject
+        container = Container(name='test_container', extra={},
+                              driver=self.driver)
+        objects = self.driver.list_container_objects(container=container)
+        self.assertEqual(len(objects), 1)
+
+        obj = objects[0]
+        self.assertTrue(isinstance(obj, CompactObject))
+        self.assertEqual(obj.name, '1.zip')
+        self.assertEqual(obj.hash, '4397da7a7649e8085de9916c240e8166')
+        self.assertEqual(obj.size, 1234567)
+        self.assertEqual(obj.extra, {})
+        self.assertTrue('owner' in obj.meta_data)
+
     def test_list_container_objects_iterator_has_more(self):
         self.mock_response_klass.type = 'ITERATOR'
         container = Container(name='test_container', extra={},
@@ -340,8 +460,77 @@ class S3Tests(unittest.TestCase):
         self.assertTrue(obj in objects)
         self.assertEqual(len(objects), 5)
 
-    def test_get_container_doesnt_exist(self):
+    def test_only_listing_responses_are_streamed(self):
         self.mock_response_klass.type = 'list_containers'
+        self.driver.list_containers()
+        self.assertEqual(self.driver.connection.context, {})
+
+        # Raw body is still available to the other requests
+        response = self.driver.connection.request('/')
+        self.assertTrue(response.body.find('<Bucket>') != -1)
+
+    def test_list_container_objects_dont_keep_pages(self):
+        self.mock_response_klass.type = 'ITERATOR'
+        container = Container(name='test_container', extra={},
+                              driver=self.driver)
+        objects = self.driver.list_container_objects(container=container,
+                                                     ex_keep_pages=False)
+
+        self.assertEqual(len([obj for obj in objects]), 5)
+        # Retrieved objects are not stored by the list
+        self.assertEqual(objects._data, [])
+
+    def test_list_container_objects_prefix_and_delimiter(self):
+        self.mock_response_klass.type = 'PREFIX'
+        container = Container(name='test_container', extra={},
+                              driver=self.driver)
+
+        objects = self.driver.list_container_objects(container=container,
+                                                     ex_delimiter='/',
+                                                     ex_page_size=100)
+        self.assertEqual([o.name for o in objects],
+                         ['a.txt', 'logs/', 'photos/'])
+        self.assertFalse(objects[0].extra.get('is_directory', False))
+        self.assertTrue(objects[1].extra['is_directory'])
+        self.assertTrue(objects[2].extra['is_directory'])
+
+        objects = container.list_objects(ex_prefix='logs/')
+        self.assertEqual([o.name for o in objects],
+                         ['logs/1.log', 'logs/2.log'])
+
+    def test_list_container_objects_delimiter_compact(self):
+        self.mock_response_klass.type = 'PREFIX'
+        self.driver.objectCls = CompactObject
+        container = Container(name='test_container', extra={},
+                              driver=self.driver)
+
+        objects = self.driver.list_container_objects(container=container,
+                                                     ex_delimiter='/')
+        self.assertEqual([o.name for o in objects],
+                         ['a.txt', 'logs/', 'photos/'])
+
+        for obj in objects:
+            self.assertTrue(isinstance(obj, CompactObject))
+
+        self.assertTrue(objects[1].extra['is_directory'])
+
+    def test_list_container_objects_parallel(self):
+        self.mock_response_klass.type = 'PREFIX'
+        container = Container(name='test_container', extra={},
+                              driver=self.driver)
+
+        objects = self.driver.list_container_objects_parallel(
+            container=container, concurrency=2)
+        self.assertEqual(sorted([o.name for o in objects]),
+                         ['a.txt', 'logs/1.log', 'logs/2.log',
+                          'photos/1.jpg'])
+
+        objects = self.driver.list_container_objects_parallel(
+            container=container, prefixes=['photos/'])
+        self.assertEqual([o.name for o in objects], ['photos/1.jpg'])
+
+    def test_get_container_doesnt_exist(self):
+        self.mock_response_klass.type = None
         try:
             self.driver.get_container(container_name='container1')
         except ContainerDoesNotExistError:
@@ -350,14 +539,54 @@ class S3Tests(unittest.TestCase):
             self.fail('Exception was not thrown')
 
     def test_get_container_success(self):
+        self.mock_response_klass.type = None
+        container = self.driver.get_container(container_name='test1')
+        self.assertEqual(container.name, 'test1')
+
+        # Container is cached so no request is made (there is no mock method
+        # for this type)
+        self.mock_response_klass.type = 'NOT_CACHED'
+        cached = self.driver.get_container(container_name='test1')
+        self.assertTrue(cached is container)
+
+        self.driver._container_cache.clear()
+        self.assertRaises(AttributeError, self.driver.get_container,
+                          container_name='test1')
+
+    def test_get_container_after_list_containers(self):
         self.mock_response_klass.type = 'list_containers'
+        self.driver.list_containers()
+
+        self.mock_response_klass.type = 'NOT_CACHED'
+        container = self.driver.get_container(container_name='test1')
+        self.assertEqual(container.name, 'test1')
+        self.assertTrue('creation_date' in container.extra)
+
+    def test_delete_container_invalidates_cache(self):
+        self.mock_response_klass.type = None
         container = self.driver.get_container(container_name='test1')
-        self.assertTrue(container.name, 'test1')
+        self.driver._container_cache.set('foo_bar_container', container)
+
+        container = Container(name='foo_bar_container', extra={},
+                              driver=self.driver)
+        self.assertTrue(self.driver.delete_container(container=container))
+        self.assertFalse('foo_bar_container' in self.driver._container_cache)
+        self.assertTrue('test1' in self.driver._container_cache)
+
+    def test_get_object_doesnt_exist(self):
+        self.mock_response_klass.type = None
+        try:
+            self.driver.get_object(container_name='test1',
+                                   object_name='test')
+        except ObjectDoesNotExistError:
+            pass
+        else:
+            self.fail('Exception was not thrown')
 
     def test_get_object_container_doesnt_exist(self):
         # This method makes two requests which makes mocking the response a bit
         # trickier
-        self.mock_response_klass.type = 'list_containers'
+        self.mock_response_klass.type = None
         try:
             self.driver.get_object(container_name='test-inexistent',
                                    object_name='test')
@@ -367,8 +596,7 @@ class S3Tests(unittest.TestCase):
             self.fail('Exception was not thrown')
 
     def test_get_object_success(self):
-        # This method makes two requests which makes mocking the response a bit
-        # trickier
+        # The container is not retrieved separately if the object exists
         self.mock_response_klass.type = 'list_containers'
         obj = self.driver.get_object(container_name='test2',
                                      object_name='test')
@@ -452,6 +680,47 @@ class S3Tests(unittest.TestCase):
                               driver=self.driver)
         self.assertTrue(self.driver.delete_container(container=container))
 
+    def test_download_object_ranged(self):
+        container = Container(name='foo_bar_container', extra={},
+                              driver=self.driver)
+        obj = Object(name='foo_bar_object', size=1000, hash=None, extra={},
+                     container=container, meta_data=None,
+                     driver=self.driver)
+        calls = []
+
+        def request(action, **kwargs):
+            calls.append((action, kwargs))
+            return 'response'
+
+        def download_object_ranged(**kwargs):
+            calls.append(kwargs)
+            return True
+
+        old_request = self.driver.connection.request
+        self.driver.connection.request = request
+        self.driver._download_object_ranged = download_object_ranged
+
+        try:
+            response = self.driver._get_object_range(obj=obj, start_bytes=100,
+                                                     end_bytes=200)
+            result = self.driver.download_object(obj=obj,
+                                                 destination_path='/tmp/a',
+                                                 ranged=True)
+        finally:
+            self.driver.connection.request = old_request
+
+        self.assertTrue(self.driver.supports_ranged_download)
+        self.assertEqual(response, 'response')
+        self.assertTrue(result)
+
+        action, kwargs = calls[0]
+        self.assertTrue(action.endswith('/foo_bar_container/foo_bar_object'))
+        self.assertEqual(kwargs['method'], 'GET')
+        self.assertEqual(kwargs['headers'], {'Range': 'bytes=100-199'})
+        self.assertTrue(kwargs['raw'])
+        self.assertEqual(calls[1]['obj'], obj)
+        self.assertEqual(calls[1]['destination_path'], '/tmp/a')
+
     def test_download_object_success(self):
         container = Container(name='foo_bar_container', extra={},
                               driver=self.driver)
@@ -617,6 +886,119 @@ class S3Tests(unittest.TestCase):
         self.assertEqual(obj.name, object_name)
         self.assertEqual(obj.size, 3)
 
+    def _multipart_upload(self, **kwargs):
+        old_min_part_size = s3.MULTIPART_MIN_PART_SIZE
+        s3.MULTIPART_MIN_PART_SIZE = 1
+        container = Container(name='foo_bar_container', extra={},
+                              driver=self.driver)
+
+        try:
+            return self.driver.ex_multipart_upload_object(
+                file_path=os.path.abspath(__file__), container=container,
+                object_name='foo_test_multipart', part_size=1024,
+                concurrency=4, retry_delay=0, **kwargs)
+        finally:
+            s3.MULTIPART_MIN_PART_SIZE = old_min_part_size
+
+    def test_ex_multipart_upload_object(self):
+        self.mock_response_klass.multipart_requests = requests = []
+        self.mock_response_klass.failing_parts = [2, 5]
+
+        if not self.driver.supports_s3_multipart_upload:
+            self.assertRaises(LibcloudError, self._multipart_upload)
+            return
+
+        file_size = os.path.getsize(os.path.abspath(__file__))
+        part_count = (file_size + 1023) // 1024
+        obj = self._multipart_upload(extra={'meta_data': {'foo': 'bar'}})
+
+        self.assertEqual(obj.name, 'foo_test_multipart')
+        self.assertEqual(obj.size, file_size)
+        self.assertEqual(obj.hash, '3858f62230ac3c915f300c664312c11f-9')
+        self.assertEqual(obj.meta_data, {'foo': 'bar'})
+
+        methods = [request[0] for request in requests]
+        # Failed parts have been retried
+        self.assertEqual(methods.count('PUT'), part_count + 2)
+        self.assertEqual(methods.count('POST'), 2)
+        self.assertFalse('DELETE' in methods)
+
+        # Parts are listed in order when completing the upload
+        complete = ET.XML(requests[-1][2])
+        part_numbers = [int(part.findtext('PartNumber'))
+                        for part in complete.findall('Part')]
+        self.assertEqual(part_numbers, list(range(1, part_count + 1)))
+
+    def test_ex_multipart_upload_object_invalid_hash_aborts_upload(self):
+        if not self.driver.supports_s3_multipart_upload:
+            return
+
+        self.mock_response_klass.type = 'INVALID_HASH'
+        self.mock_response_klass.multipart_requests = requests = []
+        self.mock_response_klass.failing_parts = []
+
+        try:
+            self._multipart_upload(retries=0)
+        except ObjectHashMismatchError:
+            pass
+        else:
+            self.fail('Exception was not thrown')
+
+        methods = [request[0] for request in requests]
+        self.assertEqual(methods[-1], 'DELETE')
+        self.assertEqual(methods.count('POST'), 1)
+
+    def test_ex_multipart_upload_object_empty_complete_response(self):
+        if not self.driver.supports_s3_multipart_upload:
+            return
+
+        self.mock_response_klass.type = 'EMPTY_COMPLETE'
+        self.mock_response_klass.multipart_requests = []
+        self.mock_response_klass.failing_parts = []
+
+        try:
+            self._multipart_upload(retries=0)
+        except LibcloudError:
+            e = sys.exc_info()[1]
+            self.assertTrue(str(e).find('complete multipart upload') != -1)
+        else:
+            self.fail('Exception was not thrown')
+
+    def test_ex_multipart_upload_object_part_size_too_small(self):
+        container = Container(name='foo_bar_container', extra={},
+                              driver=self.driver)
+        self.assertRaises(Exception,
+                          self.driver.ex_multipart_upload_object,
+                          file_path=os.path.abspath(__file__),
+                          container=container,
+                          object_name='foo_test_multipart', part_size=1024)
+
+    def test_ex_multipart_upload_object_via_stream(self):
+        if not self.driver.supports_s3_multipart_upload:
+            return
+
+        self.mock_response_klass.multipart_requests = requests = []
+        self.mock_response_klass.failing_parts = []
+        old_min_part_size = s3.MULTIPART_MIN_PART_SIZE
+        s3.MULTIPART_MIN_PART_SIZE = 1
+        container = Container(name='foo_bar_container', extra={},
+                              driver=self.driver)
+        iterator = DummyIterator(data=['a' * 300] * 10)
+
+        try:
+            obj = self.driver.ex_multipart_upload_object_via_stream(
+                iterator=iterator, container=container,
+                object_name='foo_test_multipart',
+                extra={'content_type': 'text/plain'}, part_size=1024)
+        finally:
+            s3.MULTIPART_MIN_PART_SIZE = old_min_part_size
+
+        self.assertEqual(obj.size, 3000)
+        part_sizes = [len(request[2]) for request in requests
+                      if request[0] == 'PUT']
+        part_sizes.sort()
+        self.assertEqual(part_sizes, [952, 1024, 1024])
+
     def test_delete_object_not_found(self):
         self.mock_response_klass.type = 'NOT_FOUND'
         container = Container(name='foo_bar_container', extra={},
@@ -639,6 +1021,20 @@ class S3Tests(unittest.TestCase):
         result = self.driver.delete_object(obj=obj)
         self.assertTrue(result)
 
+    def test_delete_objects(self):
+        container = Container(name='foo_bar_container', extra={},
+                              driver=self.driver)
+        objs = [Object(name='foo_bar_object', size=1234, hash=None,
+                       extra=None, meta_data=None, container=container,
+                       driver=self.driver) for _ in range(10)]
+
+        results = list(self.driver.delete_objects(objs=objs, concurrency=4))
+        self.assertEqual(len(results), 10)
+
+        for obj, result, error in results:
+            self.assertTrue(result)
+            self.assertEqual(error, None)
+
 
 class S3USWestTests(S3Tests):
     driver_type = S3USWestStorageDriver
@@ -0,0 +1,357 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+import time
+import socket
+import threading
+import unittest
+
+from libcloud.utils.py3 import PY3
+from libcloud.utils.py3 import httplib
+from libcloud.utils.py3 import b
+
+if PY3:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+else:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+
+from libcloud.common.base import Connection, ConnectionPool
+from libcloud.test import StorageMockHttp, MockRawResponse
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        self.server.connections += 1
+
+    def do_GET(self):
+        body = b('ok')
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+        if self.server.close_after_response:
+            # Silently close the connection without sending
+            # "Connection: close" header
+            self.close_connection = 1
+
+    def do_POST(self):
+        self.server.posts += 1
+        self.rfile.read(int(self.headers['Content-Length']))
+        # Connection is closed after the request has been received, but
+        # before a response has been sent
+        self.close_connection = 1
+
+    def log_message(self, *args):
+        pass
+
+
+class KeepAliveServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    connections = 0
+    posts = 0
+    close_after_response = False
+
+
+class MockDriver(object):
+    name = 'Mock'
+
+
+class ConnectionPoolingTests(unittest.TestCase):
+    def setUp(self):
+        self.server = KeepAliveServer(('127.0.0.1', 0), KeepAliveHandler)
+        self.port = self.server.server_address[1]
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.setDaemon(True)
+        thread.start()
+
+        self.pool = ConnectionPool(max_idle=2, idle_timeout=60)
+
+    def tearDown(self):
+        self.pool.clear()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _get_connection(self, pool=None):
+        connection = Connection(secure=False, host='127.0.0.1',
+                                port=self.port)
+        connection.pool = pool
+        connection.driver = MockDriver()
+        return connection
+
+    def test_connection_is_not_reused_without_pool(self):
+        connection = self._get_connection()
+
+        for _ in range(3):
+            response = connection.request('/')
+            self.assertEqual(response.body, 'ok')
+
+        self.assertEqual(self.server.connections, 3)
+
+    def test_connection_is_reused_across_requests(self):
+        connection = self._get_connection(pool=self.pool)
+
+        for _ in range(5):
+            response = connection.request('/')
+            self.assertEqual(response.body, 'ok')
+
+        self.assertEqual(self.server.connections, 1)
+
+    def test_connection_is_shared_between_connection_instances(self):
+        connection1 = self._get_connection(pool=self.pool)
+        connection2 = self._get_connection(pool=self.pool)
+
+        connection1.request('/')
+        connection2.request('/')
+        connection1.request('/')
+
+        self.assertEqual(self.server.connections, 1)
+
+    def test_raw_request_connection_is_released_on_next_request(self):
+        connection = self._get_connection(pool=self.pool)
+
+        response = connection.request('/', raw=True)
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.response.read(), b('ok'))
+
+        response = connection.request('/')
+        self.assertEqual(response.body, 'ok')
+        self.assertEqual(self.server.connections, 1)
+
+    def test_raw_response_is_not_disturbed_by_next_request(self):
+        connection = self._get_connection(pool=self.pool)
+
+        raw_response = connection.request('/', raw=True)
+        self.assertEqual(raw_response.status, 200)
+
+        # Body of the raw response hasn't been read yet so its connection
+        # can't be used for this request
+        response = connection.request('/')
+        self.assertEqual(response.body, 'ok')
+        self.assertEqual(self.server.connections, 2)
+
+        self.assertEqual(raw_response.response.read(), b('ok'))
+
+        # Both the connections are back in the pool now
+        connection.request('/')
+        connection.request('/')
+        self.assertEqual(self.server.connections, 2)
+
+    def test_non_idempotent_request_is_not_retried(self):
+        connection = self._get_connection(pool=self.pool)
+        connection.request('/')
+        # Make sure the request is sent over the re-used connection
+        self.pool._is_connection_dropped = lambda connection: False
+
+        self.assertRaises((socket.error, httplib.HTTPException),
+                          connection.request, '/', data='data',
+                          method='POST')
+        self.assertEqual(self.server.posts, 1)
+
+    def test_timeout_is_not_retried(self):
+        connection = self._get_connection(pool=self.pool)
+        connection._connection_reused = True
+        self.assertEqual(connection._should_retry('GET', socket.timeout()),
+                         False)
+        self.assertEqual(connection._should_retry('GET', socket.error()),
+                         True)
+
+    def test_stale_connection_is_transparently_replaced(self):
+        self.server.close_after_response = True
+        # Pretend the closed connection still looks healthy so the request
+        # fails on the stale socket
+        self.pool._is_connection_dropped = lambda connection: False
+
+        connection = self._get_connection(pool=self.pool)
+
+        for _ in range(3):
+            response = connection.request('/')
+            self.assertEqual(response.body, 'ok')
+
+        self.assertEqual(self.server.connections, 3)
+
+    def test_dropped_connection_is_not_handed_out(self):
+        self.server.close_after_response = True
+        connection = self._get_connection(pool=self.pool)
+
+        for _ in range(3):
+            response = connection.request('/')
+            self.assertEqual(response.body, 'ok')
+
+        self.assertEqual(self.server.connections, 3)
+
+
+class FakeConnection(object):
+    def __init__(self):
+        self.sock, self.remote = socket.socketpair()
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+        self.sock.close()
+        self.remote.close()
+
+
+class ConnectionPoolTests(unittest.TestCase):
+    def test_get_empty_pool(self):
+        pool = ConnectionPool()
+        self.assertEqual(pool.get('key'), None)
+
+    def test_release_and_get(self):
+        pool = ConnectionPool()
+        connection = FakeConnection()
+
+        pool.release('key', connection)
+        self.assertEqual(pool.get('other'), None)
+        self.assertEqual(pool.get('key'), connection)
+        self.assertEqual(pool.get('key'), None)
+        connection.close()
+
+    def test_max_idle(self):
+        pool = ConnectionPool(max_idle=2)
+        connections = [FakeConnection() for _ in range(3)]
+
+        for connection in connections:
+            pool.release('key', connection)
+
+        self.assertTrue(connections[0].closed)
+        self.assertFalse(connections[1].closed)
+        self.assertFalse(connections[2].closed)
+        pool.clear()
+        self.assertTrue(connections[2].closed)
+
+    def test_idle_timeout(self):
+        pool = ConnectionPool(idle_timeout=-1)
+        connection = FakeConnection()
+
+        pool.release('key', connection)
+        self.assertEqual(pool.get('key'), None)
+        self.assertTrue(connection.closed)
+
+    def test_connection_closed_by_remote_end_is_discarded(self):
+        pool = ConnectionPool()
+        connection = FakeConnection()
+
+        pool.release('key', connection)
+        connection.remote.close()
+        self.assertEqual(pool.get('key'), None)
+        self.assertTrue(connection.closed)
+
+
+class ThreadedMockHttp(StorageMockHttp):
+    def _echo(self, method, url, body, headers):
+        # Give other threads a chance to run in the middle of a request
+        time.sleep(0.001)
+        return (httplib.OK, '%s %s' % (method, url), {},
+                httplib.responses[httplib.OK])
+
+
+class ThreadedMockRawResponse(MockRawResponse):
+    def _echo(self, method, url, body, headers):
+        return (httplib.OK, '', {'x-action': self.connection.action,
+                                  'x-method': self.connection.method},
+                httplib.responses[httplib.OK])
+
+
+class ThreadedConnection(Connection):
+    conn_classes = (ThreadedMockHttp, ThreadedMockHttp)
+    rawResponseCls = ThreadedMockRawResponse
+
+    def pre_connect_hook(self, params, headers):
+        # Per-request state must not change while the request is being built
+        params['action'] = self.action
+        params['method'] = self.method
+        params['context'] = self.context.get('id')
+        return params, headers
+
+
+class ThreadSafetyTests(unittest.TestCase):
+    def setUp(self):
+        self.connection = ThreadedConnection(host='localhost')
+        self.connection.driver = MockDriver()
+        self.connection.connect()
+
+    def _run_threads(self, target, count=10):
+        errors = []
+
+        def wrapper(index):
+            try:
+                target(index)
+            except Exception:
+                errors.append(sys.exc_info()[1])
+
+        threads = [threading.Thread(target=wrapper, args=(index,))
+                   for index in range(count)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+
+    def test_per_request_state_is_isolated_between_threads(self):
+        def worker(index):
+            method = ['GET', 'POST'][index % 2]
+
+            for _ in range(20):
+                self.connection.set_context({'id': index})
+                response = self.connection.request('/echo', method=method)
+
+                self.assertTrue(response.body.startswith(method + ' /echo?'))
+                self.assertTrue('action=%2Fecho' in response.body)
+                self.assertTrue(('method=%s' % (method)) in response.body)
+                self.assertTrue(('context=%s' % (index)) in response.body)
+                self.assertEqual(self.connection.method, method)
+                self.assertEqual(self.connection.context, {'id': index})
+
+        self._run_threads(worker)
+
+    def test_raw_requests_from_multiple_threads(self):
+        def worker(index):
+            method = ['GET', 'PUT'][index % 2]
+
+            for _ in range(20):
+                response = self.connection.request('/echo', method=method,
+                                                   raw=True)
+                self.assertEqual(response.headers['x-method'], method)
+                self.assertEqual(response.headers['x-action'], '/echo')
+                self.assertTrue(response.connection.connection is not None)
+
+        self._run_threads(worker)
+
+    def test_connection_is_not_shared_between_threads(self):
+        connections = []
+
+        def worker(index):
+            self.connection.request('/echo')
+            connections.append(id(self.connection.connection))
+            # Keep the reference alive so the id can't be re-used
+            connections.append(self.connection.connection)
+
+        self._run_threads(worker, count=5)
+        self.assertEqual(len(set(connections[::2])), 5)
+        self.assertTrue(self.connection.connection not in connections)
+
+
+if __name__ == '__main__':
+    sys.exit(unittest.main())
@@ -17,10 +17,16 @@ import sys
 import unittest
 import zlib
 import gzip
+import binascii
 
 from mock import Mock
 
 from libcloud.utils.py3 import httplib, b, StringIO, PY3
+
+if PY3:
+    from io import BytesIO
+else:
+    BytesIO = StringIO
 from libcloud.common.base import Response, XmlResponse, JsonResponse
 from libcloud.common.types import MalformedResponseError
 
@@ -94,7 +100,7 @@ class ResponseClassesTests(unittest.TestCase):
         original_data = 'foo bar ponies, wooo zlib'
         compressed_data = zlib.compress(b(original_data))
 
-        self._mock_response.read.return_value = compressed_data
+        self._mock_response.read = BytesIO(compressed_data).read
         self._mock_response.getheaders.return_value = \
                 {'Content-Encoding': 'deflate'}
 
@@ -104,6 +110,7 @@ class ResponseClassesTests(unittest.TestCase):
         body = response.parse_body()
         self.assertEqual(body, original_data)
 
+        self._mock_response.read = BytesIO(compressed_data).read
         self._mock_response.getheaders.return_value = \
                 {'Content-Encoding': 'zlib'}
 
@@ -116,18 +123,13 @@ class ResponseClassesTests(unittest.TestCase):
     def test_gzip_encoding(self):
         original_data = 'foo bar ponies, wooo gzip'
 
-        if PY3:
-            from io import BytesIO
-            string_io = BytesIO()
-        else:
-            string_io = StringIO()
-
+        string_io = BytesIO()
         stream = gzip.GzipFile(fileobj=string_io, mode='w')
         stream.write(b(original_data))
         stream.close()
         compressed_data = string_io.getvalue()
 
-        self._mock_response.read.return_value = compressed_data
+        self._mock_response.read = BytesIO(compressed_data).read
         self._mock_response.getheaders.return_value = \
                 {'Content-Encoding': 'gzip'}
 
@@ -137,6 +139,7 @@ class ResponseClassesTests(unittest.TestCase):
         body = response.parse_body()
         self.assertEqual(body, original_data)
 
+        self._mock_response.read = BytesIO(compressed_data).read
         self._mock_response.getheaders.return_value = \
                 {'Content-Encoding': 'x-gzip'}
 
@@ -147,6 +150,107 @@ class ResponseClassesTests(unittest.TestCase):
         self.assertEqual(body, original_data)
 
 
+    def _set_stream_body(self, data, headers=None):
+        self._mock_response.read = BytesIO(b(data)).read
+        self._mock_response.getheaders.return_value = headers or {}
+
+    def test_XmlResponse_streaming(self):
+        consumed = []
+
+        class StreamingXmlResponse(XmlResponse):
+            streaming = True
+            stream_chunk_size = 7
+
+            def consume_element(self, element):
+                if element.tag == 'item':
+                    consumed.append(element.text)
+                    return True
+                return False
+
+        self._set_stream_body('  <?xml version="1.0"?>\n<items><item>a'
+                              '</item><item>b</item><other>c</other></items>')
+        response = StreamingXmlResponse(response=self._mock_response,
+                                        connection=self._mock_connection)
+
+        self.assertEqual(consumed, ['a', 'b'])
+        self.assertEqual(response.object.tag, 'items')
+        self.assertEqual([e.tag for e in response.object], ['other'])
+        self.assertEqual(response.body, None)
+
+    def test_XmlResponse_streaming_gzip_encoding(self):
+        class StreamingXmlResponse(XmlResponse):
+            streaming = True
+            stream_chunk_size = 5
+
+        string_io = BytesIO()
+        stream = gzip.GzipFile(fileobj=string_io, mode='w')
+        stream.write(b('<foo><bar>baz</bar></foo>'))
+        stream.close()
+
+        self._set_stream_body(string_io.getvalue(),
+                              {'Content-Encoding': 'gzip'})
+        response = StreamingXmlResponse(response=self._mock_response,
+                                        connection=self._mock_connection)
+
+        self.assertEqual(response.object.tag, 'foo')
+        self.assertEqual(response.object.findtext('bar'), 'baz')
+
+    def test_XmlResponse_streaming_malformed_response(self):
+        class StreamingXmlResponse(XmlResponse):
+            streaming = True
+
+        self._set_stream_body('<foo>')
+
+        try:
+            StreamingXmlResponse(response=self._mock_response,
+                                 connection=self._mock_connection)
+        except MalformedResponseError:
+            pass
+        else:
+            self.fail('Exception was not thrown')
+
+    def test_XmlResponse_streaming_zero_length_body(self):
+        class StreamingXmlResponse(XmlResponse):
+            streaming = True
+
+        self._set_stream_body(' \n ')
+        response = StreamingXmlResponse(response=self._mock_response,
+                                        connection=self._mock_connection)
+        self.assertEqual(response.object, '')
+
+    def test_XmlResponse_streaming_error_response_is_buffered(self):
+        class StreamingXmlResponse(XmlResponse):
+            streaming = True
+
+            def parse_error(self):
+                return self.body
+
+        self._mock_response.status = httplib.BAD_REQUEST
+        self._set_stream_body('<error>oops</error>')
+
+        try:
+            StreamingXmlResponse(response=self._mock_response,
+                                 connection=self._mock_connection)
+        except Exception:
+            e = sys.exc_info()[1]
+            self.assertEqual(str(e), '<error>oops</error>')
+        else:
+            self.fail('Exception was not thrown')
+
+    def test_JsonResponse_streaming_deflate_encoding(self):
+        class StreamingJsonResponse(JsonResponse):
+            streaming = True
+            stream_chunk_size = 3
+
+        # Multi-byte character which can be split between chunks
+        value = binascii.unhexlify(b('c3a9')) + b('bar')
+        data = zlib.compress(b('{"foo": "') + value + b('"}'))
+        self._set_stream_body(data, {'Content-Encoding': 'deflate'})
+        response = StreamingJsonResponse(response=self._mock_response,
+                                         connection=self._mock_connection)
+
+        self.assertEqual(response.object, {'foo': value.decode('utf-8')})
+
 
 if __name__ == '__main__':
     sys.exit(unittest.main())
@@ -15,8 +15,10 @@
 
 import sys
 import unittest
+import threading
 
 from libcloud.common.types import LazyList
+from libcloud.utils.py3 import next
 
 
 class TestLazyList(unittest.TestCase):
@@ -92,6 +94,86 @@ class TestLazyList(unittest.TestCase):
         self.assertEqual(repr(ll2), '[1, 2, 3, 4, 5]')
         self.assertEqual(repr(ll3), '[1, 2, 3, 4, 5, 6, 7, 8, 9, 10]')
 
+    def test_iterator_is_incremental(self):
+        ll = LazyList(get_more=self._get_more_pages)
+        iterator = iter(ll)
+
+        self.assertEqual(next(iterator), 0)
+        self.assertEqual(self._get_more_counter, 1)
+        self.assertTrue(4 in ll)
+        self.assertEqual(self._get_more_counter, 1)
+        self.assertTrue(7 in ll)
+        self.assertEqual(self._get_more_counter, 2)
+
+        self.assertEqual(list(iterator), list(range(1, 15)))
+        self.assertEqual(self._get_more_counter, 3)
+        self.assertEqual(list(ll), list(range(15)))
+        self.assertEqual(self._get_more_counter, 3)
+
+    def test_slicing(self):
+        ll = LazyList(get_more=self._get_more_pages)
+
+        self.assertTrue(ll)
+        self.assertEqual(ll[1:3], [1, 2])
+        self.assertEqual(self._get_more_counter, 1)
+        self.assertEqual(ll[4:6], [4, 5])
+        self.assertEqual(ll[6], 6)
+        self.assertEqual(ll[7:5:-1], [7, 6])
+        self.assertEqual(self._get_more_counter, 2)
+        self.assertEqual(ll[-2:], [13, 14])
+        self.assertEqual(self._get_more_counter, 3)
+
+        ll = LazyList(get_more=self._get_more_empty)
+        self.assertFalse(ll)
+        self.assertEqual(ll[0:10], [])
+
+    def test_prefetch(self):
+        threads = []
+
+        def get_more(last_key, value_dict):
+            threads.append(threading.currentThread())
+            return self._get_more_pages(last_key, value_dict)
+
+        ll = LazyList(get_more=get_more, prefetch=True)
+        self.assertEqual(list(ll), list(range(15)))
+        self.assertEqual(len(threads), 3)
+        self.assertEqual(threads[0], threading.currentThread())
+        self.assertNotEqual(threads[1], threading.currentThread())
+        self.assertNotEqual(threads[2], threading.currentThread())
+
+    def test_prefetch_error(self):
+        def get_more(last_key, value_dict):
+            if last_key is not None:
+                raise ValueError('failed')
+            return self._get_more_pages(last_key, value_dict)
+
+        ll = LazyList(get_more=get_more, prefetch=True)
+        iterator = iter(ll)
+
+        for index in range(5):
+            self.assertEqual(next(iterator), index)
+
+        self.assertRaises(ValueError, next, iterator)
+
+    def test_keep_pages_false(self):
+        ll = LazyList(get_more=self._get_more_pages, keep_pages=False)
+
+        # list() would call len() which loads and stores all the items
+        self.assertEqual([item for item in ll], list(range(15)))
+        self.assertEqual(ll._data, [])
+        self.assertEqual(self._get_more_counter, 3)
+
+        # Every iteration starts a new listing
+        self.assertEqual([item for item in ll], list(range(15)))
+        self.assertEqual(self._get_more_counter, 6)
+
+    def _get_more_pages(self, last_key, value_dict):
+        # Three pages with five items each
+        self._get_more_counter += 1
+        start = last_key or 0
+        data = list(range(start, start + 5))
+        return data, start + 5, start + 5 >= 15
+
     def _get_more_empty(self, last_key, value_dict):
         return [], None, True
 
@@ -15,6 +15,10 @@
 # limitations under the License.
 
 import sys
+import zlib
+import gzip
+import tempfile
+import threading
 import unittest
 import warnings
 import os.path
@@ -23,8 +27,11 @@ import os.path
 warnings.simplefilter('default')
 
 import libcloud.utils.files
+import libcloud.utils.concurrency
+import libcloud.utils.compression
+import libcloud.utils.cache
 
-from libcloud.utils.misc import get_driver
+from libcloud.utils.misc import get_driver, module_exists, get_attributes
 
 from libcloud.utils.py3 import PY3
 from libcloud.utils.py3 import StringIO
@@ -72,6 +79,53 @@ class TestUtils(unittest.TestCase):
         else:
             self.fail('Invalid provider, but an exception was not thrown')
 
+    def test_module_exists(self):
+        self.assertTrue(module_exists('unittest'))
+        self.assertTrue(module_exists('libcloud'))
+        self.assertFalse(module_exists('libcloud_no_such_module'))
+
+    def test_module_exists_finder_without_find_spec(self):
+        if not PY3:
+            # Python 2 uses imp.find_module which ignores sys.meta_path
+            return
+
+        class Finder(object):
+            def find_module(self, name, path=None):
+                if name == 'libcloud_finder_module':
+                    return self
+
+                return None
+
+        old_meta_path = sys.meta_path[:]
+        sys.meta_path[:] = [Finder()]
+
+        try:
+            self.assertTrue(module_exists('libcloud_finder_module'))
+            self.assertFalse(module_exists('libcloud_no_such_module'))
+        finally:
+            sys.meta_path[:] = old_meta_path
+
+    def test_get_attributes(self):
+        from libcloud.dns.base import CompactRecord
+
+        record = CompactRecord(id=1, name='www', type=0, data='127.0.0.1',
+                               zone=None, driver=None, extra={'ttl': 60})
+        record.custom = 'value'
+
+        self.assertEqual(get_attributes(record),
+                         {'id': '1', 'name': 'www', 'type': 0,
+                          'data': '127.0.0.1', 'zone': None, 'driver': None,
+                          'extra': {'ttl': 60}, 'custom': 'value'})
+
+    def test_get_attributes_doesnt_create_lazy_extra(self):
+        from libcloud.dns.base import CompactRecord
+
+        record = CompactRecord(id=1, name='www', type=0, data='127.0.0.1',
+                               zone=None, driver=None)
+
+        self.assertEqual(get_attributes(record)['extra'], None)
+        self.assertEqual(record._extra, None)
+
     def test_deprecated_warning(self):
         warnings.showwarning = show_warning
 
@@ -140,6 +194,44 @@ class TestUtils(unittest.TestCase):
 
             self.assertEqual(index, 548)
 
+    def test_read_in_chunks_large_pieces(self):
+        def iterator():
+            for x in range(0, 10):
+                yield 'a' * 95
+
+        result = list(libcloud.utils.files.read_in_chunks(iterator(),
+                                                          chunk_size=10,
+                                                          fill_size=True))
+        self.assertEqual(len(result), 95)
+        self.assertTrue(all([chunk == b('a' * 10) for chunk in result]))
+
+        result = list(libcloud.utils.files.read_in_chunks(iterator(),
+                                                          chunk_size=10,
+                                                          fill_size=False))
+        self.assertEqual(result, [b('a' * 95)] * 10)
+
+    def test_read_in_chunks_file(self):
+        data = os.urandom(1000)
+        fd, file_path = tempfile.mkstemp()
+        os.write(fd, data)
+        os.close(fd)
+
+        try:
+            for fill_size in [True, False]:
+                fp = open(file_path, 'rb')
+                result = list(libcloud.utils.files.read_in_chunks(
+                    fp, chunk_size=64, fill_size=fill_size))
+                fp.close()
+
+                self.assertEqual(b('').join(result), data)
+                self.assertEqual(len(result), 16)
+                self.assertTrue(all([len(chunk) == 64
+                                     for chunk in result[:-1]]))
+                # Buffer is re-used, but the chunks must not share it
+                self.assertEqual(len(set(result)), 16)
+        finally:
+            os.unlink(file_path)
+
     def test_exhaust_iterator(self):
         def iterator_func():
             for x in range(0, 1000):
@@ -164,6 +256,255 @@ class TestUtils(unittest.TestCase):
         result = libcloud.utils.files.exhaust_iterator(iterator=iterator)
         self.assertEqual(result, b(data))
 
+    def test_imap_unordered(self):
+        def func(item):
+            if item % 5 == 0:
+                raise ValueError(item)
+            return item * 2
+
+        results = list(libcloud.utils.concurrency.imap_unordered(
+            func, range(1, 21), concurrency=4))
+        self.assertEqual(len(results), 20)
+
+        for item, result, error in results:
+            if item % 5 == 0:
+                self.assertEqual(result, None)
+                self.assertTrue(isinstance(error, ValueError))
+            else:
+                self.assertEqual(result, item * 2)
+                self.assertEqual(error, None)
+
+    def test_imap_unordered_bounded_concurrency(self):
+        import threading
+        import time
+
+        lock = threading.Lock()
+        state = {'running': 0, 'max_running': 0, 'pulled': 0}
+
+        def items():
+            for index in range(12):
+                state['pulled'] += 1
+                yield index
+
+        def func(item):
+            lock.acquire()
+            state['running'] += 1
+            state['max_running'] = max(state['max_running'],
+                                       state['running'])
+            lock.release()
+            time.sleep(0.01)
+            lock.acquire()
+            state['running'] -= 1
+            lock.release()
+
+        generator = libcloud.utils.concurrency.imap_unordered(
+            func, items(), concurrency=3)
+        next(generator)
+        # Items are only pulled from the iterable when a worker is available
+        self.assertTrue(state['pulled'] <= 4)
+
+        results = [next(generator)] + list(generator)
+        self.assertEqual(len(results), 11)
+        self.assertEqual(state['max_running'], 3)
+
+    def test_imap_unordered_empty_iterable(self):
+        results = list(libcloud.utils.concurrency.imap_unordered(
+            lambda item: item, [], concurrency=2))
+        self.assertEqual(results, [])
+
+    def test_call_with_retry(self):
+        calls = []
+
+        def func():
+            calls.append(1)
+            if len(calls) < 3:
+                raise ValueError('fail')
+            return 'ok'
+
+        result = libcloud.utils.concurrency.call_with_retry(
+            func, retries=2, retry_delay=0)
+        self.assertEqual(result, 'ok')
+        self.assertEqual(len(calls), 3)
+
+        calls[:] = []
+        self.assertRaises(ValueError,
+                          libcloud.utils.concurrency.call_with_retry,
+                          func, retries=1, retry_delay=0)
+        self.assertEqual(len(calls), 2)
+
+        calls[:] = []
+        self.assertRaises(ValueError,
+                          libcloud.utils.concurrency.call_with_retry,
+                          func, retries=5, retry_delay=0,
+                          fatal_exceptions=(ValueError,))
+        self.assertEqual(len(calls), 1)
+
+    def test_ttl_cache(self):
+        now = [100]
+        cache = libcloud.utils.cache.TTLCache(ttl=10, clock=lambda: now[0])
+
+        self.assertEqual(cache.get('a'), None)
+        cache.set('a', 1)
+        cache.set('b', 2, ttl=20)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertTrue('b' in cache)
+        self.assertEqual(len(cache), 2)
+
+        now[0] = 110
+        self.assertEqual(cache.get('a', 'default'), 'default')
+        self.assertFalse('a' in cache)
+        self.assertEqual(cache.get('b'), 2)
+        self.assertEqual(len(cache), 1)
+
+        cache.delete('b')
+        cache.delete('missing')
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual((cache.hits, cache.misses), (2, 3))
+
+        # ttl of 0 disables caching
+        cache.set('c', 3, ttl=0)
+        self.assertEqual(cache.get('c'), None)
+
+    def test_ttl_cache_max_size(self):
+        now = [100]
+        cache = libcloud.utils.cache.TTLCache(ttl=10, max_size=2,
+                                              clock=lambda: now[0])
+        cache.set('a', 1, ttl=30)
+        cache.set('b', 2)
+        cache.set('c', 3)
+
+        # Entry which expires first has been evicted
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual(cache.get('c'), 3)
+
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+    def test_file_ttl_cache(self):
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+
+        try:
+            # Corrupted or empty file is treated as an empty cache
+            cache1 = libcloud.utils.cache.FileTTLCache(path=path, ttl=60)
+            self.assertEqual(len(cache1), 0)
+
+            cache1.set('a', [1, 2])
+            cache1.set('b', 2)
+            # Values which can't be pickled are only cached in memory
+            cache1.set('c', lambda: None)
+
+            cache2 = libcloud.utils.cache.FileTTLCache(path=path, ttl=60)
+            self.assertEqual(cache2.get('a'), [1, 2])
+            self.assertEqual(cache2.get('c'), None)
+
+            cache2.delete('a')
+            self.assertEqual(cache1.get('a'), None)
+            self.assertEqual(cache1.get('b'), 2)
+
+            cache1.clear(predicate=lambda key: key == 'b')
+            self.assertEqual(cache2.get('b'), None)
+        finally:
+            os.unlink(path)
+
+            if os.path.exists(path + '.lock'):
+                os.unlink(path + '.lock')
+
+    def test_file_ttl_cache_concurrent_writers(self):
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+
+        # Each cache instance behaves like a separate process
+        def write(index):
+            cache = libcloud.utils.cache.FileTTLCache(path=path, ttl=60)
+
+            for item in range(5):
+                cache.set((index, item), item)
+
+        threads = [threading.Thread(target=write, args=(index, ))
+                   for index in range(5)]
+
+        try:
+            for thread in threads:
+                thread.start()
+
+            for thread in threads:
+                thread.join()
+
+            cache = libcloud.utils.cache.FileTTLCache(path=path, ttl=60)
+            self.assertEqual(len(cache), 25)
+        finally:
+            os.unlink(path)
+
+            if os.path.exists(path + '.lock'):
+                os.unlink(path + '.lock')
+
+    def _gzip(self, data):
+        if PY3:
+            from io import BytesIO
+            string_io = BytesIO()
+        else:
+            string_io = StringIO()
+
+        stream = gzip.GzipFile(fileobj=string_io, mode='wb',
+                               filename='foo.txt')
+        stream.write(data)
+        stream.close()
+        return string_io.getvalue()
+
+    def _decompress(self, compression_type, data, chunk_size):
+        decompressor = libcloud.utils.compression.Decompressor(
+            compression_type)
+        result = [decompressor.decompress(data[i:i + chunk_size])
+                  for i in range(0, len(data), chunk_size)]
+        result.append(decompressor.flush())
+        return b('').join(result)
+
+    def test_decompressor_gzip(self):
+        data = b('foo bar ') * 1000
+        # Multiple members followed by zero padding
+        compressed = self._gzip(data) + self._gzip(b('baz')) + b('\x00\x00')
+
+        for chunk_size in [1, 3, 10, 1024, len(compressed)]:
+            result = self._decompress('gzip', compressed, chunk_size)
+            self.assertEqual(result, data + b('baz'))
+
+    def test_decompressor_zlib(self):
+        data = b('foo bar ') * 1000
+        compressed = zlib.compress(data)
+
+        for chunk_size in [1, 7, len(compressed)]:
+            result = self._decompress('zlib', compressed, chunk_size)
+            self.assertEqual(result, data)
+
+    def test_decompressor_gzip_corrupted_data(self):
+        compressed = self._gzip(b('foo bar'))
+
+        # Truncated data
+        self.assertRaises(IOError, self._decompress, 'gzip', compressed[:-1],
+                          3)
+        self.assertRaises(IOError, self._decompress, 'gzip', compressed[:5],
+                          3)
+
+        # Invalid size in the trailer
+        corrupted = compressed[:-1] + b('\x01')
+        self.assertRaises(IOError, self._decompress, 'gzip', corrupted, 3)
+
+        self.assertRaises(IOError, self._decompress, 'gzip',
+                          b('not gzipped data'), 3)
+
+    def test_decompress_chunks(self):
+        data = b('foo bar ') * 1000
+        chunks = libcloud.utils.files.read_in_chunks(
+            iter([self._gzip(data)]), chunk_size=10, fill_size=True)
+        result = libcloud.utils.compression.decompress_chunks('gzip', chunks)
+        self.assertEqual(b('').join(result), data)
+
+        self.assertEqual(libcloud.utils.compression.decompress_data(
+            'gzip', self._gzip(data)), data)
+
 
 if __name__ == '__main__':
     sys.exit(unittest.main())
@@ -0,0 +1,348 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Simple thread-safe caches with per-entry expiration.
+"""
+
+import os
+import sys
+import time
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+
+__all__ = [
+    'TTLCache',
+    'FileTTLCache'
+]
+
+_MISSING = object()
+
+
+class TTLCache(object):
+    """
+    Dictionary-like cache where each entry expires after a given number of
+    seconds.
+
+    Expired entries are removed lazily, when they are accessed or when room
+    needs to be made for a new entry.
+    """
+
+    def __init__(self, ttl=60, max_size=None, clock=None):
+        """
+        @type ttl: C{float}
+        @param ttl: Default number of seconds after which an entry expires.
+                    If it's 0 or None, nothing is cached.
+
+        @type max_size: C{int}
+        @param max_size: Maximum number of entries (None means unlimited). If
+                         the cache is full, the entry which expires first is
+                         evicted.
+
+        @type clock: C{function}
+        @param clock: Function which returns the current time in seconds
+                      (defaults to time.time).
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        self.clock = clock or time.time
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Return the value for the key or default if the key is not in the
+        cache or the entry has expired.
+        """
+        self._lock.acquire()
+
+        try:
+            value, expires = self._entries.get(key, (_MISSING, None))
+
+            if value is not _MISSING and expires <= self.clock():
+                del self._entries[key]
+                value = _MISSING
+
+            if value is _MISSING:
+                self.misses += 1
+                return default
+
+            self.hits += 1
+            return value
+        finally:
+            self._lock.release()
+
+    def set(self, key, value, ttl=None):
+        """
+        Store a value in the cache.
+
+        @type ttl: C{float}
+        @param ttl: Number of seconds after which this entry expires
+                    (defaults to the cache ttl).
+        """
+        if ttl is None:
+            ttl = self.ttl
+
+        if not ttl:
+            return
+
+        self._lock.acquire()
+
+        try:
+            now = self.clock()
+
+            if self.max_size and key not in self._entries and \
+               len(self._entries) >= self.max_size:
+                self._evict(now)
+
+            self._entries[key] = (value, now + ttl)
+        finally:
+            self._lock.release()
+
+    def delete(self, key):
+        """
+        Remove the key from the cache. Missing keys are ignored.
+        """
+        self._lock.acquire()
+
+        try:
+            self._entries.pop(key, None)
+        finally:
+            self._lock.release()
+
+    def clear(self, predicate=None):
+        """
+        Remove entries from the cache.
+
+        @type predicate: C{function}
+        @param predicate: If provided, only the entries for which
+                          predicate(key) returns True are removed. Otherwise
+                          all the entries are removed.
+        """
+        self._lock.acquire()
+
+        try:
+            if predicate is None:
+                self._entries.clear()
+                return
+
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+        finally:
+            self._lock.release()
+
+    def __contains__(self, key):
+        self._lock.acquire()
+
+        try:
+            entry = self._entries.get(key, None)
+            return entry is not None and entry[1] > self.clock()
+        finally:
+            self._lock.release()
+
+    def __len__(self):
+        self._lock.acquire()
+
+        try:
+            self._evict_expired(self.clock())
+            return len(self._entries)
+        finally:
+            self._lock.release()
+
+    def _evict(self, now):
+        self._evict_expired(now)
+
+        if len(self._entries) >= self.max_size:
+            items = self._entries.items()
+            key = min(items, key=lambda item: item[1][1])[0]
+            del self._entries[key]
+
+    def _evict_expired(self, now):
+        expired = [key for key, (_, expires) in self._entries.items()
+                   if expires <= now]
+
+        for key in expired:
+            del self._entries[key]
+
+
+class FileTTLCache(TTLCache):
+    """
+    TTLCache which is persisted to a file so it can be shared between
+    processes and survives restarts.
+
+    The file is re-read when it has been modified by another process and
+    written atomically after each modification. An exclusive lock on
+    <path>.lock is held while the file is re-read, modified and written so
+    the processes don't overwrite each other's entries (on platforms without
+    fcntl the lock is only held by threads of a single process). Values need
+    to be picklable, entries which can't be pickled are only cached in
+    memory.
+
+    Note: The file is loaded using pickle so it must not be writable by
+    untrusted users.
+    """
+
+    def __init__(self, path, ttl=60, max_size=None):
+        """
+        @type path: C{str}
+        @param path: Path to the cache file. It's created if it doesn't
+                     exist.
+
+        @inherits: L{TTLCache.__init__}
+        """
+        # Entries are shared between processes so wall clock time is used
+        super(FileTTLCache, self).__init__(ttl=ttl, max_size=max_size)
+        self.path = path
+        self._signature = None
+        # Serializes the updates made by the threads of this process
+        self._file_lock = threading.Lock()
+        self._reload()
+
+    def get(self, key, default=None):
+        self._reload()
+        return super(FileTTLCache, self).get(key, default)
+
+    def set(self, key, value, ttl=None):
+        self._update(lambda: super(FileTTLCache, self).set(key, value,
+                                                           ttl=ttl))
+
+    def delete(self, key):
+        self._update(lambda: super(FileTTLCache, self).delete(key))
+
+    def clear(self, predicate=None):
+        self._update(lambda: super(FileTTLCache, self).clear(
+            predicate=predicate))
+
+    def _update(self, func):
+        """
+        Re-read the file, call func to modify the entries and write the file
+        while holding the file lock.
+        """
+        self._file_lock.acquire()
+
+        try:
+            fp = None
+
+            if fcntl is not None:
+                fp = open(self.path + '.lock', 'a')
+                fcntl.flock(fp.fileno(), fcntl.LOCK_EX)
+
+            try:
+                self._reload()
+                func()
+                self._save()
+            finally:
+                if fp is not None:
+                    # Closing the file releases the lock
+                    fp.close()
+        finally:
+            self._file_lock.release()
+
+    def _reload(self):
+        # Imported here so the memory only cache doesn't pay for them
+        import pickle
+
+        try:
+            signature = self._get_signature()
+        except OSError:
+            return
+
+        if signature == self._signature:
+            return
+
+        try:
+            fp = open(self.path, 'rb')
+
+            try:
+                entries = pickle.load(fp)
+            finally:
+                fp.close()
+        except Exception:
+            # Missing or corrupted file is treated as an empty cache
+            entries = {}
+
+        if not isinstance(entries, dict):
+            entries = {}
+
+        self._lock.acquire()
+
+        try:
+            self._entries = entries
+            self._evict_expired(self.clock())
+            self._signature = signature
+        finally:
+            self._lock.release()
+
+    def _save(self):
+        import pickle
+        import tempfile
+
+        self._lock.acquire()
+
+        try:
+            self._evict_expired(self.clock())
+            entries = {}
+
+            for key, entry in self._entries.items():
+                try:
+                    pickle.dumps(entry, 2)
+                except Exception:
+                    continue
+
+                entries[key] = entry
+
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, temp_path = tempfile.mkstemp(dir=directory,
+                                             prefix='.libcloud-cache')
+
+            try:
+                fp = os.fdopen(fd, 'wb')
+
+                try:
+                    pickle.dump(entries, fp, 2)
+                finally:
+                    fp.close()
+
+                try:
+                    os.rename(temp_path, self.path)
+                except OSError:
+                    # Windows doesn't allow renaming over an existing file
+                    os.remove(self.path)
+                    os.rename(temp_path, self.path)
+            except Exception:
+                e = sys.exc_info()[1]
+
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+
+                raise e
+
+            self._signature = self._get_signature()
+        finally:
+            self._lock.release()
+
+    def _get_signature(self):
+        # The file is always replaced so a different inode means that it has
+        # been written by someone else
+        stat = os.stat(self.path)
+        return (stat.st_ino, stat.st_mtime, stat.st_size)
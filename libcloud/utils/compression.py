@@ -14,29 +14,263 @@
 # limitations under the License.
 
 import zlib
-import gzip
+import struct
 
-from libcloud.utils.py3 import PY3
-from libcloud.utils.py3 import StringIO
+from libcloud.utils.py3 import b
 
 
 __all__ = [
-    'decompress_data'
+    'CONTENT_ENCODING_TYPES',
+    'Decompressor',
+    'decompress_data',
+    'decompress_chunks'
 ]
 
+# Maps Content-Encoding header values to compression types
+CONTENT_ENCODING_TYPES = {
+    'zlib': 'zlib',
+    'deflate': 'zlib',
+    'gzip': 'gzip',
+    'x-gzip': 'gzip'
+}
 
-def decompress_data(compression_type, data):
-    if compression_type == 'zlib':
-        return zlib.decompress(data)
-    elif compression_type == 'gzip':
-        # TODO: Should export BytesIO as StringIO in libcloud.utils.py3
-        if PY3:
-            from io import BytesIO
-            cls = BytesIO
+GZIP_MAGIC = (0x1f, 0x8b)
+GZIP_TRAILER_SIZE = 8
+
+# Gzip header flags
+FHCRC = 2
+FEXTRA = 4
+FNAME = 8
+FCOMMENT = 16
+
+# Decompressor states
+STATE_HEADER = 0
+STATE_BODY = 1
+STATE_TRAILER = 2
+
+
+class Decompressor(object):
+    """
+    Incremental decompressor for zlib and gzip data.
+
+    Data can be passed in chunks of an arbitrary size, so only a single chunk
+    of compressed and decompressed data needs to be held in memory at a
+    time. Gzip headers and trailers (including the CRC and the size checks)
+    are handled here and the deflate stream itself is decompressed using
+    zlib.decompressobj. Gzip data which consists of multiple members is
+    supported as well.
+    """
+
+    def __init__(self, compression_type):
+        """
+        @type compression_type: C{str}
+        @param compression_type: Compression type (zlib or gzip).
+        """
+        if compression_type not in ['zlib', 'gzip']:
+            raise Exception('Invalid or onsupported compression type: %s' %
+                            (compression_type))
+
+        self.compression_type = compression_type
+        self._buffer = b('')
+        self._state = STATE_HEADER
+        self._members = 0
+        self._crc = 0
+        self._size = 0
+
+        if compression_type == 'zlib':
+            self._decompressor = zlib.decompressobj()
         else:
-            cls = StringIO
+            self._decompressor = None
+
+    def decompress(self, data):
+        """
+        Decompress a chunk of data.
+
+        @type data: C{bytes}
+        @param data: Compressed data.
+
+        @rtype: C{bytes}
+        @return: Data which has been decompressed so far (can be empty).
+        """
+        if self.compression_type == 'zlib':
+            return self._decompressor.decompress(data)
+
+        result = []
+
+        while data:
+            if self._state == STATE_HEADER:
+                data = self._read_header(data)
+            elif self._state == STATE_BODY:
+                decompressed = self._decompressor.decompress(data)
+                self._update(decompressed, result)
+                data = self._decompressor.unused_data
+
+                # Python < 3.3 has no eof attribute, but data which follows
+                # the end of the deflate stream always ends up in unused_data
+                if data or getattr(self._decompressor, 'eof', False):
+                    self._end_body(result)
+            else:
+                data = self._read_trailer(data)
+
+        return b('').join(result)
+
+    def flush(self):
+        """
+        Return the remaining decompressed data and verify that the
+        compressed data is complete.
+
+        @rtype: C{bytes}
+        """
+        if self.compression_type == 'zlib':
+            return self._decompressor.flush()
+
+        result = []
+
+        if self._state == STATE_BODY:
+            self._end_body(result)
+
+        if self._state != STATE_HEADER or self._buffer:
+            raise IOError('Compressed data ended before the end-of-stream '
+                          'marker was reached')
+
+        return b('').join(result)
+
+    def _update(self, data, result):
+        if data:
+            self._crc = zlib.crc32(data, self._crc)
+            self._size += len(data)
+            result.append(data)
+
+    def _end_body(self, result):
+        self._update(self._decompressor.flush(), result)
+        self._decompressor = None
+        self._state = STATE_TRAILER
+
+    def _read_header(self, data):
+        data = self._buffer + data
+        self._buffer = b('')
+
+        if self._members > 0:
+            # Ignore zero padding after the last member
+            data = data.lstrip(b('\x00'))
+
+            if not data:
+                return data
+
+        header_size = _get_gzip_header_size(data)
+
+        if header_size is None:
+            # Need more data
+            self._buffer = data
+            return b('')
+
+        self._decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        self._state = STATE_BODY
+        self._crc = zlib.crc32(b(''))
+        self._size = 0
+        return data[header_size:]
+
+    def _read_trailer(self, data):
+        data = self._buffer + data
+        self._buffer = b('')
+
+        if len(data) < GZIP_TRAILER_SIZE:
+            self._buffer = data
+            return b('')
+
+        crc, size = struct.unpack('<II', data[:GZIP_TRAILER_SIZE])
+
+        if crc != (self._crc & 0xffffffff):
+            raise IOError('CRC check failed')
+
+        if size != (self._size & 0xffffffff):
+            raise IOError('Incorrect length of data produced')
+
+        self._members += 1
+        self._state = STATE_HEADER
+        return data[GZIP_TRAILER_SIZE:]
+
+
+def _get_gzip_header_size(data):
+    """
+    Return size of the gzip member header at the beginning of data or None if
+    the header is not complete yet.
+    """
+    if len(data) < 10:
+        return None
+
+    magic1, magic2, method, flags = struct.unpack('<BBBB', data[:4])
+
+    if (magic1, magic2) != GZIP_MAGIC:
+        raise IOError('Not a gzipped file')
+
+    if method != 8:
+        raise IOError('Unknown compression method')
+
+    position = 10
+
+    if flags & FEXTRA:
+        if len(data) < position + 2:
+            return None
+
+        position += 2 + struct.unpack('<H', data[position:position + 2])[0]
+
+    for flag in [FNAME, FCOMMENT]:
+        if flags & flag:
+            end = data.find(b('\x00'), position)
+
+            if end == -1:
+                return None
+
+            position = end + 1
+
+    if flags & FHCRC:
+        position += 2
+
+    if len(data) < position:
+        return None
+
+    return position
+
+
+def decompress_data(compression_type, data):
+    """
+    Decompress data.
+
+    @type compression_type: C{str}
+    @param compression_type: Compression type (zlib or gzip).
+
+    @type data: C{bytes}
+    @param data: Compressed data.
+
+    @rtype: C{bytes}
+    """
+    decompressor = Decompressor(compression_type)
+    return decompressor.decompress(data) + decompressor.flush()
+
+
+def decompress_chunks(compression_type, chunks):
+    """
+    Return a generator which decompresses data as it arrives.
+
+    Unlike decompress_data, neither the whole compressed nor the whole
+    decompressed data is ever held in memory.
+
+    @type compression_type: C{str}
+    @param compression_type: Compression type (zlib or gzip).
+
+    @type chunks: C{Iterator}
+    @param chunks: An iterator which yields compressed data.
+    """
+    decompressor = Decompressor(compression_type)
+
+    for chunk in chunks:
+        data = decompressor.decompress(b(chunk))
+
+        if data:
+            yield data
+
+    data = decompressor.flush()
 
-        return gzip.GzipFile(fileobj=cls(data)).read()
-    else:
-        raise Exception('Invalid or onsupported compression type: %s' %
-                        (compression_type))
+    if data:
+        yield data
@@ -0,0 +1,168 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Helpers for running driver operations concurrently using a bounded pool of
+worker threads.
+"""
+
+import sys
+import time
+import threading
+
+from libcloud.utils.py3 import Queue
+from libcloud.utils.py3 import next
+
+__all__ = [
+    'DEFAULT_CONCURRENCY',
+    'imap_unordered',
+    'call_with_retry'
+]
+
+DEFAULT_CONCURRENCY = 4
+
+_STOP = object()
+
+
+def imap_unordered(func, iterable, concurrency=DEFAULT_CONCURRENCY):
+    """
+    Call func for each item in the iterable using a pool of worker threads
+    and return a generator which yields results in the order in which they
+    finish.
+
+    Items are pulled from the iterable lazily and at most C{concurrency}
+    items are being processed at any given time, so the iterable can be
+    arbitrary large.
+
+    Exceptions thrown by func are not propagated, they are returned as part
+    of the result instead.
+
+    @type func: C{function}
+    @param func: Function which is called with a single item.
+
+    @type iterable: C{object}
+    @param iterable: An object which implements an iterator interface.
+
+    @type concurrency: C{int}
+    @param concurrency: Maximum number of worker threads (defaults to
+                        DEFAULT_CONCURRENCY).
+
+    @rtype: C{generator}
+    @return: A generator which yields (item, result, error) tuples. error is
+             None if the call has succeeded.
+    """
+    concurrency = max(1, int(concurrency or DEFAULT_CONCURRENCY))
+
+    tasks = Queue.Queue()
+    results = Queue.Queue()
+
+    def worker():
+        while True:
+            item = tasks.get()
+
+            if item is _STOP:
+                return
+
+            try:
+                result, error = func(item), None
+            except Exception:
+                result, error = None, sys.exc_info()[1]
+
+            results.put((item, result, error))
+
+    iterator = iter(iterable)
+    threads = []
+    pending = 0
+    exhausted = False
+
+    try:
+        while True:
+            while not exhausted and pending < concurrency:
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    exhausted = True
+                    break
+
+                if len(threads) <= pending:
+                    thread = threading.Thread(target=worker)
+                    thread.setDaemon(True)
+                    thread.start()
+                    threads.append(thread)
+
+                tasks.put(item)
+                pending += 1
+
+            if pending == 0:
+                break
+
+            result = results.get()
+            pending -= 1
+            yield result
+    finally:
+        # Items which are already being processed are finished, but their
+        # results are discarded if the generator has been closed early.
+        for _ in threads:
+            tasks.put(_STOP)
+
+        if pending == 0:
+            # All the workers are idle so this doesn't block
+            for thread in threads:
+                thread.join()
+
+
+def call_with_retry(func, retries=0, retry_delay=1, backoff=2,
+                    retry_exceptions=(Exception,), fatal_exceptions=()):
+    """
+    Call func and retry it up to C{retries} times if it throws an exception.
+
+    @type func: C{function}
+    @param func: Function which takes no arguments.
+
+    @type retries: C{int}
+    @param retries: Maximum number of retries (0 means no retries).
+
+    @type retry_delay: C{float}
+    @param retry_delay: How many seconds to wait before the first retry.
+
+    @type backoff: C{float}
+    @param backoff: Multiplier which is applied to the delay after each
+                    retry.
+
+    @type retry_exceptions: C{tuple}
+    @param retry_exceptions: Exceptions on which the call is retried.
+
+    @type fatal_exceptions: C{tuple}
+    @param fatal_exceptions: Exceptions which are always propagated
+                             immediately, even if they are sub-classes of
+                             one of the retry_exceptions.
+
+    @return: Value returned by func.
+    """
+    delay = retry_delay
+    attempt = 0
+
+    while True:
+        try:
+            return func()
+        except fatal_exceptions:
+            raise
+        except retry_exceptions:
+            if attempt >= retries:
+                raise
+
+        attempt += 1
+        time.sleep(delay)
+        delay *= backoff
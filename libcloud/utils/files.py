@@ -24,8 +24,24 @@ from libcloud.utils.py3 import b
 CHUNK_SIZE = 8096
 
 if PY3:
+    import io
     from io import FileIO as file
 
+try:
+    memoryview
+    HAS_MEMORYVIEW = True
+except NameError:
+    # Python < 2.7
+    HAS_MEMORYVIEW = False
+
+# Types for which data is read directly into a pre-allocated buffer.
+# Sub-classes are excluded on purpose since they might override read().
+if PY3:
+    READINTO_TYPES = (io.FileIO, io.BufferedReader, io.BufferedRandom,
+                      io.BytesIO, httplib.HTTPResponse)
+else:
+    READINTO_TYPES = (file, )
+
 
 def read_in_chunks(iterator, chunk_size=None, fill_size=False):
     """
@@ -41,12 +57,12 @@ def read_in_chunks(iterator, chunk_size=None, fill_size=False):
     @type fill_size: C{bool}
     @param fill_size: If True, make sure chunks are chunk_size in length
                       (except for last chunk).
-
-    TODO: At some point in the future we could use byte arrays here if version
-    >= Python 3. This should speed things up a bit and reduce memory usage.
     """
     chunk_size = chunk_size or CHUNK_SIZE
 
+    if HAS_MEMORYVIEW and type(iterator) in READINTO_TYPES:
+        return _read_into_chunks(iterator.readinto, chunk_size, fill_size)
+
     if isinstance(iterator, (file, httplib.HTTPResponse)):
         get_data = iterator.read
         args = (chunk_size, )
@@ -54,30 +70,84 @@ def read_in_chunks(iterator, chunk_size=None, fill_size=False):
         get_data = next
         args = (iterator, )
 
-    data = b('')
-    empty = False
+    return _read_chunks(get_data, args, chunk_size, fill_size)
 
-    while not empty or len(data) > 0:
-        if not empty:
-            try:
-                chunk = b(get_data(*args))
-                if len(chunk) > 0:
-                    data += chunk
-                else:
-                    empty = True
-            except StopIteration:
-                empty = True
 
-        if len(data) == 0:
-            raise StopIteration
+def _read_into_chunks(readinto, chunk_size, fill_size):
+    """
+    Read data directly into a single pre-allocated buffer which is re-used
+    for every chunk.
+    """
+    buf = bytearray(chunk_size)
+    view = memoryview(buf)
+
+    while True:
+        filled = readinto(view) or 0
 
         if fill_size:
-            if empty or len(data) >= chunk_size:
-                yield data[:chunk_size]
-                data = data[chunk_size:]
+            # Keep reading into the free space at the end of the buffer
+            read = filled
+            while read and filled < chunk_size:
+                read = readinto(view[filled:]) or 0
+                filled += read
+
+        if not filled:
+            return
+
+        if filled == chunk_size:
+            yield bytes(buf)
+        else:
+            yield view[:filled].tobytes()
+
+        if fill_size and filled < chunk_size:
+            return
+
+
+def _read_chunks(get_data, args, chunk_size, fill_size):
+    """
+    Read data using get_data and optionally re-slice it into chunks of
+    chunk_size bytes.
+
+    Incoming pieces are buffered in a list and only joined once there is
+    enough data for at least one chunk, so each byte is copied a constant
+    number of times regardless of the size of the incoming pieces.
+    """
+    pieces = []
+    buffered = 0
+    empty = False
+
+    while not empty:
+        try:
+            chunk = b(get_data(*args))
+        except StopIteration:
+            chunk = b('')
+
+        if len(chunk) == 0:
+            empty = True
+        elif not fill_size:
+            yield chunk
+            continue
         else:
-            yield data
-            data = b('')
+            pieces.append(chunk)
+            buffered += len(chunk)
+
+            if buffered < chunk_size:
+                continue
+
+        if not pieces:
+            break
+
+        data = b('').join(pieces)
+        end = len(data) - (len(data) % chunk_size)
+
+        if empty:
+            end = len(data)
+
+        for offset in range(0, end, chunk_size):
+            yield data[offset:offset + chunk_size]
+
+        pieces = [data[end:]]
+        buffered = len(pieces[0])
 
 
 def exhaust_iterator(iterator):
@@ -91,7 +161,7 @@ def exhaust_iterator(iterator):
     @rtype C{str}
     @return Data returned by the iterator.
     """
-    data = b('')
+    pieces = []
 
     try:
         chunk = b(next(iterator))
@@ -99,14 +169,14 @@ def exhaust_iterator(iterator):
         chunk = b('')
 
     while len(chunk) > 0:
-        data += chunk
+        pieces.append(chunk)
 
         try:
             chunk = b(next(iterator))
         except StopIteration:
             chunk = b('')
 
-    return data
+    return b('').join(pieces)
 
 
 def guess_file_mime_type(file_path):
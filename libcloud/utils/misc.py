@@ -13,6 +13,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import sys
+
 
 def get_driver(drivers, provider):
     """
@@ -30,6 +32,49 @@ def get_driver(drivers, provider):
     raise AttributeError('Provider %s does not exist' % (provider))
 
 
+def module_exists(name):
+    """
+    Return True if the module can be found on the import path. The module
+    itself isn't imported so this doesn't guarantee that importing it
+    succeeds.
+
+    @param name: Name of a top level module or package.
+    @type name: C{str}
+    """
+    if name in sys.modules:
+        return True
+
+    if sys.version_info[0] >= 3 and sys.meta_path:
+        # Finders on sys.meta_path are used directly because importing
+        # importlib.util takes longer than the lookup itself. Finders
+        # before Python 3.4 only implement find_module.
+        for finder in sys.meta_path:
+            find_spec = getattr(finder, 'find_spec', None)
+
+            if find_spec is not None:
+                if find_spec(name, None) is not None:
+                    return True
+            elif hasattr(finder, 'find_module'):
+                if finder.find_module(name) is not None:
+                    return True
+
+        return False
+
+    # Python 2 and Python 3.2, where the path based import isn't exposed on
+    # sys.meta_path
+    import imp
+
+    try:
+        fp = imp.find_module(name)[0]
+    except ImportError:
+        return False
+
+    if fp is not None:
+        fp.close()
+
+    return True
+
+
 def merge_valid_keys(params, valid_keys, extra):
     """
     Merge valid keys from extra into params dictionary and return
@@ -49,6 +94,35 @@ def merge_valid_keys(params, valid_keys, extra):
     return merged
 
 
+def get_attributes(obj):
+    """
+    Return a dictionary with the attributes of an object, including the ones
+    which are stored in slots (e.g. L{libcloud.dns.base.CompactRecord}).
+
+    Private slots which back a writable property of the same name without
+    the leading underscore (e.g. lazily created "extra" dictionary) are
+    returned under the property name. The slot is read directly so the
+    property getter doesn't create the lazy value.
+    """
+    attributes = dict(getattr(obj, '__dict__', {}))
+
+    for cls in type(obj).__mro__:
+        for slot in cls.__dict__.get('__slots__', ()):
+            name = slot
+
+            if slot.startswith('_'):
+                name = slot[1:]
+                prop = getattr(cls, name, None)
+
+                if not isinstance(prop, property) or prop.fset is None:
+                    continue
+
+            if hasattr(obj, slot):
+                attributes[name] = getattr(obj, slot)
+
+    return attributes
+
+
 def get_new_obj(obj, klass, attributes):
     """
     Pass attributes from the existing object 'obj' and attributes
@@ -57,7 +131,7 @@ def get_new_obj(obj, klass, attributes):
     constructor if they are not None.
     """
     kwargs = {}
-    for key, value in list(obj.__dict__.items()):
+    for key, value in list(get_attributes(obj).items()):
         if isinstance(value, dict):
             kwargs[key] = value.copy()
         elif isinstance(value, (tuple, list)):
@@ -35,9 +35,11 @@ if sys.version_info >= (3, 0):
     import urllib as urllib2
     import urllib.parse as urlparse
     import xmlrpc.client as xmlrpclib
+    import queue as Queue
     from urllib.parse import quote as urlquote
     from urllib.parse import unquote as urlunquote
     from urllib.parse import urlencode as urlencode
+    from inspect import getfullargspec as getargspec
 
     basestring = str
 
@@ -59,6 +61,9 @@ if sys.version_info >= (3, 0):
     next = __builtins__['next']
     def dictvalues(d):
         return list(d.values())
+    def buffer_view(obj, offset, size):
+        # Zero-copy slice of a bytearray, mmap or other buffer object
+        return memoryview(obj)[offset:offset + size]
 else:
     PY2 = True
     import httplib
@@ -67,9 +72,11 @@ else:
     import urllib2
     import urlparse
     import xmlrpclib
+    import Queue
     from urllib import quote as urlquote
     from urllib import unquote as urlunquote
     from urllib import urlencode as urlencode
+    from inspect import getargspec
 
     basestring = unicode = str
 
@@ -83,6 +90,8 @@ else:
         return i.next()
     def dictvalues(d):
         return d.values()
+    def buffer_view(obj, offset, size):
+        return buffer(obj, offset, size)
 
 if sys.version_info >= (2, 5) and sys.version_info <= (2, 6):
     PY25 = True